@@ -0,0 +1,20 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_remove_event_name_remove_event_timestamp_and_more'),
+        ('projects', '0003_alter_project_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', '-start_time', '-id'], name='analytics_e_user_id_5a66dc_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.9 on 2026-10-18 07:55
+
+import myhub.pagination
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_keyset_pagination_indexes'),
+        ('projects', '0003_alter_project_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='analytics_e_user_id_5a66dc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=myhub.pagination.KeysetIndex(models.F('user'), models.OrderBy(models.F('start_time'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='analytics_event_keyset_idx'),
+        ),
+    ]
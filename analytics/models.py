@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.urls import reverse
 
+from myhub.pagination import KeysetIndex
+
 
 class Event(models.Model):
     EVENT_TYPES = (
@@ -21,6 +24,15 @@ class Event(models.Model):
     tags = models.JSONField(default=list, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order of EventListView, NULL start times last
+            KeysetIndex(
+                F('user'), F('start_time').desc(nulls_last=True), F('id').desc(),
+                name='analytics_event_keyset_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.get_event_type_display()}: {self.title}"
         
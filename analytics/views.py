@@ -3,14 +3,26 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views import generic
 from django.db.models import Q
 
+from myhub.mixins import CSVExportMixin, KeysetPaginationMixin
 from .models import Event
 from .forms import EventForm
 
 
-class EventListView(LoginRequiredMixin, generic.ListView):
+class EventListView(LoginRequiredMixin, CSVExportMixin, KeysetPaginationMixin, generic.ListView):
     model = Event
     template_name = 'analytics/event_list.html'
     paginate_by = 15
+    keyset_ordering = ('-start_time', '-id')
+    csv_filename = 'events.csv'
+    csv_fields = [
+        ('title', 'Title'),
+        ('event_type', 'Type'),
+        ('start_time', 'Start'),
+        ('end_time', 'End'),
+        ('duration', 'Duration'),
+        ('project.title', 'Project'),
+        ('description', 'Description'),
+    ]
 
     def get_queryset(self):
         queryset = Event.objects.filter(user=self.request.user).select_related('project', 'user')
@@ -30,7 +42,7 @@ class EventListView(LoginRequiredMixin, generic.ListView):
         if project_filter:
             queryset = queryset.filter(project_id=project_filter)
 
-        return queryset.order_by('-start_time')
+        return queryset.order_by(*self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
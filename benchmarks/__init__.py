@@ -0,0 +1,19 @@
+"""
+Synthetic-scale benchmarks for the views and the reminder pipeline.
+
+Seed a dedicated database, then measure it:
+
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python manage.py migrate
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python manage.py seed_benchmark_data --users 2
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python manage.py run_benchmarks
+
+For PostgreSQL, point DATABASE_URL at a local server instead, e.g.
+postgres://localhost/myhub_bench. Results are written as JSON under
+benchmarks/results/ (one file per database vendor and commit). Pass
+--compare with an earlier file to print per-scenario regressions.
+
+run_load_test drives the same data with concurrent virtual users; see
+benchmarks.loadtest. run_reminder_benchmark measures reminder run
+throughput against a local fake SMS gateway (also served on its own by
+run_fake_mnotify); see benchmarks.reminders and benchmarks.fake_mnotify.
+"""
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the mNotify SMS gateway.
+
+It speaks the form-POST protocol notifications.services.mnotify uses: fields
+key, to (one number or a comma-separated list), msg and sender_id, answered
+with "1000" on success. Latency, error rate and a request rate limit are
+configurable, so the reminder pipeline can be driven at volume without
+touching the real provider:
+
+    python manage.py run_fake_mnotify --port 8025 --latency 0.05 --error-rate 0.02
+    MNOTIFY_SMS_URL=http://127.0.0.1:8025/smsapi celery -A myhub worker
+
+run_reminder_benchmark starts one in-process (see benchmarks.reminders).
+"""
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from .runner import percentile
+
+
+class GatewayStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.recipients = 0
+        self.responses = Counter()
+        self.service_ms = []
+
+    def summary(self) -> dict:
+        with self.lock:
+            result = {
+                'connections': self.connections,
+                'requests': self.requests,
+                'recipients': self.recipients,
+                'responses': dict(self.responses),
+            }
+            if self.service_ms:
+                result.update({f'p{pct}_ms': round(percentile(self.service_ms, pct), 2) for pct in (50, 95)})
+        return result
+
+
+class FakeMNotify:
+    """
+    Threaded HTTP server answering like mNotify's SMS endpoint.
+
+    - latency: seconds each request takes, plus up to `jitter` more
+    - error_rate: share of requests answered with HTTP 500
+    - rate_limit: requests per second accepted (token bucket with `burst`);
+      requests beyond it get HTTP 429. 0 disables it.
+    - api_key: if set, other keys get mNotify's "1004" (invalid API key)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: float = 0.0, burst: Optional[int] = None,
+                 api_key: Optional[str] = None, random_seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit))
+        self.api_key = api_key
+        self.stats = GatewayStats()
+        self._rng = random.Random(random_seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}/smsapi'
+
+    def start(self) -> 'FakeMNotify':
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so pooled client connections are reused
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with gateway.stats.lock:
+                    gateway.stats.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+                start = time.perf_counter()
+                status, body = gateway.respond(form)
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with gateway.stats.lock:
+                    gateway.stats.service_ms.append((time.perf_counter() - start) * 1000)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-mnotify', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def respond(self, form: dict) -> Tuple[int, str]:
+        """The (HTTP status, body) answer to one form POST"""
+        numbers = [number for number in form.get('to', '').split(',') if number]
+        with self.stats.lock:
+            self.stats.requests += 1
+            self.stats.recipients += len(numbers)
+
+        if not self._take_token():
+            status, body = 429, 'Too Many Requests'
+        else:
+            with self._lock:
+                delay = self.latency + self._rng.uniform(0, self.jitter)
+                failed = self._rng.random() < self.error_rate
+            if delay:
+                time.sleep(delay)
+            if failed:
+                status, body = 500, 'Internal Server Error'
+            elif self.api_key and form.get('key') != self.api_key:
+                status, body = 200, '1004'
+            elif not numbers:
+                status, body = 200, '1005'
+            elif not form.get('msg'):
+                status, body = 200, '1008'
+            else:
+                status, body = 200, '1000'
+
+        with self.stats.lock:
+            self.stats.responses[body if status == 200 else str(status)] += 1
+        return status, body
@@ -0,0 +1,320 @@
+"""
+Concurrent load driver for the WSGI application.
+
+Each virtual user runs in its own thread with its own cookie jar: it logs in
+once as a benchmark user, then repeats the selected journeys until the run
+ends. Requests go either straight into myhub.wsgi.application in this
+process (the default) or over HTTP to a running server, e.g.
+
+    python manage.py run_load_test --concurrency 16 --duration 60
+    python manage.py run_load_test --url http://127.0.0.1:8000 --concurrency 16
+
+A response counts as an error when its status is not one the step expects
+(e.g. a 500 from "database is locked", or a login form shown again instead
+of the redirect) or when the request raises.
+"""
+import http.client
+import io
+import random
+import re
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .runner import percentile
+from .seed import PASSWORD, WORDS, benchmark_users
+
+# Distinct error messages kept per endpoint
+MAX_ERROR_SAMPLES = 5
+
+ACCOUNT_SELECT = re.compile(r'<select[^>]*name="account"[^>]*>(.*?)</select>', re.S)
+OPTION_VALUE = re.compile(r'<option value="(\d+)"')
+
+
+class WSGITransport:
+    """Call the WSGI application directly, as a WSGI server would."""
+
+    def __init__(self, application=None, host: Optional[str] = None):
+        if application is None:
+            from myhub.wsgi import application
+        self.application = application
+        allowed = [name for name in settings.ALLOWED_HOSTS if name and name[0] not in '.*']
+        self.host = host or (allowed[0] if allowed else 'localhost')
+
+    def request(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': self.host,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = response_headers
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            # Fires request_finished, which closes or keeps the DB connection per CONN_MAX_AGE
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], content
+
+    def close(self) -> None:
+        # Each worker thread holds its own persistent connections
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Keep-alive HTTP/1.1 connection to a running server."""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.referer = f'{parts.scheme}://{parts.netloc}/'
+
+    def request(self, method, path, body, headers):
+        # Django's CSRF check requires a same-origin Referer over HTTPS
+        headers = {'Referer': self.referer, **headers}
+        try:
+            self.connection.request(method, self.prefix + path, body=body or None, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.getheaders(), response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            self.connection.close()
+            raise
+
+    def close(self):
+        self.connection.close()
+
+
+class EndpointStats:
+    def __init__(self):
+        self.durations: List[float] = []
+        self.errors = 0
+        self.error_samples: List[str] = []
+
+    def record(self, seconds: float, error: Optional[str]) -> None:
+        self.durations.append(seconds * 1000)
+        if error is not None:
+            self.errors += 1
+            if error not in self.error_samples and len(self.error_samples) < MAX_ERROR_SAMPLES:
+                self.error_samples.append(error)
+
+    def summary(self, elapsed: float) -> dict:
+        count = len(self.durations)
+        result = {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        }
+        if count:
+            result.update({f'p{pct}_ms': round(percentile(self.durations, pct), 2) for pct in (50, 95, 99)})
+            result['max_ms'] = round(max(self.durations), 2)
+        if self.error_samples:
+            result['error_samples'] = self.error_samples
+        return result
+
+
+class VirtualUser:
+    """One simulated browser: a cookie jar on top of a transport."""
+
+    def __init__(self, transport, stats: Dict[str, EndpointStats], lock: threading.Lock, rng: random.Random):
+        self.transport = transport
+        self.stats = stats
+        self.lock = lock
+        self.rng = rng
+        self.cookies: Dict[str, str] = {}
+
+    def request(self, endpoint: str, method: str, path: str, data: Optional[dict] = None,
+                expect: Sequence[int] = (200,)) -> Optional[str]:
+        """Make a request, record it under `endpoint` and return the body text (None on error)."""
+        headers = {}
+        body = b''
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if data is not None:
+            if 'csrftoken' in self.cookies:
+                data = {'csrfmiddlewaretoken': self.cookies['csrftoken'], **data}
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        error = None
+        text = None
+        start = time.perf_counter()
+        try:
+            status, response_headers, content = self.transport.request(method, path, body, headers)
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'
+        else:
+            for name, value in response_headers:
+                if name.lower() == 'set-cookie':
+                    for morsel in SimpleCookie(value).values():
+                        self.cookies[morsel.key] = morsel.value
+            if status in expect:
+                text = content.decode('utf-8', 'replace')
+            else:
+                error = f'HTTP {status}'
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.stats.setdefault(endpoint, EndpointStats()).record(elapsed, error)
+        return text
+
+    def get(self, endpoint, path, expect=(200,)):
+        return self.request(endpoint, 'GET', path, expect=expect)
+
+    def post(self, endpoint, path, data, expect=(302,)):
+        return self.request(endpoint, 'POST', path, data, expect=expect)
+
+
+def login(user: VirtualUser, username: str) -> bool:
+    if user.get('login_form', '/accounts/login/') is None:
+        return False
+    return user.post('login', '/accounts/login/', {'username': username, 'password': PASSWORD}) is not None
+
+
+def dashboard_journey(user: VirtualUser) -> None:
+    user.get('dashboard', '/')
+
+
+def filter_lists_journey(user: VirtualUser) -> None:
+    user.get('transaction_list_filtered', f"/finance/?type=expense&search={user.rng.choice(WORDS)}")
+    user.get('task_list_filtered', '/tasks/?status=pending')
+    user.get('worklog_list_filtered', '/worklogs/?status=completed')
+    user.get('event_list', '/analytics/')
+
+
+def create_transaction_journey(user: VirtualUser) -> None:
+    form = user.get('transaction_form', '/finance/create/')
+    if form is None:
+        return
+    select = ACCOUNT_SELECT.search(form)
+    accounts = OPTION_VALUE.findall(select.group(1)) if select else []
+    user.post('transaction_create', '/finance/create/', {
+        'account': user.rng.choice(accounts) if accounts else '',
+        'amount': f'{user.rng.randint(100, 50_000) / 100:.2f}',
+        'currency': 'GHS',
+        't_type': 'expense',
+        'category': 'food',
+        'description': f'load test {user.rng.choice(WORDS)}',
+    })
+
+
+JOURNEYS: Dict[str, Callable[[VirtualUser], None]] = {
+    'dashboard': dashboard_journey,
+    'filter_lists': filter_lists_journey,
+    'create_transaction': create_transaction_journey,
+}
+
+
+def run_load_test(
+    concurrency: int = 8,
+    duration: Optional[float] = 30,
+    iterations: Optional[int] = None,
+    journeys: Optional[Sequence[str]] = None,
+    base_url: Optional[str] = None,
+    think_time: float = 0.0,
+    random_seed: int = 0,
+) -> dict:
+    """
+    Run `concurrency` virtual users for `duration` seconds, or for
+    `iterations` passes over the journeys each if given. Returns the
+    per-endpoint and overall throughput, error rate and latency percentiles.
+    """
+    journeys = list(journeys or JOURNEYS)
+    unknown = set(journeys) - set(JOURNEYS)
+    if unknown:
+        raise ValueError(f"Unknown journeys: {', '.join(sorted(unknown))}")
+    usernames = list(benchmark_users().order_by('pk').values_list('username', flat=True))
+    if not usernames:
+        raise ValueError('No benchmark users found; run seed_benchmark_data first.')
+
+    stats: Dict[str, EndpointStats] = {}
+    lock = threading.Lock()
+    opened = []
+    deadline = None if iterations else time.perf_counter() + duration
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            opened.append(connection.alias)
+
+    def worker(index: int) -> None:
+        transport = HTTPTransport(base_url) if base_url else WSGITransport()
+        user = VirtualUser(transport, stats, lock, random.Random(random_seed + index))
+        try:
+            if not login(user, usernames[index % len(usernames)]):
+                return
+            passes = 0
+            while (passes < iterations) if iterations else (time.perf_counter() < deadline):
+                for name in journeys:
+                    JOURNEYS[name](user)
+                    if think_time:
+                        time.sleep(user.rng.uniform(0, 2 * think_time))
+                passes += 1
+        finally:
+            transport.close()
+
+    connection_created.connect(count_connection)
+    start = time.perf_counter()
+    try:
+        threads = [threading.Thread(target=worker, args=(index,), name=f'vuser-{index}') for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        connection_created.disconnect(count_connection)
+    elapsed = time.perf_counter() - start
+
+    overall = EndpointStats()
+    for endpoint in stats.values():
+        overall.durations.extend(endpoint.durations)
+        overall.errors += endpoint.errors
+    report = {
+        'meta': {
+            'target': base_url or 'in-process',
+            'vendor': connections['default'].vendor,
+            'conn_max_age': connections['default'].settings_dict.get('CONN_MAX_AGE'),
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'journeys': journeys,
+        },
+        'overall': overall.summary(elapsed),
+        'endpoints': {name: endpoint.summary(elapsed) for name, endpoint in sorted(stats.items())},
+    }
+    if not base_url:
+        # With persistent connections this stays at about one per virtual user
+        report['meta']['db_connections_opened'] = len(opened)
+    return report
@@ -0,0 +1,240 @@
+"""
+Latency and query-count measurements for the views and the reminder pipeline.
+
+Every scenario is run `warmup` times unmeasured, then `repeat` times while
+the wall time and the number of SQL statements of each run are recorded.
+Views are driven in-process through the test client, logged in as a
+benchmark user, so the numbers include middleware, template rendering and
+streaming bodies but not the network.
+"""
+import os
+import platform
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.db import connection, connections, transaction as db_transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .seed import benchmark_users
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Relative slowdown of p50 reported by compare()
+REGRESSION_THRESHOLD = 0.10
+
+
+class QueryCounter:
+    """execute_wrapper counting the statements run on every connection."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples`."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def measure(run: Callable[[], Optional[int]], repeat: int, warmup: int, setup: Optional[Callable] = None) -> dict:
+    """
+    Time `repeat` calls of `run` after `warmup` unmeasured ones. `run` may
+    return an HTTP status; `setup` is called before every run, untimed.
+    """
+    durations = []
+    queries = []
+    statuses = set()
+    for index in range(warmup + repeat):
+        if setup:
+            setup()
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            start = time.perf_counter()
+            status = run()
+            elapsed = time.perf_counter() - start
+        if index < warmup:
+            continue
+        durations.append(elapsed * 1000)
+        queries.append(counter.count)
+        if status is not None:
+            statuses.add(status)
+
+    result = {f'p{pct}_ms': round(percentile(durations, pct), 2) for pct in PERCENTILES}
+    result.update({
+        'mean_ms': round(sum(durations) / len(durations), 2),
+        'min_ms': round(min(durations), 2),
+        'max_ms': round(max(durations), 2),
+        'queries': max(queries),
+        'queries_min': min(queries),
+        'runs': len(durations),
+    })
+    if statuses:
+        result['status'] = sorted(statuses)
+    return result
+
+
+def view_scenarios(user) -> Dict[str, str]:
+    """Name -> URL of every list, detail, report and CSV export view, for `user`'s data."""
+    from finance.models import Account, Subscription
+    from learning.models import Course
+    from projects.models import Project
+    from tasks.models import Task
+    from worklogs.models import WorkLog
+
+    scenarios = {
+        'dashboard': reverse('home'),
+        'transaction_list': reverse('finance:transaction_list'),
+        'transaction_search': reverse('finance:transaction_list') + '?search=groceries+rent',
+        'transaction_filter': reverse('finance:transaction_list') + '?type=expense&category=food',
+        'transaction_csv': reverse('finance:transaction_list') + '?format=csv',
+        'monthly_report': reverse('finance:monthly_report'),
+        'account_list': reverse('finance:account_list'),
+        'subscription_list': reverse('finance:subscription_list'),
+        'task_list': reverse('tasks:task_list'),
+        'task_csv': reverse('tasks:task_list') + '?format=csv',
+        'worklog_list': reverse('worklogs:worklog_list'),
+        'worklog_csv': reverse('worklogs:worklog_list') + '?format=csv',
+        'event_list': reverse('analytics:event_list'),
+        'event_csv': reverse('analytics:event_list') + '?format=csv',
+        'project_list': reverse('projects:project_list'),
+        'course_list': reverse('learning:course_list'),
+    }
+    details = {
+        'account_detail': ('finance:account_detail', Account.objects.filter(user=user)),
+        'account_balance_history': ('finance:account_balance_history', Account.objects.filter(user=user)),
+        'subscription_detail': ('finance:subscription_detail', Subscription.objects.filter(user=user)),
+        'task_detail': ('tasks:task_detail', Task.objects.filter(user=user)),
+        'worklog_detail': ('worklogs:worklog_detail', WorkLog.objects.filter(user=user)),
+        'project_detail': ('projects:project_detail', Project.objects.filter(owner=user)),
+        'course_detail': ('learning:course_detail', Course.objects.filter(owner=user)),
+    }
+    for name, (url_name, queryset) in details.items():
+        pk = queryset.order_by('pk').values_list('pk', flat=True).first()
+        if pk is not None:
+            scenarios[name] = reverse(url_name, kwargs={'pk': pk})
+    return scenarios
+
+
+def _get(client: Client, url: str) -> int:
+    response = client.get(url)
+    # Streaming bodies do their work while being consumed
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def _send_all_reminders() -> None:
+    """One pass of the reminder pipeline with the SMS gateway's HTTP replies stubbed out, rolled back afterwards."""
+    from notifications.tasks import send_all_reminders
+
+    with db_transaction.atomic():
+        accepted = mock.Mock(status_code=200, text='1000')
+        with mock.patch('requests.Session.post', return_value=accepted):
+            with override_settings(MNOTIFY_API_KEY='benchmark', MNOTIFY_SENDER_ID='benchmark', MNOTIFY_RATE_LIMIT=0):
+                send_all_reminders()
+        # Leave no ReminderLog rows behind, so every run sends the same reminders
+        db_transaction.set_rollback(True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_summary(user) -> dict:
+    from analytics.models import Event
+    from finance.models import Subscription, Transaction
+    from tasks.models import Task
+    from worklogs.models import WorkLog
+
+    return {
+        'users': benchmark_users().count(),
+        'user': user.username,
+        'transactions': Transaction.objects.filter(user=user).count(),
+        'tasks': Task.objects.filter(user=user).count(),
+        'worklogs': WorkLog.objects.filter(user=user).count(),
+        'events': Event.objects.filter(user=user).count(),
+        'subscriptions': Subscription.objects.filter(user=user).count(),
+        'transactions_total': Transaction.objects.count(),
+    }
+
+
+def run(user=None, repeat: int = 20, warmup: int = 3, only: Optional[List[str]] = None, progress=None) -> dict:
+    """
+    Measure every scenario (or just those named in `only`) as `user`, the
+    first benchmark user by default. Returns a JSON-serialisable report.
+    """
+    from myhub.dashboard import invalidate_dashboard_stats
+
+    if user is None:
+        user = benchmark_users().order_by('pk').first()
+        if user is None:
+            raise ValueError('No benchmark users found; run seed_benchmark_data first.')
+
+    results = {}
+    # DEBUG off so no query log is kept, as in production
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        # Broken views are reported with their 500 status instead of aborting the run
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        scenarios = {name: (lambda url=url: _get(client, url), None) for name, url in view_scenarios(user).items()}
+        scenarios['dashboard_cold'] = (lambda: _get(client, reverse('home')), lambda: invalidate_dashboard_stats(user.pk))
+        scenarios['send_all_reminders'] = (_send_all_reminders, None)
+
+        for name, (scenario, setup) in scenarios.items():
+            if only and name not in only:
+                continue
+            results[name] = measure(scenario, repeat, warmup, setup=setup)
+            if progress:
+                progress(name, results[name])
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'vendor': connection.vendor,
+            'database': os.path.basename(str(connection.settings_dict['NAME'])),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'dataset': dataset_summary(user),
+        },
+        'results': results,
+    }
+
+
+def compare(previous: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Describe scenarios whose p50 latency or query count got worse between two reports."""
+    lines = []
+    for name, now in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            continue
+        if now['queries'] > before['queries']:
+            lines.append(f"{name}: {before['queries']} -> {now['queries']} queries")
+        if before['p50_ms'] and now['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            change = (now['p50_ms'] / before['p50_ms'] - 1) * 100
+            lines.append(f"{name}: p50 {before['p50_ms']}ms -> {now['p50_ms']}ms (+{change:.0f}%)")
+    return lines
@@ -0,0 +1,205 @@
+"""
+Bulk generation of a realistic dataset for the benchmark users.
+
+Rows are inserted with batched bulk_create(), so the derived ledger tables
+(balances, daily series, monthly rollups) are rebuilt once at the end, the
+same way the statement importer does it. The random generator is seeded,
+so two runs with the same arguments produce the same data.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.utils import timezone
+
+USERNAME_PREFIX = 'bench-user-'
+PASSWORD = 'benchmark'
+BATCH_SIZE = 2000
+
+DEFAULT_VOLUMES = {
+    'accounts': 5,
+    'projects': 20,
+    'transactions': 100_000,
+    'tasks': 5000,
+    'worklogs': 3000,
+    'events': 3000,
+    'courses': 20,
+    'subscriptions': 300,
+}
+
+# Spread of transaction dates back from today
+HISTORY_DAYS = 3 * 365
+
+WORDS = (
+    'invoice', 'groceries', 'rent', 'fuel', 'coffee', 'salary', 'client', 'refund', 'internet',
+    'electricity', 'airtime', 'lunch', 'taxi', 'books', 'training', 'hosting', 'design', 'review',
+    'release', 'meeting', 'report', 'budget', 'backup', 'migration', 'kumasi', 'accra', 'tamale',
+)
+
+
+def benchmark_users():
+    return get_user_model().objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _bulk(model, rows, progress=None):
+    model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    if progress:
+        progress(f'{len(rows)} {model._meta.verbose_name_plural}')
+
+
+def seed(users: int = 2, volumes: dict = None, random_seed: int = 0, progress=None) -> dict:
+    """
+    Create `users` benchmark users, each with `volumes` rows per model
+    (DEFAULT_VOLUMES for anything not given). Returns the row counts created.
+    """
+    from accounts.models import UserProfile
+    from analytics.models import Event
+    from finance.ledger import rebuild_balances, rebuild_daily_balances, rebuild_monthly_rollups
+    from finance.models import Account, ExchangeRate, Subscription, Transaction
+    from learning.models import Course
+    from myhub.dashboard import invalidate_dashboard_stats
+    from projects.models import Project
+    from tasks.models import Task
+    from worklogs.models import WorkLog
+
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    today = now.date()
+    User = get_user_model()
+
+    password = make_password(PASSWORD)
+    first = benchmark_users().count()
+    created_users = User.objects.bulk_create([
+        User(username=f'{USERNAME_PREFIX}{first + index}', email=f'bench{first + index}@example.com', password=password)
+        for index in range(users)
+    ])
+    # bulk_create() only returns primary keys on backends that support it
+    created_users = list(benchmark_users().filter(username__in=[user.username for user in created_users]).order_by('pk'))
+    _bulk(UserProfile, [
+        UserProfile(user=user, phone_number=f'+23320{user.pk:07d}', default_currency='GHS')
+        for user in created_users
+    ], progress)
+
+    # Non-GHS accounts need a rate so the dashboard totals convert
+    ExchangeRate.objects.get_or_create(base='USD', quote='GHS', date=today - timedelta(days=HISTORY_DAYS), defaults={'rate': Decimal('12.5')})
+
+    counts = dict.fromkeys(volumes, 0)
+    counts['users'] = len(created_users)
+    for user in created_users:
+        Project.objects.bulk_create([
+            Project(owner=user, title=f'Project {index} {_words(rng, 2)}', description=_words(rng, 12),
+                    status=rng.choice(('ongoing', 'ongoing', 'completed')))
+            for index in range(volumes['projects'])
+        ])
+        projects = list(Project.objects.filter(owner=user))
+        Account.objects.bulk_create([
+            Account(user=user, name=f'Account {index}', account_type=rng.choice([key for key, _ in Account.ACCOUNT_TYPES]),
+                    currency='USD' if index == 1 else 'GHS', initial_balance=Decimal(rng.randint(0, 50_000)))
+            for index in range(volumes['accounts'])
+        ])
+        accounts = list(Account.objects.filter(user=user))
+
+        transactions = []
+        for _ in range(volumes['transactions']):
+            t_type = 'income' if rng.random() < 0.3 else 'expense'
+            categories = Transaction.INCOME_CATEGORIES if t_type == 'income' else Transaction.EXPENSE_CATEGORIES
+            account = rng.choice(accounts)
+            transactions.append(Transaction(
+                user=user, account=account, currency=account.currency, t_type=t_type,
+                project=rng.choice(projects) if projects and rng.random() < 0.2 else None,
+                amount=Decimal(rng.randint(100, 500_000)) / 100,
+                category=rng.choice(categories)[0],
+                description=_words(rng, rng.randint(2, 6)),
+                date=today - timedelta(days=rng.randrange(HISTORY_DAYS)),
+            ))
+        _bulk(Transaction, transactions, progress)
+
+        tasks = []
+        for _ in range(volumes['tasks']):
+            status = rng.choice(('pending', 'in_progress', 'completed'))
+            # Mostly past and future deadlines, with a slice inside the reminder window
+            if rng.random() < 0.05:
+                deadline = now + timedelta(minutes=rng.randint(1, 120))
+            else:
+                deadline = now + timedelta(days=rng.randint(-180, 60), minutes=rng.randint(0, 1439))
+            tasks.append(Task(
+                user=user, title=_words(rng, 4), description=_words(rng, 15),
+                project=rng.choice(projects) if projects and rng.random() < 0.5 else None,
+                status=status, priority=rng.choice(('low', 'medium', 'high')), deadline=deadline,
+                completed_at=deadline if status == 'completed' else None,
+            ))
+        for task in tasks:
+            task.reminder_due_at = task.get_reminder_due_at()
+        _bulk(Task, tasks, progress)
+        task_ids = list(Task.objects.filter(user=user).values_list('pk', flat=True)[:500])
+
+        worklogs = []
+        for _ in range(volumes['worklogs']):
+            status = rng.choice(('in_progress', 'completed', 'blocked', 'on_hold'))
+            worklogs.append(WorkLog(
+                user=user, title=_words(rng, 4), description=_words(rng, 20), notes=_words(rng, 8),
+                project=rng.choice(projects) if projects and rng.random() < 0.5 else None,
+                task_id=rng.choice(task_ids) if task_ids and rng.random() < 0.3 else None,
+                status=status, completed_at=now - timedelta(days=rng.randint(0, 365)) if status == 'completed' else None,
+            ))
+        _bulk(WorkLog, worklogs, progress)
+
+        events = []
+        for _ in range(volumes['events']):
+            start = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1439))
+            duration = timedelta(minutes=rng.randint(15, 240))
+            events.append(Event(
+                user=user, title=_words(rng, 3), description=_words(rng, 10),
+                project=rng.choice(projects) if projects and rng.random() < 0.5 else None,
+                event_type=rng.choice([key for key, _ in Event.EVENT_TYPES]),
+                start_time=start, end_time=start + duration, duration=duration, tags=[rng.choice(WORDS)],
+            ))
+        _bulk(Event, events, progress)
+
+        _bulk(Course, [
+            Course(owner=user, title=f'Course {index} {_words(rng, 2)}', description=_words(rng, 12), progress=rng.randint(0, 100))
+            for index in range(volumes['courses'])
+        ], progress)
+
+        subscriptions = [
+            Subscription(
+                user=user, account=rng.choice(accounts), name=f'Subscription {index} {_words(rng, 1)}',
+                amount=Decimal(rng.randint(500, 20_000)) / 100, currency='GHS',
+                next_payment_date=today + timedelta(days=rng.randint(0, 60)),
+                frequency=rng.choice(('weekly', 'monthly', 'quarterly', 'yearly')),
+                status=rng.choice(('active', 'active', 'active', 'paused', 'canceled')),
+                reminder_days_before=rng.randint(1, 7), enable_reminders=rng.random() < 0.9,
+            )
+            for index in range(volumes['subscriptions'])
+        ]
+        for subscription in subscriptions:
+            subscription.reminder_due_on = subscription.get_reminder_due_on()
+        _bulk(Subscription, subscriptions, progress)
+
+        for name in volumes:
+            counts[name] += volumes[name]
+
+    user_ids = [user.pk for user in created_users]
+    accounts = Account.objects.filter(user_id__in=user_ids)
+    rebuild_balances(accounts)
+    rebuild_daily_balances(accounts)
+    rebuild_monthly_rollups(User.objects.filter(pk__in=user_ids))
+    for user_id in user_ids:
+        invalidate_dashboard_stats(user_id)
+    if progress:
+        progress('ledger rebuilt')
+
+    # Fresh planner statistics, as a long-running production database would have
+    for connection in connections.all():
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+    return counts
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Transaction, Account, Subscription
+
+from .fx import invalidate_rates
+from .models import Transaction, Account, ExchangeRate, Subscription
 
 
 @admin.register(Account)
@@ -37,3 +39,17 @@ class SubscriptionAdmin(admin.ModelAdmin):
     search_fields = ['name', 'purpose', 'notes', 'user__username', 'project__title', 'account__name']
     ordering = ['next_payment_date', 'name']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['date', 'base', 'quote', 'rate']
+    list_filter = ['base', 'quote']
+    search_fields = ['base', 'quote']
+    date_hierarchy = 'date'
+    readonly_fields = ['created_at']
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes bypass ExchangeRate.delete()
+        super().delete_queryset(request, queryset)
+        invalidate_rates()
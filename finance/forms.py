@@ -54,6 +54,40 @@ class TransactionForm(forms.ModelForm):
         return amount
 
 
+class TransactionImportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ('', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX / QFX'),
+    )
+
+    statement = forms.FileField(
+        label='Statement file',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'})
+    )
+    account = forms.ModelChoiceField(
+        queryset=Account.objects.none(),
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    file_format = forms.ChoiceField(
+        label='Format',
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_format = forms.CharField(
+        label='Date format (Optional)',
+        required=False,
+        help_text='e.g. %d/%m/%Y. Leave blank to try common formats.',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '%Y-%m-%d'})
+    )
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            self.fields['account'].queryset = user.accounts.filter(is_active=True)
+
+
 class AccountForm(forms.ModelForm):
     class Meta:
         model = Account
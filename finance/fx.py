@@ -0,0 +1,156 @@
+"""
+Currency conversion for aggregated amounts.
+
+The rate for a currency pair on a day is the latest ExchangeRate row on or
+before that day; when only the opposite pair is stored its inverse is used.
+Lookups go through a small in-process LRU in front of the shared Django
+cache, so converting a page's worth of grouped sums normally costs no
+queries beyond the aggregate itself. Rate edits reach other processes through
+the version key in that cache within LOCAL_CACHE_TTL, as long as the cache
+really is shared (CACHE_URL in settings).
+
+Convert sums, not rows: group by currency in the database and pass the
+groups to convert_totals().
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional, Tuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURRENCY = 'GHS'
+
+LOCAL_CACHE_SIZE = 1024
+# Bounds how long another process's rate edits can go unnoticed by this one
+LOCAL_CACHE_TTL = 60
+SHARED_CACHE_TIMEOUT = 6 * 60 * 60
+VERSION_KEY = 'finance.fx.version'
+
+# Cached in place of a rate for pairs that have none, so misses are not re-queried
+NO_RATE = 'none'
+
+Conversion = namedtuple('Conversion', ['total', 'missing'])
+
+
+class RateCache:
+    """Thread-safe LRU of rate lookups whose entries expire after `ttl` seconds."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Tuple[bool, Optional[Decimal]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value: Optional[Decimal]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local_rates = RateCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+
+def _normalise(currency: str) -> str:
+    return (currency or '').strip().upper()
+
+
+def rates_version():
+    """Token that changes whenever any rate changes, for keying caches derived from rates."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns())
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_rates() -> None:
+    """Drop cached rates everywhere; called whenever an ExchangeRate changes."""
+    _local_rates.clear()
+    # A fresh version orphans every shared entry without having to enumerate them
+    cache.set(VERSION_KEY, time.time_ns())
+
+
+def _query_rate(base: str, quote: str, on: date) -> Optional[Decimal]:
+    from .models import ExchangeRate
+
+    rates = ExchangeRate.objects.filter(date__lte=on).order_by('-date').values_list('rate', flat=True)
+    rate = rates.filter(base=base, quote=quote).first()
+    if rate is not None:
+        return rate
+    inverse = rates.filter(base=quote, quote=base).first()
+    if inverse:
+        return Decimal(1) / inverse
+    return None
+
+
+def get_rate(base: str, quote: str, on: Optional[date] = None) -> Optional[Decimal]:
+    """Units of `quote` per unit of `base` on `on` (today by default), or None if unknown."""
+    base, quote = _normalise(base), _normalise(quote)
+    if base == quote:
+        return Decimal(1)
+    on = on or timezone.localdate()
+
+    key = (base, quote, on)
+    found, rate = _local_rates.get(key)
+    if found:
+        return rate
+
+    shared_key = f'finance.fx:{rates_version()}:{base}:{quote}:{on.isoformat()}'
+    cached = cache.get(shared_key)
+    if cached is None:
+        rate = _query_rate(base, quote, on)
+        cache.set(shared_key, NO_RATE if rate is None else rate, SHARED_CACHE_TIMEOUT)
+    else:
+        rate = None if cached == NO_RATE else cached
+    _local_rates.set(key, rate)
+    return rate
+
+
+def convert_totals(groups: Iterable[Tuple[str, Decimal]], target: str, on: Optional[date] = None) -> Conversion:
+    """
+    Convert (currency, amount) groups into `target` and add them up. Groups
+    in a currency without a rate are left out of the total and their
+    currency codes returned in `missing`. Blank currencies count as `target`.
+    """
+    target = _normalise(target)
+    total = Decimal('0.00')
+    missing = set()
+    for currency, amount in groups:
+        if not amount:
+            continue
+        currency = _normalise(currency) or target
+        rate = get_rate(currency, target, on)
+        if rate is None:
+            missing.add(currency)
+            continue
+        total += Decimal(amount) * rate
+    if missing:
+        logger.warning("No %s exchange rate for %s; left out of the total", target, ', '.join(sorted(missing)))
+    return Conversion(total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), sorted(missing))
+
+
+def user_currency(user) -> str:
+    """The user's UserProfile.default_currency, or DEFAULT_CURRENCY without a profile."""
+    profile = getattr(user, 'userprofile', None)
+    return _normalise(profile.default_currency) if profile and profile.default_currency else DEFAULT_CURRENCY
@@ -0,0 +1,422 @@
+"""
+Incremental maintenance of the tables derived from Transaction: the
+per-account running balance (AccountBalance), the daily closing-balance
+series (AccountDailyBalance) and the monthly category rollup
+(TransactionMonthlyRollup).
+
+Transaction.save() and Transaction.delete() call apply_transaction_change()
+inside their own atomic block with the row state before and after the write,
+so the ledger is always committed together with the transaction itself.
+Transactions deleted by a cascade (an account or user being deleted) or a
+queryset delete() go through the post_delete receiver connected in
+FinanceConfig.ready() instead, and bulk imports call
+apply_inserted_transactions() for each batch they insert.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Max, Q, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .models import Account, AccountBalance, AccountDailyBalance, Transaction, TransactionMonthlyRollup
+
+# Only the columns the ledger cares about, so snapshots stay a cheap single-row read
+SNAPSHOT_FIELDS = ('pk', 'user_id', 'account_id', 't_type', 'amount', 'date', 'category', 'currency')
+
+TransactionSnapshot = namedtuple('TransactionSnapshot', SNAPSHOT_FIELDS)
+
+REBUILD_BATCH_SIZE = 500
+
+
+def snapshot(transaction: Transaction) -> TransactionSnapshot:
+    """Capture the ledger-relevant state of an in-memory transaction"""
+    # Coerced to the stored types, as objects.create(date='2026-09-03') is allowed
+    return TransactionSnapshot(*(
+        _snapshot_field(field).to_python(getattr(transaction, field)) for field in SNAPSHOT_FIELDS
+    ))
+
+
+def _snapshot_field(name):
+    meta = Transaction._meta
+    return meta.pk if name == 'pk' else meta.get_field(name)
+
+
+def fetch_snapshot(pk) -> Optional[TransactionSnapshot]:
+    """Read the persisted ledger-relevant state of a transaction, if it exists"""
+    row = Transaction.objects.filter(pk=pk).values_list(*SNAPSHOT_FIELDS).first()
+    return TransactionSnapshot(*row) if row else None
+
+
+def _signed_totals(snap: TransactionSnapshot, sign: int):
+    amount = Decimal(str(snap.amount)) * sign
+    if snap.t_type == 'income':
+        return amount, Decimal('0')
+    return Decimal('0'), amount
+
+
+def apply_transaction_change(previous: Optional[TransactionSnapshot], current: Optional[TransactionSnapshot]) -> None:
+    """
+    Move the contribution of `previous` out of its account's ledger row and
+    the contribution of `current` into its account's row. Either side may be
+    None (create/delete), and the two may point at different accounts when a
+    transaction is reassigned.
+    """
+    if previous == current:
+        return
+
+    _apply_rollup_deltas(previous, current)
+
+    deltas: Dict[int, list] = {}
+    daily_deltas: Dict[tuple, Decimal] = {}
+    for snap, sign in ((previous, -1), (current, 1)):
+        if snap is None or snap.account_id is None:
+            continue
+        income, expense = _signed_totals(snap, sign)
+        delta = deltas.setdefault(snap.account_id, [Decimal('0'), Decimal('0')])
+        delta[0] += income
+        delta[1] += expense
+        day_key = (snap.account_id, snap.date)
+        daily_deltas[day_key] = daily_deltas.get(day_key, Decimal('0')) + income - expense
+
+    # Oldest day first, so a day row created below opens from rows already shifted
+    for (account_id, day), net in sorted(daily_deltas.items()):
+        _apply_daily_delta(account_id, day, net)
+
+    for account_id, (income, expense) in deltas.items():
+        _, created = AccountBalance.objects.get_or_create(account_id=account_id)
+        if created:
+            # First write against this account: derive totals from scratch,
+            # which already includes the row just saved or deleted
+            rebuild_balances(Account.objects.filter(pk=account_id))
+            continue
+        if income or expense:
+            AccountBalance.objects.filter(account_id=account_id).update(
+                income_total=F('income_total') + income,
+                expense_total=F('expense_total') + expense,
+                balance=F('balance') + income - expense,
+                updated_at=timezone.now(),
+            )
+
+    previous_account = previous.account_id if previous else None
+    current_account = current.account_id if current else None
+    if previous_account == current_account:
+        return
+
+    if current_account is not None:
+        AccountBalance.objects.filter(account_id=current_account).update(
+            last_transaction_id=Greatest(Coalesce(F('last_transaction_id'), Value(0)), Value(current.pk))
+        )
+    if previous_account is not None:
+        # Only rescan when the row that left the account was its latest one
+        AccountBalance.objects.filter(account_id=previous_account, last_transaction_id=previous.pk).update(
+            last_transaction_id=Subquery(
+                Transaction.objects.filter(account_id=previous_account).order_by('-pk').values('pk')[:1]
+            )
+        )
+
+
+def _opening_balance(account_id, day) -> Decimal:
+    """The account's closing balance on the day before `day`"""
+    opening = (
+        AccountDailyBalance.objects.filter(account_id=account_id, date__lt=day)
+        .order_by('-date')
+        .values_list('closing_balance', flat=True)
+        .first()
+    )
+    if opening is not None:
+        return opening
+    # No series before `day`: derive it from the transactions themselves
+    initial = Account.objects.filter(pk=account_id).values_list('initial_balance', flat=True).first()
+    totals = Transaction.objects.filter(account_id=account_id, date__lt=day).aggregate(
+        income=Sum('amount', filter=Q(t_type='income')),
+        expense=Sum('amount', filter=Q(t_type='expense')),
+    )
+    return (initial or Decimal('0.00')) + (totals['income'] or Decimal('0.00')) - (totals['expense'] or Decimal('0.00'))
+
+
+def _apply_daily_delta(account_id, day, net: Decimal) -> None:
+    """Shift the closing balance of `day` and every later day by `net`"""
+    if not AccountDailyBalance.objects.filter(account_id=account_id, date=day).exists():
+        AccountDailyBalance.objects.get_or_create(
+            account_id=account_id, date=day, defaults={'closing_balance': _opening_balance(account_id, day)}
+        )
+    if net:
+        AccountDailyBalance.objects.filter(account_id=account_id, date__gte=day).update(
+            closing_balance=F('closing_balance') + net
+        )
+
+
+def _rollup_key(snap: TransactionSnapshot):
+    return (snap.user_id, snap.date.replace(day=1), snap.t_type, snap.category or '', snap.currency)
+
+
+def _apply_rollup_deltas(previous: Optional[TransactionSnapshot], current: Optional[TransactionSnapshot]) -> None:
+    _apply_signed_rollups(((previous, -1), (current, 1)))
+
+
+def _apply_signed_rollups(signed_snapshots) -> None:
+    """Add each (snapshot, +1/-1) pair's amount and count to its rollup row"""
+    deltas: Dict[tuple, list] = {}
+    for snap, sign in signed_snapshots:
+        if snap is None:
+            continue
+        delta = deltas.setdefault(_rollup_key(snap), [Decimal('0'), 0])
+        delta[0] += Decimal(str(snap.amount)) * sign
+        delta[1] += sign
+
+    for (user_id, month, t_type, category, currency), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        key = dict(user_id=user_id, month=month, t_type=t_type, category=category, currency=currency)
+        updated = TransactionMonthlyRollup.objects.filter(**key).update(
+            total=F('total') + amount, count=F('count') + count
+        )
+        if not updated and count >= 0:
+            # Nothing to take a removal away from, e.g. the user is being deleted
+            try:
+                with db_transaction.atomic():
+                    TransactionMonthlyRollup.objects.create(total=amount, count=count, **key)
+            except IntegrityError:
+                # A concurrent writer created the row first
+                TransactionMonthlyRollup.objects.filter(**key).update(
+                    total=F('total') + amount, count=F('count') + count
+                )
+        if count < 0:
+            TransactionMonthlyRollup.objects.filter(count__lte=0, **key).delete()
+
+
+def apply_inserted_transactions(transactions: Iterable[Transaction]) -> None:
+    """
+    Add transactions written with bulk_create() to the ledger, in the caller's
+    atomic block: one update per rollup key and per account, and each
+    account's daily series re-derived from the earliest day inserted.
+    """
+    snapshots = [snapshot(transaction) for transaction in transactions]
+    _apply_signed_rollups((snap, 1) for snap in snapshots)
+
+    accounts: Dict[int, list] = {}
+    for snap in snapshots:
+        if snap.account_id is None:
+            continue
+        income, expense = _signed_totals(snap, 1)
+        totals = accounts.setdefault(snap.account_id, [Decimal('0'), Decimal('0'), snap.date])
+        totals[0] += income
+        totals[1] += expense
+        totals[2] = min(totals[2], snap.date)
+
+    for account_id, (income, expense, earliest) in sorted(accounts.items()):
+        # Updating the balance row first holds its lock, so concurrent saves to the
+        # account wait for this batch instead of interleaving with the re-derivation
+        updated = AccountBalance.objects.filter(account_id=account_id).update(
+            income_total=F('income_total') + income,
+            expense_total=F('expense_total') + expense,
+            balance=F('balance') + income - expense,
+            last_transaction_id=Subquery(
+                Transaction.objects.filter(account_id=account_id).order_by('-pk').values('pk')[:1]
+            ),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            rebuild_balances(Account.objects.filter(pk=account_id))
+        _rederive_daily_balances(account_id, earliest)
+
+
+def _rederive_daily_balances(account_id, start) -> None:
+    """Recompute an account's daily closing balances from `start` on"""
+    running = _opening_balance(account_id, start)
+    days = (
+        Transaction.objects.filter(account_id=account_id, date__gte=start)
+        .order_by('date')
+        .values('date')
+        .annotate(
+            income=Sum('amount', filter=Q(t_type='income')),
+            expense=Sum('amount', filter=Q(t_type='expense')),
+        )
+    )
+    rows = []
+    for day in days:
+        running += (day['income'] or Decimal('0.00')) - (day['expense'] or Decimal('0.00'))
+        rows.append(AccountDailyBalance(account_id=account_id, date=day['date'], closing_balance=running))
+    AccountDailyBalance.objects.filter(account_id=account_id, date__gte=start).delete()
+    AccountDailyBalance.objects.bulk_create(rows, batch_size=REBUILD_BATCH_SIZE)
+
+
+def _transaction_deleted(sender, instance, origin=None, **kwargs):
+    if origin is instance:
+        # Transaction.delete() has already moved the contribution out
+        return
+    if isinstance(origin, QuerySet) and origin.model is Transaction:
+        apply_transaction_change(snapshot(instance), None)
+        return
+    # Cascaded from an account or user: their balance rows go with them,
+    # but the monthly rollup is keyed by user and month
+    _apply_rollup_deltas(snapshot(instance), None)
+
+
+def connect_signals() -> None:
+    post_delete.connect(_transaction_deleted, sender=Transaction, dispatch_uid='finance-ledger-delete')
+
+
+def _rebuild_batch(accounts: Iterable[Account]) -> int:
+    accounts = list(accounts)
+    totals = {
+        row['account_id']: row
+        for row in Transaction.objects.filter(account__in=accounts)
+        .order_by()
+        .values('account_id')
+        .annotate(
+            income=Sum('amount', filter=Q(t_type='income')),
+            expense=Sum('amount', filter=Q(t_type='expense')),
+            last_id=Max('pk'),
+        )
+    }
+    rows = []
+    for account in accounts:
+        row = totals.get(account.pk, {})
+        income = row.get('income') or Decimal('0.00')
+        expense = row.get('expense') or Decimal('0.00')
+        rows.append(AccountBalance(
+            account=account,
+            income_total=income,
+            expense_total=expense,
+            balance=account.initial_balance + income - expense,
+            last_transaction_id=row.get('last_id'),
+        ))
+    AccountBalance.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['account'],
+        update_fields=['income_total', 'expense_total', 'balance', 'last_transaction_id', 'updated_at'],
+    )
+    return len(rows)
+
+
+def rebuild_balances(accounts=None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Recompute ledger rows from the raw transactions for the given Account
+    queryset (all accounts by default). Returns the number of rows written.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    accounts = accounts.order_by('pk').only('pk', 'initial_balance')
+
+    written = 0
+    batch = []
+    for account in accounts.iterator(chunk_size=batch_size):
+        batch.append(account)
+        if len(batch) >= batch_size:
+            written += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        written += _rebuild_batch(batch)
+    return written
+
+
+def _rebuild_daily_batch(accounts: Iterable[Account], batch_size: int) -> int:
+    accounts = list(accounts)
+    by_pk = {account.pk: account for account in accounts}
+    days = (
+        Transaction.objects.filter(account__in=accounts)
+        .order_by('account_id', 'date')
+        .values('account_id', 'date')
+        .annotate(
+            income=Sum('amount', filter=Q(t_type='income')),
+            expense=Sum('amount', filter=Q(t_type='expense')),
+        )
+    )
+    rows = []
+    running_account = None
+    running = Decimal('0.00')
+    for day in days:
+        if day['account_id'] != running_account:
+            running_account = day['account_id']
+            running = by_pk[running_account].initial_balance
+        running += (day['income'] or Decimal('0.00')) - (day['expense'] or Decimal('0.00'))
+        rows.append(AccountDailyBalance(account_id=running_account, date=day['date'], closing_balance=running))
+
+    with db_transaction.atomic():
+        AccountDailyBalance.objects.filter(account__in=accounts).delete()
+        AccountDailyBalance.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_daily_balances(accounts=None, batch_size: int = REBUILD_BATCH_SIZE, progress=None) -> int:
+    """
+    Recompute the daily closing-balance series from the raw transactions,
+    `batch_size` accounts at a time so each batch holds its locks briefly.
+    `progress`, if given, is called with (accounts_done, rows_written) after
+    each batch. Returns the number of daily rows written.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    accounts = accounts.order_by('pk').only('pk', 'initial_balance')
+
+    done = 0
+    written = 0
+    batch = []
+    for account in accounts.iterator(chunk_size=batch_size):
+        batch.append(account)
+        if len(batch) >= batch_size:
+            written += _rebuild_daily_batch(batch, batch_size)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, written)
+    if batch:
+        written += _rebuild_daily_batch(batch, batch_size)
+        done += len(batch)
+        if progress:
+            progress(done, written)
+    return written
+
+
+def _rebuild_rollup_batch(user_ids, batch_size: int) -> int:
+    groups = (
+        Transaction.objects.filter(user_id__in=user_ids)
+        .annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'month', 't_type', 'category', 'currency')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+    )
+    rows = [
+        TransactionMonthlyRollup(
+            user_id=group['user_id'],
+            month=group['month'],
+            t_type=group['t_type'],
+            category=group['category'],
+            currency=group['currency'],
+            total=group['total'],
+            count=group['count'],
+        )
+        for group in groups
+    ]
+    with db_transaction.atomic():
+        TransactionMonthlyRollup.objects.filter(user_id__in=user_ids).delete()
+        TransactionMonthlyRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_monthly_rollups(users=None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Recompute the monthly rollup rows for the given User queryset (all users
+    by default), `batch_size` users at a time. Returns the number of rows written.
+    """
+    if users is None:
+        users = get_user_model().objects.all()
+    user_ids = users.order_by('pk').values_list('pk', flat=True)
+
+    written = 0
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            written += _rebuild_rollup_batch(batch, batch_size)
+            batch = []
+    if batch:
+        written += _rebuild_rollup_batch(batch, batch_size)
+    return written
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from finance.ledger import REBUILD_BATCH_SIZE, rebuild_daily_balances
+from finance.models import Account
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-day closing-balance history of accounts from their transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Only backfill accounts owned by this username.",
+        )
+        parser.add_argument(
+            "--account",
+            type=int,
+            action="append",
+            help="Only backfill the account with this id (repeatable).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help="Number of accounts rebuilt per batch.",
+        )
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.all()
+        if options["user"]:
+            accounts = accounts.filter(user__username=options["user"])
+        if options["account"]:
+            accounts = accounts.filter(pk__in=options["account"])
+
+        def report(done, written):
+            self.stdout.write(f"{done} account(s) processed, {written} daily row(s) written.")
+
+        written = rebuild_daily_balances(accounts, batch_size=options["batch_size"], progress=report)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {written} daily balance row(s)."))
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.importers import (
+    DEFAULT_DATE_FORMATS,
+    IMPORT_BATCH_SIZE,
+    StatementError,
+    detect_format,
+    import_transactions,
+    iter_statement_rows,
+)
+from finance.models import Account
+
+
+class Command(BaseCommand):
+    help = "Bulk import transactions for an account from a CSV or OFX bank statement."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the statement file.")
+        parser.add_argument("--user", required=True, help="Username that owns the account.")
+        parser.add_argument("--account", type=int, required=True, help="Id of the account to import into.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ofx"],
+            help="Statement format (default: guessed from the file extension).",
+        )
+        parser.add_argument("--currency", help="Currency of the amounts (default: the account's currency).")
+        parser.add_argument(
+            "--date-format",
+            action="append",
+            help="strptime format for CSV dates (repeatable; default tries common formats).",
+        )
+        parser.add_argument(
+            "--map",
+            action="append",
+            default=[],
+            metavar="FIELD=COLUMN",
+            help="Map a field (date, amount, description, category, t_type, credit, debit) to a CSV column.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Number of rows inserted per batch.",
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+        account = Account.objects.filter(pk=options["account"], user=user).first()
+        if account is None:
+            raise CommandError(f"Account {options['account']} does not belong to '{user.username}'.")
+
+        column_map = {}
+        for mapping in options["map"]:
+            field, sep, column = mapping.partition("=")
+            if not sep:
+                raise CommandError(f"Invalid --map '{mapping}', expected FIELD=COLUMN.")
+            column_map[field.strip()] = column
+
+        file_format = options["format"] or detect_format(options["path"])
+        date_formats = options["date_format"] or DEFAULT_DATE_FORMATS
+
+        def report(results):
+            self.stdout.write(
+                f"Read {results['read']} line(s): {results['created']} created, "
+                f"{results['duplicates']} duplicate(s), {len(results['errors'])} error(s)."
+            )
+
+        try:
+            with open(options["path"], "rb") as statement:
+                rows = iter_statement_rows(statement, file_format, column_map=column_map, date_formats=date_formats)
+                results = import_transactions(
+                    user=user,
+                    account=account,
+                    rows=rows,
+                    currency=options["currency"],
+                    batch_size=options["batch_size"],
+                    progress=report,
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except StatementError as exc:
+            raise CommandError(str(exc))
+
+        for line, message in results["errors"]:
+            self.stderr.write(f"Line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {results['created']} transaction(s), skipped {results['duplicates']} duplicate(s)."
+        ))
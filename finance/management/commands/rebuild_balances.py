@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from finance.ledger import REBUILD_BATCH_SIZE, rebuild_balances
+from finance.models import Account
+
+
+class Command(BaseCommand):
+    help = "Recompute the running account balances from the raw transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Only rebuild accounts owned by this username.",
+        )
+        parser.add_argument(
+            "--account",
+            type=int,
+            action="append",
+            help="Only rebuild the account with this id (repeatable).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help="Number of accounts recomputed per query batch.",
+        )
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.all()
+        if options["user"]:
+            accounts = accounts.filter(user__username=options["user"])
+        if options["account"]:
+            accounts = accounts.filter(pk__in=options["account"])
+
+        written = rebuild_balances(accounts, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt balances for {written} account(s)."))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from finance.ledger import REBUILD_BATCH_SIZE, rebuild_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly transaction rollups from the raw transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            help="Only rebuild rollups for this username (repeatable).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help="Number of users rebuilt per batch.",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        if options["user"]:
+            users = users.filter(username__in=options["user"])
+
+        written = rebuild_monthly_rollups(users, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} monthly rollup row(s)."))
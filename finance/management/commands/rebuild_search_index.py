@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from myhub.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Reinstall and repopulate the full-text search indexes of every searchable model."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias to rebuild the indexes on.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        backend = get_backend(using)
+        for model in apps.get_models():
+            fields = getattr(model, "search_fields", None)
+            if not isinstance(fields, tuple):
+                continue
+            with connections[using].schema_editor() as schema_editor:
+                backend.rebuild(schema_editor, model, fields)
+            self.stdout.write(f"Rebuilt search index for {model._meta.label}.")
+        self.stdout.write(self.style.SUCCESS("Search indexes are up to date."))
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Max, Q, Sum
+
+
+def backfill_balances(apps, schema_editor):
+    Account = apps.get_model('finance', 'Account')
+    AccountBalance = apps.get_model('finance', 'AccountBalance')
+    Transaction = apps.get_model('finance', 'Transaction')
+
+    totals = {
+        row['account_id']: row
+        for row in Transaction.objects.filter(account__isnull=False)
+        .order_by()
+        .values('account_id')
+        .annotate(
+            income=Sum('amount', filter=Q(t_type='income')),
+            expense=Sum('amount', filter=Q(t_type='expense')),
+            last_id=Max('pk'),
+        )
+    }
+    rows = []
+    for account in Account.objects.only('pk', 'initial_balance').iterator():
+        row = totals.get(account.pk, {})
+        income = row.get('income') or Decimal('0.00')
+        expense = row.get('expense') or Decimal('0.00')
+        rows.append(AccountBalance(
+            account_id=account.pk,
+            income_total=income,
+            expense_total=expense,
+            balance=account.initial_balance + income - expense,
+            last_transaction_id=row.get('last_id'),
+        ))
+    AccountBalance.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_subscription_enable_reminders_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger', serialize=False, to='finance.account')),
+                ('income_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('last_transaction_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:13
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def backfill_daily_balances(apps, schema_editor):
+    Account = apps.get_model('finance', 'Account')
+    AccountDailyBalance = apps.get_model('finance', 'AccountDailyBalance')
+    Transaction = apps.get_model('finance', 'Transaction')
+
+    initial = dict(Account.objects.values_list('pk', 'initial_balance'))
+    days = (
+        Transaction.objects.filter(account__isnull=False)
+        .order_by('account_id', 'date')
+        .values('account_id', 'date')
+        .annotate(
+            income=Sum('amount', filter=Q(t_type='income')),
+            expense=Sum('amount', filter=Q(t_type='expense')),
+        )
+    )
+    batch = []
+    running_account = None
+    running = Decimal('0.00')
+    for day in days.iterator(chunk_size=1000):
+        if day['account_id'] != running_account:
+            running_account = day['account_id']
+            running = initial[running_account]
+        running += (day['income'] or Decimal('0.00')) - (day['expense'] or Decimal('0.00'))
+        batch.append(AccountDailyBalance(account_id=running_account, date=day['date'], closing_balance=running))
+        if len(batch) >= 1000:
+            AccountDailyBalance.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        AccountDailyBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_accountbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('closing_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balances', to='finance.account')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('account', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_balances, migrations.RunPython.noop),
+    ]
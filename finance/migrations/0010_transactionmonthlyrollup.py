@@ -0,0 +1,53 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('finance', 'Transaction')
+    TransactionMonthlyRollup = apps.get_model('finance', 'TransactionMonthlyRollup')
+
+    groups = (
+        Transaction.objects.annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'month', 't_type', 'category', 'currency')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+    )
+    TransactionMonthlyRollup.objects.bulk_create(
+        (TransactionMonthlyRollup(**group) for group in groups.iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_accountdailybalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('t_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('category', models.CharField(blank=True, max_length=30)),
+                ('currency', models.CharField(max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month', 't_type', 'category'],
+                'unique_together': {('user', 'month', 't_type', 'category', 'currency')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_transaction_import_hash'),
+        ('projects', '0003_alter_project_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='finance_tra_user_id_3294c0_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='finance_tra_user_id_9c83d9_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_transaction_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('base', models.CharField(max_length=10)),
+                ('quote', models.CharField(max_length=10)),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-date', 'base', 'quote'],
+                'unique_together': {('base', 'quote', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.9 on 2026-10-18 07:02
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_reminder_due_on(apps, schema_editor):
+    Subscription = apps.get_model('finance', 'Subscription')
+
+    # Only reminders that can still be sent; past payment dates stay NULL
+    subscriptions = Subscription.objects.filter(
+        status='active', enable_reminders=True, next_payment_date__gte=date.today(),
+    ).only('pk', 'next_payment_date', 'reminder_days_before')
+    batch = []
+    for subscription in subscriptions.iterator(chunk_size=1000):
+        subscription.reminder_due_on = subscription.next_payment_date - timedelta(days=subscription.reminder_days_before)
+        batch.append(subscription)
+        if len(batch) >= 1000:
+            Subscription.objects.bulk_update(batch, ['reminder_due_on'])
+            batch = []
+    Subscription.objects.bulk_update(batch, ['reminder_due_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0014_exchangerate'),
+        ('projects', '0003_alter_project_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='reminder_due_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('reminder_due_on__isnull', False)), fields=['reminder_due_on'], name='subscription_reminder_due_idx'),
+        ),
+        migrations.RunPython(backfill_reminder_due_on, migrations.RunPython.noop),
+    ]
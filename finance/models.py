@@ -1,13 +1,42 @@
 from decimal import Decimal
 from datetime import timedelta, date
 
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 
+BALANCE_FIELD = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+class AccountQuerySet(models.QuerySet):
+    def with_balances(self):
+        """Annotate income, expense and balance on every account in a single query"""
+        zero = models.Value(Decimal('0.00'))
+        return self.annotate(
+            income=Coalesce('ledger__income_total', zero, output_field=BALANCE_FIELD),
+            expense=Coalesce('ledger__expense_total', zero, output_field=BALANCE_FIELD),
+            balance=Coalesce('ledger__balance', 'initial_balance', output_field=BALANCE_FIELD),
+        )
+
+    def balances_by_currency(self):
+        """Return (currency, summed balance) pairs for the accounts in one aggregate query"""
+        return self.with_balances().order_by().values_list('currency').annotate(total=models.Sum('balance'))
+
+    def total_balance(self, currency=None):
+        """
+        Sum of the current balances of the accounts, computed DB-side. With
+        `currency`, per-currency sums are converted into it (see finance.fx).
+        """
+        if currency:
+            from .fx import convert_totals
+            return convert_totals(self.balances_by_currency(), currency).total
+        return self.with_balances().aggregate(total=models.Sum('balance'))['total'] or Decimal('0.00')
+
+
 class Account(models.Model):
     ACCOUNT_TYPES = (
         ('checking', 'Checking'),
@@ -27,6 +56,8 @@ class Account(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = AccountQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         indexes = [
@@ -40,14 +71,67 @@ class Account(models.Model):
         return reverse('finance:account_detail', kwargs={'pk': self.pk})
 
     def current_balance(self):
-        """Calculate current balance based on initial balance + all transactions"""
-        total_income = self.transactions.filter(t_type='income').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        total_expense = self.transactions.filter(t_type='expense').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        return self.initial_balance + total_income - total_expense
+        """Return the current balance from the maintained ledger row"""
+        if hasattr(self, 'balance'):
+            # Already annotated by AccountQuerySet.with_balances()
+            return self.balance
+        balance = AccountBalance.objects.filter(account_id=self.pk).values_list('balance', flat=True).first()
+        if balance is None:
+            # No transaction has touched this account yet
+            return self.initial_balance
+        return balance
+
+    def save(self, *args, **kwargs):
+        previous_initial = None
+        if self.pk:
+            previous_initial = Account.objects.filter(pk=self.pk).values_list('initial_balance', flat=True).first()
+        super().save(*args, **kwargs)
+        if previous_initial is None or previous_initial == self.initial_balance:
+            return
+        # Keep the ledger and daily series in step with edits to the starting balance
+        AccountBalance.objects.filter(account_id=self.pk).update(
+            balance=self.initial_balance + models.F('income_total') - models.F('expense_total')
+        )
+        AccountDailyBalance.objects.filter(account_id=self.pk).update(
+            closing_balance=models.F('closing_balance') + (self.initial_balance - previous_initial)
+        )
+
+
+class AccountBalance(models.Model):
+    """
+    Running totals for an account, updated in the same DB transaction as
+    every Transaction write so reading a balance is a single-row lookup.
+    Rebuild with `manage.py rebuild_balances` after bulk edits that bypass
+    Transaction.save()/delete().
+    """
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, primary_key=True, related_name='ledger')
+    income_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Balance for account {self.account_id}: {self.balance}"
+
+
+class AccountDailyBalance(models.Model):
+    """
+    Closing balance of an account at the end of each day it had activity.
+    Days without a row carry the previous row's balance forward. Maintained
+    alongside AccountBalance; populate history with `manage.py backfill_daily_balances`.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_balances')
+    date = models.DateField()
+    closing_balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['date']
+        # Doubles as the (account, date) index used for range scans
+        unique_together = [['account', 'date']]
+
+    def __str__(self):
+        return f"Account {self.account_id} on {self.date}: {self.closing_balance}"
 
 
 class Transaction(models.Model):
@@ -85,18 +169,31 @@ class Transaction(models.Model):
     t_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     category = models.CharField(max_length=30, blank=True)
     description = models.TextField(blank=True)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=date.today)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Content hash of the statement line a row was bulk-imported from, used to skip re-imports
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    # Columns covered by the full-text index (see myhub.search), most important first
+    search_fields = ('description', 'category')
 
     class Meta:
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['user', 'date']),
+            # Keyset pagination order of TransactionListView
+            models.Index(fields=['user', '-date', '-created_at', '-id']),
             models.Index(fields=['user', 't_type']),
             models.Index(fields=['user', 'category']),
             models.Index(fields=['account', 'date']),
             models.Index(fields=['project', 'date']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='finance_transaction_unique_import_hash',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.t_type} {self.amount} - {self.category or 'Uncategorized'} on {self.date}"
@@ -104,6 +201,23 @@ class Transaction(models.Model):
     def get_absolute_url(self):
         return reverse('finance:transaction_list')
 
+    def save(self, *args, **kwargs):
+        from .ledger import apply_transaction_change, fetch_snapshot, snapshot
+
+        with db_transaction.atomic():
+            previous = fetch_snapshot(self.pk) if self.pk else None
+            super().save(*args, **kwargs)
+            apply_transaction_change(previous, snapshot(self))
+
+    def delete(self, *args, **kwargs):
+        from .ledger import apply_transaction_change, fetch_snapshot
+
+        with db_transaction.atomic():
+            previous = fetch_snapshot(self.pk)
+            result = super().delete(*args, **kwargs)
+            apply_transaction_change(previous, None)
+        return result
+
     @classmethod
     def get_category_choices(cls, transaction_type):
         """Get category choices based on transaction type"""
@@ -113,6 +227,98 @@ class Transaction(models.Model):
             return cls.EXPENSE_CATEGORIES
 
 
+class TransactionRollupQuerySet(models.QuerySet):
+    def type_totals_by_currency(self):
+        """Return (t_type, currency, total) rows over the selected rollup rows in one query"""
+        return self.order_by().values_list('t_type', 'currency').annotate(amount=models.Sum('total'))
+
+    def type_totals(self, currency=None):
+        """
+        Return {'income': total, 'expense': total} over the selected rollup
+        rows. With `currency`, per-currency sums are converted into it.
+        """
+        if currency:
+            from .fx import convert_totals
+            rows = list(self.type_totals_by_currency())
+            return {
+                t_type: convert_totals(((code, total) for kind, code, total in rows if kind == t_type), currency).total
+                for t_type in ('income', 'expense')
+            }
+        totals = self.aggregate(
+            income=models.Sum('total', filter=models.Q(t_type='income')),
+            expense=models.Sum('total', filter=models.Q(t_type='expense')),
+        )
+        return {key: value or Decimal('0.00') for key, value in totals.items()}
+
+
+class TransactionMonthlyRollup(models.Model):
+    """
+    Per-user monthly sum and count of transactions by type, category and
+    currency. Maintained on every Transaction write so reports and dashboard
+    totals read a handful of rows instead of the raw transaction table.
+    Rebuild with `manage.py rebuild_rollups`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_rollups')
+    month = models.DateField(help_text="First day of the month")
+    t_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=30, blank=True)
+    currency = models.CharField(max_length=10)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    count = models.IntegerField(default=0)
+
+    objects = TransactionRollupQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['month', 't_type', 'category']
+        unique_together = [['user', 'month', 't_type', 'category', 'currency']]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.t_type} {self.category or 'Uncategorized'}: {self.total} {self.currency}"
+
+
+class ExchangeRate(models.Model):
+    """
+    Units of `quote` currency per unit of `base` currency, in effect from
+    `date` until the next row for the pair. Read through finance.fx, whose
+    caches are invalidated by save() and delete(); call
+    finance.fx.invalidate_rates() after bulk writes.
+    """
+    date = models.DateField()
+    base = models.CharField(max_length=10)
+    quote = models.CharField(max_length=10)
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', 'base', 'quote']
+        # Doubles as the index for "latest rate on or before a day" lookups
+        unique_together = [['base', 'quote', 'date']]
+
+    def __str__(self):
+        return f"1 {self.base} = {self.rate} {self.quote} on {self.date}"
+
+    def clean(self):
+        if self.base and self.quote and self.base.strip().upper() == self.quote.strip().upper():
+            raise ValidationError(_('Base and quote currencies must differ.'))
+        if self.rate is not None and self.rate <= 0:
+            raise ValidationError({'rate': _('Rate must be positive.')})
+
+    def save(self, *args, **kwargs):
+        from .fx import invalidate_rates
+
+        self.base = self.base.strip().upper()
+        self.quote = self.quote.strip().upper()
+        super().save(*args, **kwargs)
+        invalidate_rates()
+
+    def delete(self, *args, **kwargs):
+        from .fx import invalidate_rates
+
+        result = super().delete(*args, **kwargs)
+        invalidate_rates()
+        return result
+
+
 class Subscription(models.Model):
     FREQUENCY_CHOICES = (
         ('weekly', 'Weekly'),
@@ -143,6 +349,12 @@ class Subscription(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Day the payment reminder becomes due. Set by save(), cleared once the reminder
+    # has been handled, so the reminder beat only reads rows that are actually due.
+    reminder_due_on = models.DateField(null=True, blank=True, editable=False)
+
+    # Fields reminder_due_on is derived from
+    REMINDER_SOURCE_FIELDS = {'next_payment_date', 'reminder_days_before', 'enable_reminders', 'status'}
 
     class Meta:
         ordering = ['next_payment_date', 'name']
@@ -150,6 +362,10 @@ class Subscription(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'next_payment_date']),
             models.Index(fields=['account', 'next_payment_date']),
+            models.Index(
+                fields=['reminder_due_on'], name='subscription_reminder_due_idx',
+                condition=models.Q(reminder_due_on__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -189,4 +405,14 @@ class Subscription(models.Model):
         # Ensure next_payment_date is not in the past on create
         if not self.pk and self.next_payment_date and self.next_payment_date < date.today():
             raise ValidationError(_('Next payment date cannot be in the past.'))
-        super().save(*args, **kwargs)
\ No newline at end of file
+        self.reminder_due_on = self.get_reminder_due_on()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.REMINDER_SOURCE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'reminder_due_on'}
+        super().save(*args, **kwargs)
+
+    def get_reminder_due_on(self):
+        """Day the SMS reminder for the next payment is due, or None if it gets none."""
+        if not self.enable_reminders or self.status != 'active' or not self.next_payment_date:
+            return None
+        return self.next_payment_date - timedelta(days=self.reminder_days_before)
\ No newline at end of file
@@ -1,9 +1,24 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
+import gzip
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+import os
+import tempfile
+import time
 from datetime import date, timedelta
-from .models import Account, Transaction, Subscription
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from accounts.models import UserProfile
+from .fx import LOCAL_CACHE_TTL, VERSION_KEY, convert_totals, get_rate, invalidate_rates
+from .importers import import_transactions, imported_hashes, iter_ofx_rows, iter_statement_rows
+from .models import (
+    Account, AccountBalance, AccountDailyBalance, ExchangeRate, Transaction, TransactionMonthlyRollup, Subscription,
+)
 
 User = get_user_model()
 
@@ -56,6 +71,577 @@ class AccountModelTests(TestCase):
         self.assertTrue(account.is_active)
 
 
+class AccountBalanceLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Main', user=self.user, initial_balance=Decimal('100.00'))
+        self.other = Account.objects.create(name='Other', user=self.user)
+
+    def ledger(self, account):
+        return AccountBalance.objects.get(account=account)
+
+    def test_create_updates_ledger(self):
+        """Creating transactions updates the running totals."""
+        income = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('50.00'), t_type='income')
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('20.00'), t_type='expense')
+        ledger = self.ledger(self.account)
+        self.assertEqual(ledger.income_total, Decimal('50.00'))
+        self.assertEqual(ledger.expense_total, Decimal('20.00'))
+        self.assertEqual(ledger.balance, Decimal('130.00'))
+        self.assertGreater(ledger.last_transaction_id, income.pk)
+
+    def test_update_amount_and_type(self):
+        """Changing amount or type moves the contribution between totals."""
+        transaction = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('50.00'), t_type='income')
+        transaction.amount = Decimal('40.00')
+        transaction.t_type = 'expense'
+        transaction.save()
+        ledger = self.ledger(self.account)
+        self.assertEqual(ledger.income_total, Decimal('0.00'))
+        self.assertEqual(ledger.expense_total, Decimal('40.00'))
+        self.assertEqual(self.account.current_balance(), Decimal('60.00'))
+
+    def test_account_reassignment(self):
+        """Moving a transaction to another account updates both ledgers."""
+        transaction = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('25.00'), t_type='income')
+        transaction.account = self.other
+        transaction.save()
+        self.assertEqual(self.account.current_balance(), Decimal('100.00'))
+        self.assertEqual(self.other.current_balance(), Decimal('25.00'))
+        self.assertIsNone(self.ledger(self.account).last_transaction_id)
+        self.assertEqual(self.ledger(self.other).last_transaction_id, transaction.pk)
+
+    def test_delete_reverts_ledger(self):
+        """Deleting a transaction removes its contribution."""
+        first = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='expense')
+        second = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('5.00'), t_type='expense')
+        second.delete()
+        ledger = self.ledger(self.account)
+        self.assertEqual(ledger.balance, Decimal('90.00'))
+        self.assertEqual(ledger.last_transaction_id, first.pk)
+
+    def test_initial_balance_change(self):
+        """Editing the initial balance is reflected in the ledger balance."""
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='income')
+        self.account.initial_balance = Decimal('200.00')
+        self.account.save()
+        self.assertEqual(self.account.current_balance(), Decimal('210.00'))
+
+    def test_rebuild_balances_command(self):
+        """rebuild_balances recomputes totals after writes that bypass save()."""
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='income')
+        Transaction.objects.filter(account=self.account).update(amount=Decimal('30.00'))
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(self.account.current_balance(), Decimal('130.00'))
+        self.assertEqual(self.other.current_balance(), Decimal('0.00'))
+
+
+class AccountDailyBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Main', user=self.user, initial_balance=Decimal('100.00'))
+        self.today = date.today()
+
+    def series(self):
+        return list(AccountDailyBalance.objects.filter(account=self.account).values_list('date', 'closing_balance'))
+
+    def backdate(self, transaction, days):
+        Transaction.objects.filter(pk=transaction.pk).update(date=self.today - timedelta(days=days))
+
+    def test_transactions_update_todays_closing_balance(self):
+        """Transaction writes maintain the closing balance for their day."""
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('50.00'), t_type='income')
+        expense = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('20.00'), t_type='expense')
+        self.assertEqual(self.series(), [(self.today, Decimal('130.00'))])
+
+        expense.delete()
+        self.assertEqual(self.series(), [(self.today, Decimal('150.00'))])
+
+    def test_backfill_and_incremental_update_of_past_day(self):
+        """Changing a past day's transaction shifts that day and every later day."""
+        old = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='income')
+        self.backdate(old, 3)
+        call_command('backfill_daily_balances', stdout=StringIO())
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('5.00'), t_type='expense')
+        self.assertEqual(self.series(), [
+            (self.today - timedelta(days=3), Decimal('110.00')),
+            (self.today, Decimal('105.00')),
+        ])
+
+        Transaction.objects.get(pk=old.pk).delete()
+        self.assertEqual(self.series(), [
+            (self.today - timedelta(days=3), Decimal('100.00')),
+            (self.today, Decimal('95.00')),
+        ])
+
+    def test_missing_history_opens_from_transactions(self):
+        """A day with no series before it opens from the account's earlier transactions."""
+        old = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('50.00'), t_type='income')
+        self.backdate(old, 3)
+        AccountDailyBalance.objects.all().delete()
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('5.00'), t_type='expense')
+        self.assertEqual(self.series(), [(self.today, Decimal('145.00'))])
+        self.assertEqual(self.account.current_balance(), Decimal('145.00'))
+
+    def test_initial_balance_change_shifts_series(self):
+        """Editing the initial balance shifts the whole series."""
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='income')
+        self.account.initial_balance = Decimal('150.00')
+        self.account.save()
+        self.assertEqual(self.series(), [(self.today, Decimal('160.00'))])
+
+    def test_balance_history_endpoint(self):
+        """The history endpoint returns the range as compact arrays."""
+        old = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'), t_type='income')
+        self.backdate(old, 10)
+        call_command('backfill_daily_balances', stdout=StringIO())
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('5.00'), t_type='income')
+        self.client.force_login(self.user)
+        url = reverse('finance:account_balance_history', kwargs={'pk': self.account.pk})
+
+        start = self.today - timedelta(days=5)
+        response = self.client.get(url, {'start': start.isoformat()})
+        data = response.json()
+        self.assertEqual(data['opening'], 110.0)
+        self.assertEqual(data['dates'], [self.today.isoformat()])
+        self.assertEqual(data['balances'], [115.0])
+
+        self.assertEqual(self.client.get(url, {'start': 'not-a-date'}).status_code, 400)
+
+    def test_balance_history_requires_owner(self):
+        """Other users cannot read an account's history."""
+        other = User.objects.create_user(username='other', password='testpass')
+        self.client.force_login(other)
+        url = reverse('finance:account_balance_history', kwargs={'pk': self.account.pk})
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class TransactionMonthlyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.month = date.today().replace(day=1)
+
+    def rollups(self):
+        return list(
+            TransactionMonthlyRollup.objects.filter(user=self.user)
+            .order_by('t_type', 'category')
+            .values_list('t_type', 'category', 'total', 'count')
+        )
+
+    def test_writes_maintain_rollup(self):
+        """Create, recategorise and delete keep sums and counts in step."""
+        food = Transaction.objects.create(user=self.user, amount=Decimal('10.00'), t_type='expense', category='food')
+        Transaction.objects.create(user=self.user, amount=Decimal('5.00'), t_type='expense', category='food')
+        Transaction.objects.create(user=self.user, amount=Decimal('100.00'), t_type='income', category='salary')
+        self.assertEqual(self.rollups(), [
+            ('expense', 'food', Decimal('15.00'), 2),
+            ('income', 'salary', Decimal('100.00'), 1),
+        ])
+
+        food.category = 'transport'
+        food.save()
+        self.assertEqual(self.rollups(), [
+            ('expense', 'food', Decimal('5.00'), 1),
+            ('expense', 'transport', Decimal('10.00'), 1),
+            ('income', 'salary', Decimal('100.00'), 1),
+        ])
+
+        food.delete()
+        self.assertEqual(self.rollups(), [
+            ('expense', 'food', Decimal('5.00'), 1),
+            ('income', 'salary', Decimal('100.00'), 1),
+        ])
+
+    def test_account_delete_removes_cascaded_transactions(self):
+        """Deleting an account takes its transactions out of the rollup."""
+        account = Account.objects.create(name='Main', user=self.user)
+        other = Account.objects.create(name='Other', user=self.user)
+        Transaction.objects.create(user=self.user, account=account, amount=Decimal('10.00'), t_type='expense', category='food')
+        Transaction.objects.create(user=self.user, account=other, amount=Decimal('4.00'), t_type='expense', category='food')
+        account.delete()
+        self.assertEqual(self.rollups(), [('expense', 'food', Decimal('4.00'), 1)])
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('finance:account_delete', kwargs={'pk': other.pk}))
+        self.assertEqual(self.rollups(), [])
+
+    def test_queryset_delete_maintains_ledger(self):
+        """Queryset deletes, as the admin action does, keep rollups and balances in step."""
+        account = Account.objects.create(name='Main', user=self.user)
+        Transaction.objects.create(user=self.user, account=account, amount=Decimal('10.00'), t_type='expense', category='food')
+        Transaction.objects.create(user=self.user, account=account, amount=Decimal('3.00'), t_type='expense', category='food')
+        Transaction.objects.filter(amount=Decimal('10.00')).delete()
+        self.assertEqual(self.rollups(), [('expense', 'food', Decimal('3.00'), 1)])
+        self.assertEqual(account.current_balance(), Decimal('-3.00'))
+
+    def test_string_field_values(self):
+        """Dates and amounts given as strings are keyed like the stored values."""
+        account = Account.objects.create(name='Main', user=self.user)
+        transaction = Transaction.objects.create(
+            user=self.user, account=account, date='2026-09-03', amount='12.50', t_type='expense', category='food',
+        )
+        rollup = TransactionMonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.month, rollup.total), (date(2026, 9, 1), Decimal('12.50')))
+        self.assertEqual(
+            list(AccountDailyBalance.objects.filter(account=account).values_list('date', 'closing_balance')),
+            [(date(2026, 9, 3), Decimal('-12.50'))],
+        )
+
+        Transaction.objects.get(pk=transaction.pk).save()
+        self.assertEqual(TransactionMonthlyRollup.objects.get(user=self.user).count, 1)
+
+    def test_type_totals(self):
+        """type_totals sums income and expense for the selected rows."""
+        Transaction.objects.create(user=self.user, amount=Decimal('40.00'), t_type='income', category='salary')
+        Transaction.objects.create(user=self.user, amount=Decimal('15.00'), t_type='expense', category='food')
+        totals = TransactionMonthlyRollup.objects.filter(user=self.user, month=self.month).type_totals()
+        self.assertEqual(totals, {'income': Decimal('40.00'), 'expense': Decimal('15.00')})
+
+    def test_rebuild_rollups_command(self):
+        """rebuild_rollups regroups transactions by month after bulk edits."""
+        transaction = Transaction.objects.create(user=self.user, amount=Decimal('40.00'), t_type='expense', category='food')
+        last_month = self.month - timedelta(days=1)
+        Transaction.objects.filter(pk=transaction.pk).update(date=last_month)
+        call_command('rebuild_rollups', '--user', 'testuser', stdout=StringIO())
+        rollup = TransactionMonthlyRollup.objects.get(user=self.user)
+        self.assertEqual(rollup.month, last_month.replace(day=1))
+        self.assertEqual(rollup.total, Decimal('40.00'))
+
+    def test_monthly_report_endpoint(self):
+        """The monthly report reads per-month and per-category totals."""
+        Transaction.objects.create(user=self.user, amount=Decimal('40.00'), t_type='income', category='salary')
+        Transaction.objects.create(user=self.user, amount=Decimal('15.00'), t_type='expense', category='food')
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('finance:monthly_report'), {'months': 3}).json()
+        self.assertEqual(len(data['months']), 3)
+        self.assertEqual(data['months'][-1], self.month.strftime('%Y-%m'))
+        self.assertEqual(data['income'][-1], 40.0)
+        self.assertEqual(data['expense'][-1], 15.0)
+        self.assertEqual(data['categories'][0]['category'], 'salary')
+
+
+class AccountQuerySetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def test_with_balances_annotates_all_accounts(self):
+        """with_balances annotates income, expense and balance in one query."""
+        main = Account.objects.create(name='Main', user=self.user, initial_balance=Decimal('100.00'))
+        Account.objects.create(name='Empty', user=self.user, initial_balance=Decimal('5.00'))
+        Transaction.objects.create(user=self.user, account=main, amount=Decimal('50.00'), t_type='income')
+        Transaction.objects.create(user=self.user, account=main, amount=Decimal('20.00'), t_type='expense')
+
+        with self.assertNumQueries(1):
+            accounts = {acc.name: acc for acc in Account.objects.filter(user=self.user).with_balances()}
+        self.assertEqual(accounts['Main'].income, Decimal('50.00'))
+        self.assertEqual(accounts['Main'].expense, Decimal('20.00'))
+        self.assertEqual(accounts['Main'].balance, Decimal('130.00'))
+        self.assertEqual(accounts['Empty'].balance, Decimal('5.00'))
+        self.assertEqual(accounts['Empty'].current_balance(), Decimal('5.00'))
+
+    def test_total_balance(self):
+        """total_balance sums account balances in a single aggregate."""
+        main = Account.objects.create(name='Main', user=self.user, initial_balance=Decimal('100.00'))
+        Account.objects.create(name='Savings', user=self.user, initial_balance=Decimal('10.00'))
+        Transaction.objects.create(user=self.user, account=main, amount=Decimal('30.00'), t_type='expense')
+
+        with self.assertNumQueries(1):
+            total = Account.objects.filter(user=self.user).total_balance()
+        self.assertEqual(total, Decimal('80.00'))
+        self.assertEqual(Account.objects.none().total_balance(), Decimal('0.00'))
+
+
+class ExchangeRateTests(TestCase):
+    def setUp(self):
+        # Rates cached by earlier tests were rolled back in the database, not in the cache
+        invalidate_rates()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        UserProfile.objects.create(user=self.user, default_currency='GHS')
+        ExchangeRate.objects.create(date=date(2026, 1, 1), base='USD', quote='GHS', rate=Decimal('12'))
+        ExchangeRate.objects.create(date=date(2026, 3, 1), base='usd', quote='ghs', rate=Decimal('15'))
+
+    def test_rate_lookup(self):
+        """Rates resolve to the latest row on or before the day, or the inverse pair."""
+        self.assertEqual(get_rate('USD', 'GHS', date(2026, 2, 15)), Decimal('12'))
+        self.assertEqual(get_rate('USD', 'GHS', date(2026, 3, 1)), Decimal('15'))
+        self.assertEqual(get_rate('GHS', 'USD', date(2026, 1, 5)), Decimal(1) / Decimal('12'))
+        self.assertEqual(get_rate('GHS', 'GHS'), Decimal(1))
+        self.assertIsNone(get_rate('USD', 'GHS', date(2025, 12, 31)))
+        self.assertIsNone(get_rate('EUR', 'GHS'))
+
+    def test_lookups_are_cached_and_invalidated(self):
+        """Repeated lookups hit the cache until a rate changes."""
+        get_rate('USD', 'GHS', date(2026, 3, 2))
+        get_rate('EUR', 'GHS', date(2026, 3, 2))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_rate('USD', 'GHS', date(2026, 3, 2)), Decimal('15'))
+            self.assertIsNone(get_rate('EUR', 'GHS', date(2026, 3, 2)))
+        ExchangeRate.objects.create(date=date(2026, 3, 2), base='EUR', quote='GHS', rate=Decimal('16'))
+        self.assertEqual(get_rate('EUR', 'GHS', date(2026, 3, 2)), Decimal('16'))
+
+    def test_version_bump_from_another_process_is_seen_through_the_cache(self):
+        """Rate edits reach other processes through the configured cache, not the in-process LRU."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name}}
+        day = date(2026, 3, 2)
+        with override_settings(CACHES=shared):
+            self.assertEqual(get_rate('USD', 'GHS', day), Decimal('15'))
+
+            # Another process edits the rate: its own backend instance, nothing in-process is touched
+            ExchangeRate.objects.filter(date=date(2026, 3, 1)).update(rate=Decimal('16'))
+            other_process = caches.create_connection('default')
+            other_process.set(VERSION_KEY, other_process.get(VERSION_KEY) + 1)
+
+            # Until its LOCAL_CACHE_TTL runs out the LRU entry still answers
+            self.assertEqual(get_rate('USD', 'GHS', day), Decimal('15'))
+            with mock.patch('finance.fx.time.monotonic', return_value=time.monotonic() + LOCAL_CACHE_TTL + 1):
+                self.assertEqual(get_rate('USD', 'GHS', day), Decimal('16'))
+        invalidate_rates()
+
+    def test_convert_totals_reports_missing_currencies(self):
+        """Groups without a rate are left out and reported."""
+        with self.assertLogs('finance.fx', 'WARNING'):
+            conversion = convert_totals(
+                [('GHS', Decimal('5.00')), ('USD', Decimal('2.00')), ('EUR', Decimal('1.00'))], 'GHS', date(2026, 3, 5)
+            )
+        self.assertEqual(conversion.total, Decimal('35.00'))
+        self.assertEqual(conversion.missing, ['EUR'])
+
+    def test_total_balance_converts_grouped_sums(self):
+        """Account totals in mixed currencies cost one aggregate plus cached rates."""
+        Account.objects.create(name='Cedis', user=self.user, initial_balance=Decimal('100.00'))
+        Account.objects.create(name='Dollars', user=self.user, currency='USD', initial_balance=Decimal('4.00'))
+        Account.objects.create(name='More dollars', user=self.user, currency='USD', initial_balance=Decimal('6.00'))
+        accounts = Account.objects.filter(user=self.user)
+        expected = Decimal('100.00') + Decimal('10.00') * get_rate('USD', 'GHS')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(accounts.total_balance('GHS'), expected)
+        self.assertEqual(accounts.total_balance(), Decimal('110.00'))
+
+    def test_account_pages_show_account_currency(self):
+        """Account amounts are labelled with the account's own currency."""
+        account = Account.objects.create(name='Dollars', user=self.user, currency='USD', initial_balance=Decimal('4.00'))
+        self.client.force_login(self.user)
+        for url in (reverse('finance:account_list'), reverse('finance:account_detail', kwargs={'pk': account.pk})):
+            content = self.client.get(url).content.decode()
+            self.assertIn('4.00 USD', content)
+            self.assertNotIn('₵', content)
+
+    def test_dashboard_and_report_use_default_currency(self):
+        """The dashboard and monthly report are shown in the profile's currency."""
+        today = date.today()
+        rate = get_rate('USD', 'GHS', today)
+        Transaction.objects.create(user=self.user, amount=Decimal('10.00'), currency='USD', t_type='income', date=today)
+        Transaction.objects.create(user=self.user, amount=Decimal('20.00'), t_type='income', date=today)
+        Transaction.objects.create(user=self.user, amount=Decimal('1.00'), currency='EUR', t_type='expense', date=today)
+        self.client.force_login(self.user)
+
+        with self.assertLogs('finance.fx', 'WARNING'):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['display_currency'], 'GHS')
+        self.assertEqual(response.context['monthly_income'], Decimal('20.00') + Decimal('10.00') * rate)
+        self.assertEqual(response.context['monthly_expense'], Decimal('0.00'))
+        self.assertEqual(response.context['fx_missing'], ['EUR'])
+
+        report = self.client.get(reverse('finance:monthly_report'), {'months': 1}).json()
+        self.assertEqual(report['currency'], 'GHS')
+        self.assertEqual(report['missing_rates'], ['EUR'])
+        self.assertAlmostEqual(report['income'][0], float(Decimal('20.00') + Decimal('10.00') * rate))
+
+
+class TransactionCSVExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Wallet', user=self.user)
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('12.50'), t_type='expense', category='food', description='Lunch')
+        Transaction.objects.create(user=self.user, amount=Decimal('100.00'), t_type='income', category='salary')
+        self.client.force_login(self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_export_streams_filtered_rows(self):
+        """CSV export streams only the rows matching the list filters."""
+        response = self.client.get(reverse('finance:transaction_list'), {'format': 'csv', 'type': 'expense'})
+        self.assertTrue(response.streaming)
+        self.assertIn('transactions.csv', response['Content-Disposition'])
+        lines = self.read(response).decode().splitlines()
+        self.assertEqual(lines[0], 'Date,Account,Type,Category,Amount,Currency,Project,Description')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Wallet,expense,food,12.50,GHS,,Lunch', lines[1])
+
+    def test_export_gzip(self):
+        """compress=gzip streams a gzipped copy of the same CSV."""
+        plain = self.read(self.client.get(reverse('finance:transaction_list'), {'format': 'csv'}))
+        response = self.client.get(reverse('finance:transaction_list'), {'format': 'csv', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(self.read(response)), plain)
+
+
+class TransactionSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.lunch = Transaction.objects.create(user=self.user, amount=Decimal('12.50'), t_type='expense', category='food', description='Lunch at Osu')
+        self.rent = Transaction.objects.create(user=self.user, amount=Decimal('800.00'), t_type='expense', category='rent', description='March rent')
+        self.client.force_login(self.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('finance:transaction_list'), {'search': query})
+        return [transaction.pk for transaction in response.context['page_obj']]
+
+    def test_search_matches_description_and_category_prefixes(self):
+        """The search parameter matches word prefixes in description or category."""
+        self.assertEqual(self.search('lun'), [self.lunch.pk])
+        self.assertEqual(self.search('RENT'), [self.rent.pk])
+        self.assertEqual(self.search('march rent'), [self.rent.pk])
+        self.assertEqual(self.search('march lunch'), [])
+
+    def test_numeric_search_matches_amount(self):
+        """A numeric query still finds the transaction with that amount."""
+        self.assertEqual(self.search('12.50'), [self.lunch.pk])
+
+    def test_index_follows_updates_deletes_and_imports(self):
+        """Edits, deletes and bulk imports are reflected in search results."""
+        self.lunch.description = 'Dinner'
+        self.lunch.save()
+        self.assertEqual(self.search('lunch'), [])
+        self.assertEqual(self.search('dinner'), [self.lunch.pk])
+
+        self.rent.delete()
+        self.assertEqual(self.search('rent'), [])
+
+        account = Account.objects.create(name='Bank', user=self.user)
+        import_transactions(user=self.user, account=account, rows=iter_statement_rows(BytesIO(STATEMENT_CSV), 'csv'))
+        self.assertEqual(len(self.search('coffee')), 2)
+
+
+
+STATEMENT_CSV = b"""Date,Description,Amount,Category
+2026-01-05,Salary,1000.00,salary
+2026-01-06,Coffee,-3.50,food
+2026-01-06,Coffee,-3.50,food
+2026-01-07,Broken,abc,
+"""
+
+STATEMENT_OFX = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260110120000[0:GMT]<TRNAMT>-25.00<FITID>1<NAME>Grocer<MEMO>Weekly shop
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260111<TRNAMT>40.00<FITID>2<NAME>Refund
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class TransactionImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Bank', user=self.user, initial_balance=Decimal('10.00'))
+
+    def run_import(self, content, file_format='csv'):
+        rows = iter_statement_rows(BytesIO(content), file_format)
+        return import_transactions(user=self.user, account=self.account, rows=rows, batch_size=2)
+
+    def test_csv_import_creates_rows_and_rebuilds_derived_tables(self):
+        """CSV lines are inserted in batches and balances are rebuilt once."""
+        results = self.run_import(STATEMENT_CSV)
+        self.assertEqual(results['read'], 4)
+        self.assertEqual(results['created'], 3)
+        self.assertEqual(results['errors'][0][0], 5)
+
+        coffees = Transaction.objects.filter(user=self.user, description='Coffee')
+        self.assertEqual(coffees.count(), 2)
+        self.assertEqual(coffees.first().t_type, 'expense')
+        self.assertEqual(coffees.first().date, date(2026, 1, 6))
+        self.assertEqual(self.account.current_balance(), Decimal('1003.00'))
+        self.assertEqual(
+            AccountDailyBalance.objects.get(account=self.account, date=date(2026, 1, 6)).closing_balance,
+            Decimal('1003.00'),
+        )
+        rollup = TransactionMonthlyRollup.objects.get(user=self.user, category='food')
+        self.assertEqual((rollup.total, rollup.count), (Decimal('7.00'), 2))
+
+    def test_import_applies_ledger_deltas_around_existing_history(self):
+        """Imported batches update the ledger in step with a full rebuild, without running one."""
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('20.00'), t_type='expense',
+                                   category='food', date=date(2026, 1, 3))
+        Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('5.00'), t_type='income',
+                                   category='refund', date=date(2026, 2, 1))
+
+        def ledger_state():
+            return (
+                list(AccountBalance.objects.filter(account=self.account).values_list('income_total', 'expense_total', 'balance')),
+                list(AccountDailyBalance.objects.filter(account=self.account).values_list('date', 'closing_balance')),
+                list(TransactionMonthlyRollup.objects.filter(user=self.user).order_by('month', 't_type', 'category')
+                     .values_list('month', 't_type', 'category', 'total', 'count')),
+            )
+
+        with mock.patch('finance.ledger.rebuild_daily_balances') as rebuild_daily, \
+                mock.patch('finance.ledger.rebuild_monthly_rollups') as rebuild_rollups:
+            self.run_import(STATEMENT_CSV)
+        rebuild_daily.assert_not_called()
+        rebuild_rollups.assert_not_called()
+        incremental = ledger_state()
+        self.assertEqual(incremental[1][-1], (date(2026, 2, 1), Decimal('988.00')))
+
+        call_command('rebuild_balances', stdout=StringIO())
+        call_command('backfill_daily_balances', stdout=StringIO())
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(incremental, ledger_state())
+
+    def test_reimport_skips_duplicates(self):
+        """Importing the same statement twice does not duplicate rows."""
+        self.run_import(STATEMENT_CSV)
+        results = self.run_import(STATEMENT_CSV)
+        self.assertEqual(results['created'], 0)
+        self.assertEqual(results['duplicates'], 3)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_lines_imported_concurrently_count_as_duplicates(self):
+        """Lines a concurrent import inserted after the duplicate check are not counted as created."""
+        self.run_import(STATEMENT_CSV)
+        checks = []
+
+        def stale_first_check(user, hashes):
+            checks.append(hashes)
+            # The first check ran before the other import committed
+            return set() if len(checks) == 1 else imported_hashes(user, hashes)
+
+        with mock.patch('finance.importers.imported_hashes', side_effect=stale_first_check):
+            results = self.run_import(STATEMENT_CSV)
+        self.assertEqual(results['created'], 0)
+        self.assertEqual(results['duplicates'], 3)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_ofx_parsing(self):
+        """OFX transactions are read from SGML-style statements."""
+        rows = list(iter_ofx_rows(StringIO(STATEMENT_OFX.decode())))
+        self.assertEqual([row['t_type'] for row in rows], ['expense', 'income'])
+        self.assertEqual(rows[0]['date'], date(2026, 1, 10))
+        self.assertEqual(rows[0]['description'], 'Grocer - Weekly shop')
+        self.assertEqual(rows[1]['amount'], Decimal('40.00'))
+
+    def test_upload_view(self):
+        """The upload endpoint imports a statement into the chosen account."""
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.ofx', STATEMENT_OFX)
+        response = self.client.post(reverse('finance:transaction_import'), {'statement': upload, 'account': self.account.pk})
+        self.assertRedirects(response, reverse('finance:transaction_list'))
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 2)
+
+    def test_import_command(self):
+        """import_transactions imports a statement file from disk."""
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as statement:
+            statement.write(STATEMENT_CSV)
+        self.addCleanup(os.unlink, statement.name)
+        out = StringIO()
+        call_command(
+            'import_transactions', statement.name, '--user', 'testuser', '--account', str(self.account.pk),
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn('Imported 3 transaction(s)', out.getvalue())
+
+
 class TransactionModelTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
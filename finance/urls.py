@@ -4,8 +4,11 @@ from .views import (
     TransactionCreateView,
     TransactionUpdateView,
     TransactionDeleteView,
+    TransactionImportView,
+    MonthlyReportView,
     AccountListView,
     AccountDetailView,
+    AccountBalanceHistoryView,
     AccountCreateView,
     AccountUpdateView,
     AccountDeleteView,
@@ -22,13 +25,18 @@ urlpatterns = [
     # Transaction URLs
     path('', TransactionListView.as_view(), name='transaction_list'),
     path('create/', TransactionCreateView.as_view(), name='transaction_create'),
+    path('import/', TransactionImportView.as_view(), name='transaction_import'),
     path('<int:pk>/edit/', TransactionUpdateView.as_view(), name='transaction_edit'),
     path('<int:pk>/delete/', TransactionDeleteView.as_view(), name='transaction_delete'),
 
+    # Report URLs
+    path('reports/monthly/', MonthlyReportView.as_view(), name='monthly_report'),
+
     # Account URLs
     path('accounts/', AccountListView.as_view(), name='account_list'),
     path('accounts/create/', AccountCreateView.as_view(), name='account_create'),
     path('accounts/<int:pk>/', AccountDetailView.as_view(), name='account_detail'),
+    path('accounts/<int:pk>/balance-history/', AccountBalanceHistoryView.as_view(), name='account_balance_history'),
     path('accounts/<int:pk>/edit/', AccountUpdateView.as_view(), name='account_update'),
     path('accounts/<int:pk>/delete/', AccountDeleteView.as_view(), name='account_delete'),
 
@@ -1,3 +1,5 @@
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 from typing import Any, cast
 
 from django.urls import reverse_lazy
@@ -6,16 +8,34 @@ from django.views import generic
 from django.db.models import Q, Sum
 from django import forms
 from django.contrib import messages
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin
-from .models import Transaction, Account, Subscription
-from .forms import TransactionForm, AccountForm, SubscriptionForm
+from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin, CSVExportMixin, KeysetPaginationMixin
+from myhub.search import search_condition
+from .models import Transaction, TransactionMonthlyRollup, Account, AccountDailyBalance, Subscription
+from .forms import TransactionForm, TransactionImportForm, AccountForm, SubscriptionForm
+from .fx import get_rate, user_currency
+from .importers import DEFAULT_DATE_FORMATS, StatementError, detect_format, import_transactions, iter_statement_rows
 
 
-class TransactionListView(LoginRequiredMixin, generic.ListView):
+class TransactionListView(LoginRequiredMixin, CSVExportMixin, KeysetPaginationMixin, generic.ListView):
     model = Transaction
     template_name = 'finance/transaction_list.html'
     paginate_by = 20
+    keyset_ordering = ('-date', '-created_at', '-id')
+    csv_filename = 'transactions.csv'
+    csv_fields = [
+        ('date', 'Date'),
+        ('account.name', 'Account'),
+        ('t_type', 'Type'),
+        ('category', 'Category'),
+        ('amount', 'Amount'),
+        ('currency', 'Currency'),
+        ('project.title', 'Project'),
+        ('description', 'Description'),
+    ]
 
     def get_queryset(self):
         queryset = Transaction.objects.filter(user=self.request.user).select_related('project', 'user', 'account')
@@ -26,11 +46,15 @@ class TransactionListView(LoginRequiredMixin, generic.ListView):
         category_filter = self.request.GET.get('category', '')
 
         if search_query:
-            queryset = queryset.filter(
-                Q(description__icontains=search_query) |
-                Q(amount__icontains=search_query) |
-                Q(category__icontains=search_query)
-            )
+            condition = search_condition(Transaction, search_query)
+            try:
+                amount = Decimal(search_query.strip().replace(',', ''))
+            except InvalidOperation:
+                amount = None
+            if amount is not None and amount.is_finite():
+                # A numeric query also matches the exact amount
+                condition |= Q(amount=amount)
+            queryset = queryset.filter(condition)
 
         if type_filter:
             queryset = queryset.filter(t_type=type_filter)
@@ -44,7 +68,7 @@ class TransactionListView(LoginRequiredMixin, generic.ListView):
         if category_filter:
             queryset = queryset.filter(category=category_filter)
 
-        return queryset.order_by('-date')
+        return queryset.order_by(*self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -123,6 +147,114 @@ class TransactionDeleteView(LoginRequiredMixin, UserIsOwnerMixin, SuccessMessage
     success_message = "Transaction deleted successfully."
 
 
+class TransactionImportView(LoginRequiredMixin, generic.FormView):
+    form_class = TransactionImportForm
+    template_name = 'finance/transaction_import.html'
+    success_url = reverse_lazy('finance:transaction_list')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        statement = form.cleaned_data['statement']
+        file_format = form.cleaned_data['file_format'] or detect_format(statement.name)
+        date_format = form.cleaned_data['date_format']
+        date_formats = (date_format,) if date_format else DEFAULT_DATE_FORMATS
+
+        try:
+            results = import_transactions(
+                user=self.request.user,
+                account=form.cleaned_data['account'],
+                rows=iter_statement_rows(statement.file, file_format, date_formats=date_formats),
+            )
+        except StatementError as exc:
+            form.add_error('statement', str(exc))
+            return self.form_invalid(form)
+
+        messages.success(
+            self.request,
+            f"Imported {results['created']} transaction(s), skipped {results['duplicates']} duplicate(s)."
+        )
+        if results['errors']:
+            lines = ', '.join(str(line) for line, _ in results['errors'][:10])
+            messages.warning(self.request, f"{len(results['errors'])} line(s) could not be read (lines {lines}).")
+        return super().form_valid(form)
+
+
+class MonthlyReportView(LoginRequiredMixin, generic.View):
+    """
+    JSON income/expense per month for the last ?months= months (default 12),
+    plus per-category totals over the same range. Reads only the monthly
+    rollup table, so the cost does not depend on the number of transactions.
+    Amounts are converted into the user's default currency at the rate in
+    effect at the end of each month.
+    """
+    default_months = 12
+    max_months = 120
+
+    def get_months(self):
+        try:
+            count = int(self.request.GET.get('months', self.default_months))
+        except ValueError:
+            count = self.default_months
+        count = min(max(count, 1), self.max_months)
+
+        current = timezone.now().date().replace(day=1)
+        months = []
+        year, month = current.year, current.month
+        for _ in range(count):
+            months.append(date(year, month, 1))
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+        return months[::-1]
+
+    def get(self, request, *args, **kwargs):
+        months = self.get_months()
+        index = {month: i for i, month in enumerate(months)}
+        income = [0.0] * len(months)
+        expense = [0.0] * len(months)
+        categories = {}
+        currency = user_currency(request.user)
+        today = timezone.localdate()
+        missing = set()
+
+        rows = (
+            TransactionMonthlyRollup.objects.filter(user=request.user, month__gte=months[0])
+            .order_by()
+            .values('month', 't_type', 'category', 'currency')
+            .annotate(total=Sum('total'), count=Sum('count'))
+        )
+        for row in rows:
+            if row['month'] not in index:
+                continue
+            month_end = (row['month'] + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            rate = get_rate(row['currency'] or currency, currency, on=min(month_end, today))
+            if rate is None:
+                missing.add(row['currency'])
+                continue
+            total = float(row['total'] * rate)
+            series = income if row['t_type'] == 'income' else expense
+            series[index[row['month']]] += total
+            entry = categories.setdefault(
+                (row['t_type'], row['category']),
+                {'t_type': row['t_type'], 'category': row['category'], 'total': 0.0, 'count': 0},
+            )
+            entry['total'] += total
+            entry['count'] += row['count']
+
+        return JsonResponse({
+            'currency': currency,
+            'missing_rates': sorted(missing),
+            'months': [month.strftime('%Y-%m') for month in months],
+            'income': income,
+            'expense': expense,
+            'categories': sorted(categories.values(), key=lambda entry: -entry['total']),
+        })
+
+
 # Account Views
 
 class AccountListView(LoginRequiredMixin, generic.ListView):
@@ -131,13 +263,12 @@ class AccountListView(LoginRequiredMixin, generic.ListView):
     context_object_name = 'accounts'
 
     def get_queryset(self):
-        return Account.objects.filter(user=self.request.user)
+        return Account.objects.filter(user=self.request.user).with_balances()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        accounts = context['accounts']
-        total_balance = sum(acc.current_balance() for acc in accounts)
-        context['total_balance'] = total_balance
+        context['display_currency'] = user_currency(self.request.user)
+        context['total_balance'] = self.object_list.total_balance(context['display_currency'])
         return context
 
 
@@ -146,17 +277,75 @@ class AccountDetailView(LoginRequiredMixin, UserIsOwnerMixin, generic.DetailView
     template_name = 'finance/account_detail.html'
 
     def get_queryset(self):
-        return Account.objects.prefetch_related('transactions')
+        return Account.objects.with_balances()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         account = self.object
         recent_transactions = account.transactions.all()[:10]
         context['recent_transactions'] = recent_transactions
-        context['current_balance'] = account.current_balance()
+        context['current_balance'] = account.balance
         return context
 
 
+class AccountBalanceHistoryView(LoginRequiredMixin, UserIsOwnerMixin, generic.detail.BaseDetailView):
+    """
+    JSON closing-balance series for an account between ?start= and ?end=
+    (ISO dates, default the last 365 days). Days without activity are omitted;
+    they carry the previous balance, starting from `opening`.
+    """
+    model = Account
+    default_days = 365
+
+    def get_date_range(self):
+        """Return (start, end) from the query string, or None if invalid"""
+        try:
+            end_param = self.request.GET.get('end')
+            end = parse_date(end_param) if end_param else timezone.now().date()
+            if end is None:
+                return None
+            start_param = self.request.GET.get('start')
+            start = parse_date(start_param) if start_param else end - timedelta(days=self.default_days)
+        except ValueError:
+            return None
+        if start is None or start > end:
+            return None
+        return start, end
+
+    def render_to_response(self, context, **response_kwargs):
+        account = self.object
+        date_range = self.get_date_range()
+        if date_range is None:
+            return JsonResponse({'error': 'start and end must be ISO dates with start <= end'}, status=400)
+        start, end = date_range
+
+        opening = (
+            AccountDailyBalance.objects.filter(account=account, date__lt=start)
+            .order_by('-date')
+            .values_list('closing_balance', flat=True)
+            .first()
+        )
+        rows = (
+            AccountDailyBalance.objects.filter(account=account, date__range=(start, end))
+            .order_by('date')
+            .values_list('date', 'closing_balance')
+        )
+        dates, balances = [], []
+        for day, balance in rows:
+            dates.append(day.isoformat())
+            balances.append(float(balance))
+
+        return JsonResponse({
+            'account': account.pk,
+            'currency': account.currency,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'opening': float(account.initial_balance if opening is None else opening),
+            'dates': dates,
+            'balances': balances,
+        })
+
+
 class AccountCreateView(LoginRequiredMixin, SuccessMessageMixin, generic.CreateView):
     model = Account
     form_class = AccountForm
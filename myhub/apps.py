@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MyhubConfig(AppConfig):
+    name = 'myhub'
+
+    def ready(self):
+        from .dashboard import connect_signals
+
+        connect_signals()
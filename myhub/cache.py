@@ -0,0 +1,40 @@
+"""
+Cache backends for CACHES that count their hits and misses against the
+request being profiled (see myhub.middleware). Outside a profiled request
+they behave exactly like the Django backends they extend.
+"""
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .middleware import record_cache_lookups
+
+_MISSING = object()
+
+
+class ProfiledCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            record_cache_lookups(0, 1)
+            return default
+        record_cache_lookups(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        get_many = super().get_many
+        if get_many.__func__ is BaseCache.get_many:
+            # The generic get_many() goes through get(), which counts each key
+            return get_many(keys, version=version)
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        record_cache_lookups(len(found), len(keys) - len(found))
+        return found
+
+
+class ProfiledLocMemCache(ProfiledCacheMixin, LocMemCache):
+    pass
+
+
+class ProfiledRedisCache(ProfiledCacheMixin, RedisCache):
+    pass
@@ -0,0 +1,204 @@
+"""
+Per-user dashboard aggregates (counters, balances and monthly totals),
+cached in the Django cache framework. Invalidation only reaches other web
+and Celery processes when that cache is shared (CACHE_URL in settings).
+
+An entry is dropped by the post_save/post_delete receivers connected in
+MyhubConfig.ready() whenever a row that feeds it changes. Figures that move
+with the clock alone (overdue tasks, month-to-date totals) bound the entry's
+lifetime so it expires when they would change, and exchange-rate edits
+orphan every entry through the rates version that is part of the key.
+
+Writes that bypass signals (bulk_create(), queryset.update()) must call
+invalidate_dashboard_stats() themselves.
+
+A cold read costs one conditional-aggregation query per model. On
+PostgreSQL (or with DASHBOARD_UNION_COUNTERS = True) the per-model counters
+share a single UNION ALL round trip instead.
+"""
+import math
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction as db_transaction
+from django.db.models import Count, DateTimeField, Min, Q, Sum, Value
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+STATS_CACHE_TIMEOUT = 15 * 60
+
+# Models feeding the dashboard, with the attribute holding the owning user's id
+INVALIDATING_MODELS = {
+    'projects.Project': 'owner_id',
+    'tasks.Task': 'user_id',
+    'finance.Transaction': 'user_id',
+    'finance.Account': 'user_id',
+    'learning.Course': 'owner_id',
+    'analytics.Event': 'user_id',
+    'worklogs.WorkLog': 'user_id',
+    # Holds the currency totals are shown in
+    'accounts.UserProfile': 'user_id',
+}
+
+
+def _cache_key(user_id) -> str:
+    from finance.fx import rates_version
+
+    return f'dashboard.stats:{rates_version()}:{user_id}'
+
+
+OPEN_TASK_STATUSES = ['pending', 'in_progress']
+
+
+def _counter_groups(user, now):
+    """
+    Per model: the user's rows and the counters read from them, as named
+    aggregates so each model costs a single conditional-aggregation query.
+    """
+    from projects.models import Project
+    from tasks.models import Task
+    from learning.models import Course
+    from analytics.models import Event
+    from worklogs.models import WorkLog
+
+    return {
+        'tasks': (Task.objects.filter(user=user), {
+            'pending_tasks': Count('pk', filter=Q(status='pending')),
+            'overdue_tasks': Count('pk', filter=Q(status__in=OPEN_TASK_STATUSES, deadline__lt=now)),
+            # The overdue count changes by itself when the next open deadline passes
+            'next_deadline': Min('deadline', filter=Q(status__in=OPEN_TASK_STATUSES, deadline__gte=now)),
+        }),
+        'projects': (Project.objects.filter(owner=user), {
+            'total_projects': Count('pk'),
+            'ongoing_projects': Count('pk', filter=Q(status='ongoing')),
+        }),
+        'courses': (Course.objects.filter(owner=user), {
+            'total_courses': Count('pk'),
+            'courses_in_progress': Count('pk', filter=Q(progress__lt=100)),
+        }),
+        'events': (Event.objects.filter(user=user), {
+            'total_events': Count('pk'),
+        }),
+        'worklogs': (WorkLog.objects.filter(user=user), {
+            'total_worklogs': Count('pk'),
+            'completed_worklogs': Count('pk', filter=Q(status='completed')),
+            'in_progress_worklogs': Count('pk', filter=Q(status='in_progress')),
+        }),
+    }
+
+
+def _use_union(using: str) -> bool:
+    setting = getattr(settings, 'DASHBOARD_UNION_COUNTERS', None)
+    if setting is None:
+        return connections[using].vendor == 'postgresql'
+    return setting
+
+
+def _union_counters(groups) -> dict:
+    """
+    Read every group's counters in one UNION ALL round trip. Each branch is
+    one row of (source, c0, c1, ..., next_deadline), padded to the widest group.
+    """
+    width = max(
+        len([name for name in counters if name != 'next_deadline']) for _, counters in groups.values()
+    )
+    branches = []
+    for source, (queryset, counters) in groups.items():
+        columns = {}
+        counts = [name for name in counters if name != 'next_deadline']
+        for index in range(width):
+            columns[f'c{index}'] = counters[counts[index]] if index < len(counts) else Value(0)
+        columns['next_deadline'] = counters.get('next_deadline', Value(None, output_field=DateTimeField()))
+        branches.append(queryset.order_by().values(source=Value(source)).annotate(**columns))
+
+    # The tasks branch goes first so its real datetime column types the union
+    results = {}
+    for row in branches[0].union(*branches[1:], all=True):
+        counts = [name for name in groups[row['source']][1] if name != 'next_deadline']
+        results.update({name: row[f'c{index}'] for index, name in enumerate(counts)})
+        if row['source'] == 'tasks':
+            results['next_deadline'] = row['next_deadline']
+    return results
+
+
+def compute_dashboard_stats(user):
+    """
+    Return (stats, timeout): the dashboard counters and totals for `user`,
+    and how many seconds they stay valid without any write.
+    """
+    from finance.fx import convert_totals, user_currency
+    from finance.models import Account, TransactionMonthlyRollup
+
+    now = timezone.now()
+    groups = _counter_groups(user, now)
+    if _use_union(Account.objects.db):
+        stats = _union_counters(groups)
+    else:
+        stats = {}
+        for queryset, counters in groups.values():
+            stats.update(queryset.aggregate(**counters))
+    next_deadline = stats.pop('next_deadline')
+
+    # Finance data - balances are summed per currency DB-side from the account
+    # ledger, then converted into the user's default currency
+    currency = user_currency(user)
+    stats['display_currency'] = currency
+    balances = list(
+        Account.objects.filter(user=user, is_active=True).with_balances().order_by()
+        .values_list('currency').annotate(total=Sum('balance'), count=Count('pk'))
+    )
+    stats['total_accounts'] = sum(count for _, _, count in balances)
+    balance = convert_totals(((code, total) for code, total, _ in balances), currency)
+    stats['total_balance'] = balance.total
+
+    # Monthly income/expense - read from the month-to-date rollup rows
+    month_start = now.date().replace(day=1)
+    month_rows = list(TransactionMonthlyRollup.objects.filter(user=user, month=month_start).type_totals_by_currency())
+    income = convert_totals(((code, total) for t_type, code, total in month_rows if t_type == 'income'), currency)
+    expense = convert_totals(((code, total) for t_type, code, total in month_rows if t_type == 'expense'), currency)
+    stats['monthly_income'] = income.total
+    stats['monthly_expense'] = expense.total
+    stats['monthly_net'] = income.total - expense.total
+    # Currencies without an exchange rate, left out of the totals above
+    stats['fx_missing'] = sorted(set(balance.missing) | set(income.missing) | set(expense.missing))
+
+    # month_start comes from the UTC date, so the month rolls over at UTC midnight
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    expires = [datetime.combine(next_month, dt_time.min, tzinfo=dt_timezone.utc)]
+    if next_deadline is not None:
+        expires.append(next_deadline)
+    timeout = min([STATS_CACHE_TIMEOUT] + [(moment - now).total_seconds() for moment in expires])
+    return stats, max(1, math.ceil(timeout))
+
+
+def get_dashboard_stats(user) -> dict:
+    """The cached dashboard aggregates of `user`, computing them on a miss."""
+    key = _cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats, timeout = compute_dashboard_stats(user)
+        cache.set(key, stats, timeout)
+    return stats
+
+
+def invalidate_dashboard_stats(user_id) -> None:
+    """Drop the cached aggregates of a user, now and again once the current transaction commits."""
+    if user_id is None:
+        return
+    key = _cache_key(user_id)
+    cache.delete(key)
+    # A concurrent request may re-cache pre-commit figures in between
+    db_transaction.on_commit(lambda: cache.delete(key))
+
+
+def _invalidate_owner(sender, instance, **kwargs):
+    invalidate_dashboard_stats(getattr(instance, INVALIDATING_MODELS[sender._meta.label], None))
+
+
+def connect_signals() -> None:
+    for label in INVALIDATING_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_invalidate_owner, sender=model, dispatch_uid=f'dashboard-stats-save-{label}')
+        post_delete.connect(_invalidate_owner, sender=model, dispatch_uid=f'dashboard-stats-delete-{label}')
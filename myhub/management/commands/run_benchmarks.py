@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import compare, run
+
+
+class Command(BaseCommand):
+    help = "Measure latency percentiles and query counts of every view and of send_all_reminders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Username to run the views as (default: the first benchmark user).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Measured runs per scenario.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Unmeasured runs per scenario before measuring.",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            help="Only run this scenario (repeatable).",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON file to write (default: benchmarks/results/<vendor>-<commit>.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Earlier results file to report regressions against.",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            user = get_user_model().objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']}.")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<26} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+                f"{result['queries']:>4} queries  {result.get('status', '')}"
+            )
+
+        try:
+            report = run(user=user, repeat=options["repeat"], warmup=options["warmup"], only=options["only"], progress=progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        meta = report["meta"]
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / "results" / f"{meta['vendor']}-{meta['commit'] or 'unknown'}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
+
+        if options["compare"]:
+            previous = json.loads(Path(options["compare"]).read_text())
+            regressions = compare(previous, report)
+            for line in regressions:
+                self.stdout.write(self.style.WARNING(line))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.fake_mnotify import FakeMNotify
+
+
+class Command(BaseCommand):
+    help = "Serve a local stand-in for the mNotify SMS gateway, for load and throughput testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            default="127.0.0.1",
+            help="Interface to listen on.",
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=8025,
+            help="Port to listen on.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds each request takes.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.0,
+            help="Up to this many extra seconds per request, at random.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests answered with HTTP 500.",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0.0,
+            help="Requests per second accepted before answering HTTP 429 (0: unlimited).",
+        )
+        parser.add_argument(
+            "--api-key",
+            help="Only accept this API key (others get 1004).",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1.")
+        gateway = FakeMNotify(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            rate_limit=options["rate_limit"],
+            api_key=options["api_key"],
+        )
+        with gateway:
+            self.stdout.write(self.style.SUCCESS(f"Fake mNotify gateway listening on {gateway.url}"))
+            self.stdout.write("Point MNOTIFY_SMS_URL at it. Ctrl-C to stop.")
+            try:
+                while True:
+                    time.sleep(10)
+                    stats = gateway.stats.summary()
+                    self.stdout.write(
+                        f"{stats['requests']} requests, {stats['recipients']} recipients, "
+                        f"{stats['connections']} connections, responses {stats['responses']}"
+                    )
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.loadtest import JOURNEYS, run_load_test
+
+
+class Command(BaseCommand):
+    help = "Drive the WSGI app with concurrent scripted user journeys and report throughput, errors and tail latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Number of virtual users running at once.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=30,
+            help="Seconds to run for.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            help="Passes over the journeys per virtual user, instead of --duration.",
+        )
+        parser.add_argument(
+            "--journey",
+            action="append",
+            choices=sorted(JOURNEYS),
+            help="Journey to run after logging in (repeatable; default: all).",
+        )
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server, e.g. http://127.0.0.1:8000 (default: call the app in-process).",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.0,
+            help="Mean pause in seconds between journeys.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Also write the report as JSON to this file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        try:
+            report = run_load_test(
+                concurrency=options["concurrency"],
+                duration=options["duration"],
+                iterations=options["iterations"],
+                journeys=options["journey"],
+                base_url=options["url"],
+                think_time=options["think_time"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        meta = report["meta"]
+        self.stdout.write(
+            f"{meta['target']} ({meta['vendor']}, CONN_MAX_AGE={meta['conn_max_age']}), "
+            f"{meta['concurrency']} virtual users, {meta['duration_s']}s"
+        )
+        rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+        for name, result in rows:
+            self.stdout.write(
+                f"{name:<26} {result['requests']:>7} req  {result['throughput_rps']:>8.1f} req/s  "
+                f"{result['error_rate'] * 100:>6.2f}% err  p50 {result.get('p50_ms', 0):>8.1f}ms  "
+                f"p95 {result.get('p95_ms', 0):>8.1f}ms  p99 {result.get('p99_ms', 0):>8.1f}ms"
+            )
+            for sample in result.get("error_samples", []):
+                self.stdout.write(self.style.WARNING(f"    {sample}"))
+        if "db_connections_opened" in meta:
+            self.stdout.write(f"Database connections opened: {meta['db_connections_opened']}")
+
+        if options["output"]:
+            output = Path(options["output"])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
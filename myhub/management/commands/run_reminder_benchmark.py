@@ -0,0 +1,108 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.reminders import run_reminder_benchmark
+
+
+class Command(BaseCommand):
+    help = "Measure reminder run throughput end to end against a local fake mNotify gateway."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reminders",
+            type=int,
+            default=1000,
+            help="Due task reminders to send.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds the gateway takes per request.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.0,
+            help="Up to this many extra seconds per gateway request, at random.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of gateway requests failing with HTTP 500 (retried).",
+        )
+        parser.add_argument(
+            "--gateway-rate-limit",
+            type=float,
+            default=0.0,
+            help="Requests per second the gateway accepts before answering 429 (0: unlimited).",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0.0,
+            help="Client-side MNOTIFY_RATE_LIMIT for the run (0: unlimited).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Concurrent requests (default: MNOTIFY_MAX_WORKERS).",
+        )
+        parser.add_argument(
+            "--identical",
+            action="store_true",
+            help="Give every reminder the same text, so they go out as multi-recipient requests.",
+        )
+        parser.add_argument(
+            "--digest",
+            action="store_true",
+            help="Run with REMINDER_DIGEST on.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Also write the report as JSON to this file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["reminders"] < 1:
+            raise CommandError("--reminders must be at least 1.")
+        if options["workers"] is not None and options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        try:
+            report = run_reminder_benchmark(
+                reminders=options["reminders"],
+                latency=options["latency"],
+                jitter=options["jitter"],
+                error_rate=options["error_rate"],
+                gateway_rate_limit=options["gateway_rate_limit"],
+                rate_limit=options["rate_limit"],
+                max_workers=options["workers"],
+                identical=options["identical"],
+                digest=options["digest"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        meta, results = report["meta"], report["results"]
+        gateway = results["gateway"]
+        self.stdout.write(
+            f"{meta['reminders']} reminders for {meta['users']} users, {meta['workers']} workers, "
+            f"gateway latency {meta['latency_s']}s ({meta['vendor']})"
+        )
+        self.stdout.write(
+            f"sent {results['sent']}  failed {results['failed']}  retrying {results['retrying']}  "
+            f"in {results['seconds']}s: {results['reminders_per_s']} reminders/s"
+        )
+        self.stdout.write(
+            f"gateway: {gateway['requests']} requests, {gateway['recipients']} recipients, "
+            f"{gateway['connections']} connections, responses {gateway['responses']}"
+        )
+
+        if options["output"]:
+            output = Path(options["output"])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import DEFAULT_VOLUMES, PASSWORD, USERNAME_PREFIX, seed
+
+
+class Command(BaseCommand):
+    help = "Fill the database with synthetic benchmark users and their data. Use a dedicated database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=2,
+            help="Number of benchmark users to create.",
+        )
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(
+                f"--{name}",
+                type=int,
+                default=default,
+                help=f"{name.capitalize()} per user (default {default}).",
+            )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, for reproducible data.",
+        )
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        counts = seed(
+            users=options["users"],
+            volumes=volumes,
+            random_seed=options["seed"],
+            progress=lambda message: self.stdout.write(f"  {message}"),
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary}."))
+        self.stdout.write(f"Benchmark users are named {USERNAME_PREFIX}<n> with password '{PASSWORD}'.")
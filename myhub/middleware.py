@@ -0,0 +1,213 @@
+"""
+Per-request profiling: SQL query count and time, template render time and
+cache hits/misses, reported in a Server-Timing header.
+
+Repeated SQL shapes (the same statement with different parameters run more
+than REQUEST_PROFILING_N_PLUS_ONE_THRESHOLD times) are logged as suspected
+N+1 patterns, and slow requests are sampled to the `myhub.profiling.slow`
+logger with the fingerprints of their most expensive queries.
+
+Cache reads are counted by the myhub.cache backends selected in CACHES;
+other backends show no hits or misses.
+
+Bookkeeping is a dict update per query and per cache read; SQL is only
+normalised into fingerprints for requests that are reported. Queries run
+while a streaming response is consumed are not counted.
+"""
+import json
+import logging
+import random
+import re
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('myhub.profiling')
+slow_logger = logging.getLogger('myhub.profiling.slow')
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+# Placeholder lists of any length (IN clauses, multi-row VALUES) share one fingerprint
+_PLACEHOLDER_LIST = re.compile(r'\((?:%s, )*%s\)')
+_REPEATED_ROWS = re.compile(r'(\(\.\.\.\))(?:, \(\.\.\.\))+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql: str) -> str:
+    """Reduce a SQL statement to its shape, dropping parameters and literals."""
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _REPEATED_ROWS.sub(r'\1', sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """Counters collected while a single request is handled."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Raw SQL text -> [count, seconds]; normalised only when reported
+        self.statements = {}
+
+    def record_query(self, sql: str, seconds: float) -> None:
+        self.queries += 1
+        self.sql_time += seconds
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def fingerprints(self) -> List[Tuple[str, int, float]]:
+        """(fingerprint, count, seconds) per SQL shape, most expensive first."""
+        shapes = {}
+        for sql, (count, seconds) in self.statements.items():
+            entry = shapes.setdefault(fingerprint(sql), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        return sorted(((shape, count, seconds) for shape, (count, seconds) in shapes.items()), key=lambda row: -row[2])
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """SQL shapes run more than `threshold` times: suspected N+1 queries."""
+        if self.queries <= threshold:
+            return []
+        return [row for row in self.fingerprints() if row[1] > threshold]
+
+    def server_timing(self, total: float, repeated: int) -> str:
+        metrics = [
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if repeated:
+            metrics.append(f'nplusone;desc="{repeated} repeated queries"')
+        return ', '.join(metrics)
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, perf_counter() - start)
+
+
+def record_cache_lookups(hits: int, misses: int) -> None:
+    """Count cache hits and misses against the current request, if it is profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile every request. Place it first in MIDDLEWARE so session and
+    authentication queries are included.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500) / 1000
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SLOW_SAMPLE_RATE', 1.0)
+        self.repeat_threshold = getattr(settings, 'REQUEST_PROFILING_N_PLUS_ONE_THRESHOLD', 10)
+        self.public_header = getattr(settings, 'REQUEST_PROFILING_PUBLIC_HEADER', settings.DEBUG)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = perf_counter() - start
+
+        repeated = profile.repeated(self.repeat_threshold)
+        if repeated:
+            logger.warning(
+                "Possible N+1 queries on %s %s: %s", request.method, request.path,
+                '; '.join(f'{count}x {shape}' for shape, count, _ in repeated),
+            )
+        if self.show_header(request):
+            response['Server-Timing'] = profile.server_timing(total, len(repeated))
+        if total >= self.slow_seconds and random.random() < self.sample_rate:
+            slow_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 1),
+                'queries': profile.queries,
+                'sql_ms': round(profile.sql_time * 1000, 1),
+                'template_ms': round(profile.template_time * 1000, 1),
+                'cache_hits': profile.cache_hits,
+                'cache_misses': profile.cache_misses,
+                'top_queries': [
+                    {'fingerprint': shape, 'count': count, 'ms': round(seconds * 1000, 1)}
+                    for shape, count, seconds in profile.fingerprints()[:5]
+                ],
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        profile = _current.get()
+        if profile is not None:
+            # Called right before the response is rendered
+            start = perf_counter()
+
+            def rendered(response):
+                profile.template_time += perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def show_header(self, request) -> bool:
+        if self.public_header:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class ProfileCaptureMiddleware:
+    """
+    Run requests carrying a staff user's profiling token under a profiler
+    (see myhub.profiler). Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .profiler import HEADER, QUERY_PARAM, Capture, read_token
+
+        # The common case: no token anywhere, decided without parsing the query string
+        if HEADER not in request.META and QUERY_PARAM not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        mode = read_token(request)
+        if mode is None:
+            return self.get_response(request)
+        return Capture(request, mode).run(self.get_response)
@@ -2,11 +2,14 @@
 Common mixins for use across all apps.
 """
 import csv
+import zlib
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib import messages
 from django.db.models import Q
-from django.http import HttpResponse
-from typing import List, Tuple
+from django.http import StreamingHttpResponse
+from typing import Iterable, Iterator, List, Tuple
+
+from .pagination import KeysetPaginator
 
 
 class UserIsOwnerMixin(UserPassesTestMixin):
@@ -79,13 +82,57 @@ class FilterMixin:
         return context
 
 
+class KeysetPaginationMixin:
+    """
+    Mixin that replaces ListView's OFFSET pagination with keyset pagination.
+    Subclasses should define `keyset_ordering`, ending in a unique field, and
+    back it with a matching composite index. Pages are selected by the opaque
+    ?cursor= token; no COUNT query is issued.
+    """
+    keyset_ordering = ('-pk',)
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(), page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+
+        def url_for(cursor):
+            params = self.request.GET.copy()
+            params.pop('page', None)
+            params.pop(self.cursor_kwarg, None)
+            if cursor:
+                params[self.cursor_kwarg] = cursor
+            return f'?{params.urlencode()}'
+
+        page.first_url = url_for(None)
+        page.last_url = url_for(page.last_cursor)
+        if page.has_previous():
+            page.previous_url = url_for(page.previous_cursor)
+        if page.has_next():
+            page.next_url = url_for(page.next_cursor)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer streaming."""
+    def write(self, value):
+        return value
+
+
 class CSVExportMixin:
     """
-    Mixin that adds CSV export functionality to ListViews.
+    Mixin that adds streaming CSV export to ListViews via ?format=csv.
     Subclasses should define `csv_fields` as a list of (field_name, header_name) tuples.
+    Nested attributes use dotted names (e.g. 'project.title') and are resolved as
+    SQL joins; rows are read in chunks of plain tuples so memory stays constant.
+    Add &compress=gzip to stream a gzipped file instead.
     """
     csv_fields = []  # e.g., [('title', 'Title'), ('status', 'Status')]
     csv_filename = 'export.csv'
+    csv_chunk_size = 2000
 
     def get_csv_fields(self) -> List[Tuple[str, str]]:
         """Return list of (field_name, header_name) tuples for CSV export."""
@@ -95,36 +142,51 @@ class CSVExportMixin:
         """Return the filename for the CSV export."""
         return self.csv_filename
 
-    def render_to_response(self, context, **response_kwargs):
-        """Check if export is requested and handle CSV export."""
-        if self.request.GET.get('format') == 'csv':
+    def get(self, request, *args, **kwargs):
+        """Check if export is requested before any pagination work is done."""
+        if request.GET.get('format') == 'csv':
             return self.export_csv()
 
-        return super().render_to_response(context, **response_kwargs)
+        return super().get(request, *args, **kwargs)
 
-    def export_csv(self):
-        """Generate and return CSV file response."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{self.get_csv_filename()}"'
-
-        writer = csv.writer(response)
+    def iter_csv_rows(self) -> Iterator[List[str]]:
+        """Yield the header row and then one list of strings per object."""
         fields = self.get_csv_fields()
+        yield [header for _, header in fields]
+
+        lookups = [field_name.replace('.', '__') for field_name, _ in fields]
+        rows = self.get_queryset().values_list(*lookups).iterator(chunk_size=self.csv_chunk_size)
+        for values in rows:
+            yield ['' if value is None else str(value) for value in values]
+
+    def iter_csv(self) -> Iterator[bytes]:
+        """Yield the encoded CSV, one chunk of rows at a time."""
+        writer = csv.writer(_Echo())
+        buffer = []
+        for row in self.iter_csv_rows():
+            buffer.append(writer.writerow(row))
+            if len(buffer) >= self.csv_chunk_size:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+        if buffer:
+            yield ''.join(buffer).encode('utf-8')
+
+    def iter_gzip(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Compress a byte stream incrementally."""
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
 
-        # Write header row
-        writer.writerow([header for _, header in fields])
-
-        # Write data rows
-        for obj in self.get_queryset():
-            row = []
-            for field_name, _ in fields:
-                # Handle nested attributes (e.g., 'user.username')
-                value = obj
-                for attr in field_name.split('.'):
-                    value = getattr(value, attr, None)
-                    if value is None:
-                        value = ''
-                        break
-                row.append(str(value) if value not in (None, '') else '')
-            writer.writerow(row)
-
+    def export_csv(self):
+        """Return a StreamingHttpResponse with the CSV file."""
+        filename = self.get_csv_filename()
+        if self.request.GET.get('compress') == 'gzip':
+            response = StreamingHttpResponse(self.iter_gzip(self.iter_csv()), content_type='application/gzip')
+            filename = f'{filename}.gz'
+        else:
+            response = StreamingHttpResponse(self.iter_csv(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
@@ -0,0 +1,196 @@
+"""
+Keyset (cursor) pagination for high-volume ListViews.
+
+Instead of OFFSET/LIMIT plus a COUNT(*) per page, each page is fetched with a
+WHERE clause on the sort key of the last row seen, e.g. for a
+('-date', '-created_at', '-id') ordering:
+
+    date < d OR (date = d AND created_at < c) OR (date = d AND created_at = c AND id < i)
+
+With a composite index matching the ordering, every page costs the same index
+range scan no matter how deep it is. The last ordering field must be unique
+(normally '-id') so the order is total. Nullable fields sort NULLs last, so
+their index should be declared as a KeysetIndex with the same expressions.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from django.core import signing
+from django.db.models import F, Index, OrderBy, Q
+
+CURSOR_SALT = 'myhub.pagination.cursor'
+
+FIRST, NEXT, PREVIOUS, LAST = 'f', 'n', 'p', 'l'
+
+
+class KeysetIndex(Index):
+    """
+    An Index whose NULLS FIRST/LAST modifiers are only emitted where they
+    change the order: a descending index already puts NULLs last on databases
+    that sort them low, and SQLite rejects the modifier in an index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        nulls_largest = schema_editor.connection.features.nulls_order_largest
+        expressions = []
+        for expression in self.expressions:
+            if isinstance(expression, OrderBy) and (expression.nulls_first or expression.nulls_last):
+                natural_last = expression.descending != nulls_largest
+                if bool(expression.nulls_last) == natural_last:
+                    expression = OrderBy(expression.expression, descending=expression.descending)
+            expressions.append(expression)
+        index = self.clone()
+        index.expressions = tuple(expressions)
+        return super(KeysetIndex, index).create_sql(model, schema_editor, using=using, **kwargs)
+
+
+class KeysetPage:
+    """A page of results plus opaque cursors for its neighbours."""
+
+    def __init__(self, object_list: list, paginator: 'KeysetPaginator', has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # Filled in by KeysetPaginationMixin with query strings that keep the current filters
+        self.first_url = self.previous_url = self.next_url = self.last_url = None
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(NEXT, self.object_list[-1])
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(PREVIOUS, self.object_list[0])
+
+    @property
+    def last_cursor(self) -> str:
+        return self.paginator.encode_cursor(LAST)
+
+
+class KeysetPaginator:
+    """
+    Paginate `queryset` by the given ordering (Django order_by() syntax).
+    Nullable ordering fields sort their NULLs last.
+    """
+
+    def __init__(self, queryset, ordering: Sequence[str], per_page: int):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys: List[Tuple[str, bool, bool]] = []
+        opts = queryset.model._meta
+        for name in ordering:
+            descending = name.startswith('-')
+            field_name = name.lstrip('-')
+            field = opts.pk if field_name == 'pk' else opts.get_field(field_name)
+            self.keys.append((field.attname, descending, field.null))
+
+    def encode_cursor(self, direction: str, obj=None) -> str:
+        values = []
+        if obj is not None:
+            for attname, _, _ in self.keys:
+                value = getattr(obj, attname)
+                values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, token: Optional[str]) -> Tuple[str, list]:
+        """Return (direction, values); unknown or tampered tokens restart at the first page."""
+        if not token:
+            return FIRST, []
+        try:
+            direction, raw_values = signing.loads(token, salt=CURSOR_SALT)
+        except (signing.BadSignature, ValueError, TypeError):
+            return FIRST, []
+        if direction == LAST:
+            return LAST, []
+        if direction not in (NEXT, PREVIOUS) or len(raw_values) != len(self.keys):
+            return FIRST, []
+
+        opts = self.queryset.model._meta
+        values = []
+        for (attname, _, _), raw in zip(self.keys, raw_values):
+            field = next(f for f in opts.concrete_fields if f.attname == attname)
+            values.append(None if raw is None else field.to_python(raw))
+        return direction, values
+
+    def _order_by(self, reverse: bool):
+        ordering = []
+        for attname, descending, nullable in self.keys:
+            descending = descending != reverse
+            if not nullable:
+                ordering.append(f'-{attname}' if descending else attname)
+                continue
+            expression = F(attname).desc if descending else F(attname).asc
+            # NULLs go last in the forward direction, so first when walking backwards
+            ordering.append(expression(nulls_first=True) if reverse else expression(nulls_last=True))
+        return ordering
+
+    def _seek(self, values: list, reverse: bool) -> Q:
+        """Rows strictly after `values` in the (possibly reversed) ordering."""
+        condition = None
+        equal = Q()
+        for (attname, descending, nullable), value in zip(self.keys, values):
+            step = None
+            if value is None:
+                if reverse:
+                    step = Q(**{f'{attname}__isnull': False})
+                is_equal = Q(**{f'{attname}__isnull': True})
+            else:
+                lookup = 'lt' if descending != reverse else 'gt'
+                step = Q(**{f'{attname}__{lookup}': value})
+                if nullable and not reverse:
+                    step |= Q(**{f'{attname}__isnull': True})
+                is_equal = Q(**{attname: value})
+            if step is not None:
+                clause = equal & step
+                condition = clause if condition is None else condition | clause
+            equal &= is_equal
+        return condition if condition is not None else Q(pk__in=[])
+
+    def page(self, token: Optional[str] = None) -> KeysetPage:
+        direction, values = self.decode_cursor(token)
+        reverse = direction in (PREVIOUS, LAST)
+        queryset = self.queryset.order_by(*self._order_by(reverse))
+        if values:
+            queryset = queryset.filter(self._seek(values, reverse))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if direction == FIRST:
+            return KeysetPage(rows, self, has_next=has_more, has_previous=False)
+        if direction == NEXT:
+            return KeysetPage(rows, self, has_next=has_more, has_previous=True)
+        if direction == PREVIOUS:
+            if not has_more:
+                # Walked back to the start: serve a full first page instead of a short one
+                return self.page(None)
+            return KeysetPage(rows, self, has_next=True, has_previous=True)
+        return KeysetPage(rows, self, has_next=False, has_previous=has_more)
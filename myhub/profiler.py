@@ -0,0 +1,270 @@
+"""
+On-demand profiling of single requests for staff users.
+
+A staff user creates a signed token on the admin "Request profiles" page
+and adds it to a request as ``?_profile=<token>`` or as an
+``X-Profile-Token`` header. ProfileCaptureMiddleware then runs that request
+under a profiler and saves the result in PROFILER_DIR, next to a JSON file
+with the request details and its SQL log:
+
+- ``sample`` mode: a stack sampler thread records the request thread's
+  stack every PROFILER_SAMPLE_INTERVAL seconds and writes folded stacks
+  (``<id>.folded``), which speedscope or flamegraph.pl render as a flame
+  graph.
+- ``cprofile`` mode: deterministic cProfile stats (``<id>.prof``) for
+  snakeviz or pstats. cProfile hooks are process-wide, so only one such
+  capture runs at a time and concurrent ones fall back to sampling.
+
+Requests without a token only pay for a dictionary lookup.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.contrib import admin
+from django.core import signing
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+
+TOKEN_SALT = 'myhub.profiler.token'
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE_TOKEN'
+
+MODES = ('sample', 'cprofile')
+PROFILE_EXTENSIONS = {'sample': '.folded', 'cprofile': '.prof'}
+
+PROFILE_ID = re.compile(r'^[\w-]+$')
+
+# Captured SQL parameters are cut to this length
+MAX_PARAMS_LENGTH = 500
+
+_cprofile_lock = threading.Lock()
+
+
+def profiles_dir() -> Path:
+    return Path(getattr(settings, 'PROFILER_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_token(user, mode: str = 'sample') -> str:
+    """A token letting `user` profile their own requests in `mode` until it expires."""
+    if mode not in MODES:
+        raise ValueError(f'Unknown profiling mode {mode!r}')
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign_object({'user': user.pk, 'mode': mode})
+
+
+def read_token(request) -> Optional[str]:
+    """The profiling mode requested by a valid token for the requesting staff user, or None."""
+    token = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+    if not token:
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or not user.is_staff:
+        return None
+    try:
+        payload = signing.TimestampSigner(salt=TOKEN_SALT).unsign_object(
+            token, max_age=getattr(settings, 'PROFILER_TOKEN_MAX_AGE', 3600),
+        )
+    except signing.BadSignature:
+        return None
+    if payload.get('user') != user.pk or payload.get('mode') not in MODES:
+        return None
+    return payload['mode']
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread, into folded-stack counts."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        root = str(settings.BASE_DIR)
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = code.co_filename
+                if filename.startswith(root):
+                    filename = os.path.relpath(filename, root)
+                stack.append(f'{code.co_name} ({filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+class SQLLog:
+    """execute_wrapper keeping every statement run, with its parameters and duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:MAX_PARAMS_LENGTH],
+                'many': many,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+class Capture:
+    """Profiles one request and writes it to the profiles directory."""
+
+    def __init__(self, request, mode: str):
+        self.request = request
+        self.sql_log = SQLLog()
+        self.cprofile = None
+        self.sampler = None
+        if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+            self.cprofile = cProfile.Profile()
+        else:
+            mode = 'sample'
+            self.sampler = StackSampler(getattr(settings, 'PROFILER_SAMPLE_INTERVAL', 0.001))
+        self.mode = mode
+
+    def run(self, get_response):
+        wrappers = [connection.execute_wrapper(self.sql_log) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        start = time.perf_counter()
+        try:
+            if self.cprofile is not None:
+                response = self.cprofile.runcall(get_response, self.request)
+            else:
+                self.sampler.start()
+                try:
+                    response = get_response(self.request)
+                finally:
+                    self.sampler.stop()
+        finally:
+            self.duration = time.perf_counter() - start
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            if self.cprofile is not None:
+                _cprofile_lock.release()
+        response['X-Profile-Id'] = self.save(response)
+        return response
+
+    def path(self) -> str:
+        """The request path and query string, without the profiling token."""
+        params = self.request.GET.copy()
+        params.pop(QUERY_PARAM, None)
+        return f'{self.request.path}?{params.urlencode()}' if params else self.request.path
+
+    def save(self, response) -> str:
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        now = datetime.now(dt_timezone.utc)
+        slug = re.sub(r'[^\w]+', '-', self.request.path).strip('-')[:60] or 'root'
+        profile_id = f'{now:%Y%m%d-%H%M%S-%f}-{slug}'
+
+        profile_path = directory / f'{profile_id}{PROFILE_EXTENSIONS[self.mode]}'
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(profile_path)
+        else:
+            profile_path.write_text(self.sampler.folded())
+        (directory / f'{profile_id}.json').write_text(json.dumps({
+            'id': profile_id,
+            'created': now.isoformat(timespec='seconds'),
+            'method': self.request.method,
+            'path': self.path(),
+            'user': self.request.user.get_username(),
+            'status': response.status_code,
+            'mode': self.mode,
+            'duration_ms': round(self.duration * 1000, 1),
+            'samples': self.sampler.samples if self.sampler else None,
+            'sql_ms': round(sum(query['ms'] for query in self.sql_log.queries), 1),
+            'queries': self.sql_log.queries,
+            'profile': profile_path.name,
+        }, indent=1))
+        prune_profiles(directory)
+        return profile_id
+
+
+def list_profiles(limit: int = 100) -> List[dict]:
+    """Metadata of the newest captures, without their SQL logs."""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True)[:limit]:
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        meta['query_count'] = len(meta.pop('queries', []))
+        profiles.append(meta)
+    return profiles
+
+
+def prune_profiles(directory: Path) -> None:
+    """Delete the oldest captures beyond PROFILER_MAX_PROFILES."""
+    keep = getattr(settings, 'PROFILER_MAX_PROFILES', 200)
+    for path in sorted(directory.glob('*.json'), reverse=True)[keep:]:
+        for extension in ('.json', *PROFILE_EXTENSIONS.values()):
+            path.with_suffix(extension).unlink(missing_ok=True)
+
+
+def profile_file(profile_id: str, kind: str) -> Optional[Path]:
+    """Path of the profile ('profile') or request log ('sql') of a capture, if it exists."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    directory = profiles_dir()
+    if kind == 'sql':
+        candidates = [directory / f'{profile_id}.json']
+    else:
+        candidates = [directory / f'{profile_id}{extension}' for extension in PROFILE_EXTENSIONS.values()]
+    return next((path for path in candidates if path.is_file()), None)
+
+
+def profiles_view(request):
+    """Admin page listing the captured profiles, with fresh tokens for the current user."""
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+        'tokens': {mode: make_token(request.user, mode) for mode in MODES},
+        'query_param': QUERY_PARAM,
+        'token_minutes': getattr(settings, 'PROFILER_TOKEN_MAX_AGE', 3600) // 60,
+    }
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+
+def profile_download_view(request, profile_id, kind):
+    path = profile_file(profile_id, kind)
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,257 @@
+"""
+Full-text search for the text columns of high-volume models.
+
+A model opts in with a ``search_fields`` tuple (most important field first)
+and a migration running ``CreateSearchIndex`` over the same columns. The
+index lives in the database and is maintained by the database itself, so
+save(), delete(), bulk_create() and queryset.update() all keep it in sync:
+
+- PostgreSQL: a stored, generated ``search_vector`` tsvector column with a
+  GIN index, weighted A, B, C, D in field order.
+- SQLite: an external-content FTS5 table ``<table>_fts`` kept current by
+  insert/update/delete triggers.
+
+Any other database (or an SQLite build without FTS5) falls back to
+``icontains`` filters. Every term of a query is prefix-matched and all terms
+must match.
+
+SQLite rebuilds a table for some ALTER operations, which drops its triggers;
+run ``manage.py rebuild_search_index`` after such a migration.
+"""
+import re
+from typing import Dict, List, Sequence
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.operations.base import Operation
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Longer queries are truncated rather than rejected
+MAX_TERMS = 8
+
+# Relative weight of the 1st..4th search field, matching PostgreSQL's ts_rank defaults for A..D
+FIELD_WEIGHTS = (1.0, 0.4, 0.2, 0.1)
+
+POSTGRES_CONFIG = 'simple'
+POSTGRES_COLUMN = 'search_vector'
+
+TERM = re.compile(r'[^\W_]+')
+
+
+def search_terms(query: str) -> List[str]:
+    """Split free text into lower-cased alphanumeric terms."""
+    return TERM.findall((query or '').lower())[:MAX_TERMS]
+
+
+class SearchBackend:
+    """Icontains fallback; subclasses replace it with an indexed lookup."""
+
+    def __init__(self, connection):
+        self.quote = connection.ops.quote_name
+
+    def install(self, schema_editor, model, fields: Sequence[str]) -> None:
+        pass
+
+    def uninstall(self, schema_editor, model, fields: Sequence[str]) -> None:
+        pass
+
+    def rebuild(self, schema_editor, model, fields: Sequence[str]) -> None:
+        self.install(schema_editor, model, fields)
+
+    def condition(self, model, terms: Sequence[str]):
+        condition = Q()
+        for term in terms:
+            term_condition = Q()
+            for field in model.search_fields:
+                term_condition |= Q(**{f'{field}__icontains': term})
+            condition &= term_condition
+        return condition
+
+    def rank(self, model, terms: Sequence[str]):
+        return RawSQL('0', [], output_field=FloatField())
+
+
+class SQLiteFTSBackend(SearchBackend):
+
+    def _names(self, model, fields):
+        table = model._meta.db_table
+        columns = [self.quote(model._meta.get_field(field).column) for field in fields]
+        return self.quote(table), self.quote(f'{table}_fts'), self.quote(model._meta.pk.column), columns
+
+    def _trigger(self, model, action):
+        return self.quote(f'{model._meta.db_table}_fts_{action}')
+
+    def install(self, schema_editor, model, fields):
+        table, fts, pk, columns = self._names(model, fields)
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.{pk}, {old_values});"
+        insert_new = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.{pk}, {new_values});"
+
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, "
+            f"content={table}, content_rowid={pk}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f'CREATE TRIGGER IF NOT EXISTS {self._trigger(model, "insert")} AFTER INSERT ON {table} BEGIN {insert_new} END')
+        schema_editor.execute(f'CREATE TRIGGER IF NOT EXISTS {self._trigger(model, "delete")} AFTER DELETE ON {table} BEGIN {delete_old} END')
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {self._trigger(model, "update")} AFTER UPDATE OF {column_list} ON {table} '
+            f'BEGIN {delete_old} {insert_new} END'
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def uninstall(self, schema_editor, model, fields):
+        _, fts, _, _ = self._names(model, fields)
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {self._trigger(model, action)}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+    def _match(self, terms):
+        # Terms are alphanumeric only, so quoting them cannot break the FTS5 query syntax
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def condition(self, model, terms):
+        fts = self.quote(f'{model._meta.db_table}_fts')
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [self._match(terms)]))
+
+    def rank(self, model, terms):
+        table, fts, pk, _ = self._names(model, ())
+        weights = ', '.join(str(weight) for weight in _weights(len(model.search_fields)))
+        # bm25() is lower-is-better; negate it so every backend ranks higher-is-better
+        return RawSQL(
+            f'(SELECT -bm25({fts}, {weights}) FROM {fts} '
+            f'WHERE {fts} MATCH %s AND {fts}.rowid = {table}.{pk})',
+            [self._match(terms)],
+            output_field=FloatField(),
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+
+    def install(self, schema_editor, model, fields):
+        quote = self.quote
+        table = model._meta.db_table
+        document = ' || '.join(
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}'::regconfig, "
+            f"coalesce({quote(model._meta.get_field(field).column)}::text, '')), '{'ABCD'[min(index, 3)]}')"
+            for index, field in enumerate(fields)
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {quote(table)} ADD COLUMN IF NOT EXISTS {quote(POSTGRES_COLUMN)} tsvector '
+            f'GENERATED ALWAYS AS ({document}) STORED'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {quote(f"{table}_search_gin")} '
+            f'ON {quote(table)} USING GIN ({quote(POSTGRES_COLUMN)})'
+        )
+
+    def uninstall(self, schema_editor, model, fields):
+        quote = self.quote
+        table = model._meta.db_table
+        schema_editor.execute(f'DROP INDEX IF EXISTS {quote(f"{table}_search_gin")}')
+        schema_editor.execute(f'ALTER TABLE {quote(table)} DROP COLUMN IF EXISTS {quote(POSTGRES_COLUMN)}')
+
+    def _vector(self, model):
+        return f'{self.quote(model._meta.db_table)}.{self.quote(POSTGRES_COLUMN)}'
+
+    def _query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def condition(self, model, terms):
+        return Q(RawSQL(
+            f'{self._vector(model)} @@ to_tsquery(%s::regconfig, %s)',
+            [POSTGRES_CONFIG, self._query(terms)],
+            output_field=BooleanField(),
+        ))
+
+    def rank(self, model, terms):
+        return RawSQL(
+            f'ts_rank({self._vector(model)}, to_tsquery(%s::regconfig, %s))',
+            [POSTGRES_CONFIG, self._query(terms)],
+            output_field=FloatField(),
+        )
+
+
+def _weights(count: int) -> List[float]:
+    return [FIELD_WEIGHTS[min(index, len(FIELD_WEIGHTS) - 1)] for index in range(count)]
+
+
+_backends: Dict[str, SearchBackend] = {}
+
+
+def get_backend(using: str = DEFAULT_DB_ALIAS) -> SearchBackend:
+    """Return the search backend for a database alias."""
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            backend = PostgresSearchBackend(connection)
+        elif connection.vendor == 'sqlite' and _has_fts5(connection):
+            backend = SQLiteFTSBackend(connection)
+        else:
+            backend = SearchBackend(connection)
+        _backends[using] = backend
+    return _backends[using]
+
+
+def _has_fts5(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def search_condition(model, query: str, using: str = DEFAULT_DB_ALIAS):
+    """
+    A filter condition matching rows of `model` whose search fields contain
+    every term of `query`. Combine it with other Q objects as usual.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return Q(pk__in=[])
+    return get_backend(using).condition(model, terms)
+
+
+def search(queryset, query: str, ranked: bool = False):
+    """
+    Filter `queryset` to rows matching `query`. With `ranked`, annotate a
+    `search_rank` (higher is better) and order by it.
+    """
+    queryset = queryset.filter(search_condition(queryset.model, query, using=queryset.db))
+    terms = search_terms(query)
+    if ranked and terms:
+        queryset = queryset.annotate(search_rank=get_backend(queryset.db).rank(queryset.model, terms))
+        queryset = queryset.order_by('-search_rank', '-pk')
+    return queryset
+
+
+class CreateSearchIndex(Operation):
+    """Migration operation installing the full-text index of a model."""
+
+    reversible = True
+
+    def __init__(self, model_name: str, fields: Sequence[str]):
+        self.model_name = model_name
+        self.fields = list(fields)
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'model_name': self.model_name, 'fields': self.fields}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            get_backend(schema_editor.connection.alias).install(schema_editor, model, self.fields)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            get_backend(schema_editor.connection.alias).uninstall(schema_editor, model, self.fields)
+
+    def describe(self):
+        return f'Create full-text search index on {self.model_name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'{self.model_name.lower()}_search_index'
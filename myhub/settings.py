@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     # Third-party apps
     'django_celery_beat',
     # Custom apps
+    'myhub',
     'accounts',
     'projects',
     'finance',
@@ -56,11 +57,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so session and authentication queries are profiled too
+    'myhub.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Needs request.user to check the profiling token belongs to a staff user
+    'myhub.middleware.ProfileCaptureMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -101,6 +106,39 @@ DATABASES = {
 }
 
 
+# Cache
+# Dashboard stats, exchange rates and the mNotify rate limit are cached here and
+# invalidated by whichever process changes them, so every web and Celery worker must
+# share it: set CACHE_URL, e.g. redis://localhost:6379/1. Without it each process
+# gets its own in-memory cache, which is only correct for development and tests.
+# The myhub.cache backends report hits and misses to the request profiler.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'myhub.cache.ProfiledRedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'myhub',
+        },
+        # Token buckets of the mNotify rate limit, apart from data that may be evicted
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('RATE_LIMIT_CACHE_URL', default=CACHE_URL),
+            'KEY_PREFIX': 'myhub.ratelimit',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'myhub.cache.ProfiledLocMemCache',
+        },
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ratelimit',
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -156,6 +194,36 @@ else:
 MNOTIFY_API_KEY = config('MNOTIFY_API_KEY', default='')
 MNOTIFY_SENDER_ID = config('MNOTIFY_SENDER_ID', default='')
 MNOTIFY_SMS_URL = config('MNOTIFY_SMS_URL', default='https://apps.mnotify.net/smsapi')
+# Reminder runs send up to MNOTIFY_MAX_WORKERS SMS at once over pooled connections;
+# MNOTIFY_TIMEOUT bounds each request and MNOTIFY_BATCH_TIMEOUT a whole run (seconds)
+MNOTIFY_MAX_WORKERS = config('MNOTIFY_MAX_WORKERS', default=8, cast=int)
+MNOTIFY_TIMEOUT = config('MNOTIFY_TIMEOUT', default=10, cast=int)
+MNOTIFY_BATCH_TIMEOUT = config('MNOTIFY_BATCH_TIMEOUT', default=120, cast=int)
+# Identical messages go out as one request per MNOTIFY_MAX_RECIPIENTS numbers
+MNOTIFY_MAX_RECIPIENTS = config('MNOTIFY_MAX_RECIPIENTS', default=100, cast=int)
+# Due reminders go through an outbox; workers claim REMINDER_OUTBOX_BATCH_SIZE rows at a time
+# and rows claimed longer than REMINDER_OUTBOX_CLAIM_TIMEOUT seconds ago are claimed again
+REMINDER_OUTBOX_BATCH_SIZE = config('REMINDER_OUTBOX_BATCH_SIZE', default=200, cast=int)
+REMINDER_OUTBOX_CLAIM_TIMEOUT = config('REMINDER_OUTBOX_CLAIM_TIMEOUT', default=300, cast=int)
+# Provider requests per second across all workers (0 = unlimited), in bursts of up to
+# MNOTIFY_RATE_BURST. Shared through this cache alias, which is only shared between
+# processes with CACHE_URL set; a warning is logged at startup otherwise.
+MNOTIFY_RATE_LIMIT = config('MNOTIFY_RATE_LIMIT', default=10, cast=float)
+MNOTIFY_RATE_BURST = config('MNOTIFY_RATE_BURST', default=10, cast=int)
+MNOTIFY_RATE_LIMIT_CACHE = config('MNOTIFY_RATE_LIMIT_CACHE', default='ratelimit')
+# Timeouts, rate limiting and provider 5xx are retried with jittered exponential backoff
+REMINDER_MAX_ATTEMPTS = config('REMINDER_MAX_ATTEMPTS', default=5, cast=int)
+REMINDER_RETRY_BASE_DELAY = config('REMINDER_RETRY_BASE_DELAY', default=30, cast=int)
+REMINDER_RETRY_MAX_DELAY = config('REMINDER_RETRY_MAX_DELAY', default=3600, cast=int)
+# Send each user one digest SMS per run instead of one SMS per reminder, in messages
+# of at most REMINDER_DIGEST_MAX_SEGMENTS SMS segments
+REMINDER_DIGEST = config('REMINDER_DIGEST', default=False, cast=bool)
+REMINDER_DIGEST_MAX_SEGMENTS = config('REMINDER_DIGEST_MAX_SEGMENTS', default=3, cast=int)
+# ReminderLog rows (and finished outbox rows) older than this are deleted nightly, in
+# batches, after being archived as gzipped JSON Lines under REMINDER_LOG_ARCHIVE_DIR if set
+REMINDER_LOG_RETENTION_DAYS = config('REMINDER_LOG_RETENTION_DAYS', default=180, cast=int)
+REMINDER_LOG_PRUNE_BATCH_SIZE = config('REMINDER_LOG_PRUNE_BATCH_SIZE', default=1000, cast=int)
+REMINDER_LOG_ARCHIVE_DIR = config('REMINDER_LOG_ARCHIVE_DIR', default='') or None
 
 # Security headers for PWA
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -171,6 +239,52 @@ CSP_FONT_SRC = ("'self'", "https://cdn.jsdelivr.net")
 CSP_CONNECT_SRC = ("'self'",)
 CSP_MANIFEST_SRC = ("'self'",)
 
+# Request profiling (myhub.middleware.RequestProfilingMiddleware), opt-in through the environment
+REQUEST_PROFILING_ENABLED = config('REQUEST_PROFILING_ENABLED', cast=bool, default=False)
+REQUEST_PROFILING_SLOW_MS = config('REQUEST_PROFILING_SLOW_MS', cast=int, default=500)
+REQUEST_PROFILING_SLOW_SAMPLE_RATE = config('REQUEST_PROFILING_SLOW_SAMPLE_RATE', cast=float, default=1.0)
+REQUEST_PROFILING_N_PLUS_ONE_THRESHOLD = config('REQUEST_PROFILING_N_PLUS_ONE_THRESHOLD', cast=int, default=10)
+# Server-Timing is always sent to staff users; this sends it to everyone
+REQUEST_PROFILING_PUBLIC_HEADER = config('REQUEST_PROFILING_PUBLIC_HEADER', cast=bool, default=DEBUG)
+# File for slow-request samples and N+1 warnings, rotated at 10 MB; stderr if empty
+REQUEST_PROFILING_LOG = config('REQUEST_PROFILING_LOG', default='')
+
+# On-demand profiles of single requests (myhub.profiler), listed at /admin/profiles/
+PROFILER_ENABLED = config('PROFILER_ENABLED', cast=bool, default=True)
+PROFILER_DIR = config('PROFILER_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILER_TOKEN_MAX_AGE = config('PROFILER_TOKEN_MAX_AGE', cast=int, default=3600)
+PROFILER_SAMPLE_INTERVAL = config('PROFILER_SAMPLE_INTERVAL', cast=float, default=0.001)
+PROFILER_MAX_PROFILES = config('PROFILER_MAX_PROFILES', cast=int, default=200)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'profiling': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': REQUEST_PROFILING_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'timestamped',
+        } if REQUEST_PROFILING_LOG else {
+            'class': 'logging.StreamHandler',
+            'formatter': 'timestamped',
+        },
+    },
+    'loggers': {
+        # Slow-request samples and N+1 warnings
+        'myhub.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Reminder defaults
 SUBSCRIPTION_REMINDER_DAYS_BEFORE = config('SUBSCRIPTION_REMINDER_DAYS_BEFORE', cast=int, default=2)
 TASK_REMINDER_MINUTES_BEFORE = config('TASK_REMINDER_MINUTES_BEFORE', cast=int, default=120)
@@ -187,13 +301,27 @@ CELERY_ENABLE_UTC = True
 # Force Django to use pytz for django-celery-beat compatibility
 USE_DEPRECATED_PYTZ = True
 
-# Celery Beat Schedule - Run reminder checks every 15 minutes
+# Reminders are sent by ETA jobs queued when tasks and subscriptions are saved
+# (see notifications.scheduling), for reminders due within REMINDER_ETA_HORIZON seconds.
+# Each sweep queues the REMINDER_SWEEP_INTERVAL seconds entering the horizon, so the
+# horizon must be at least one sweep interval
+REMINDER_ETA_SCHEDULING = config('REMINDER_ETA_SCHEDULING', default=True, cast=bool)
+REMINDER_ETA_HORIZON = config('REMINDER_ETA_HORIZON', default=3600, cast=int)
+REMINDER_SWEEP_INTERVAL = config('REMINDER_SWEEP_INTERVAL', default=1800, cast=int)
+
+# Celery Beat Schedule - Sweep for missed and upcoming reminders every REMINDER_SWEEP_INTERVAL
+from datetime import timedelta
+
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
-    'send-all-reminders-every-15-minutes': {
-        'task': 'notifications.send_all_reminders',
-        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    'sweep-reminders-every-30-minutes': {
+        'task': 'notifications.sweep_reminders',
+        'schedule': timedelta(seconds=REMINDER_SWEEP_INTERVAL),
+    },
+    'prune-reminder-logs-nightly': {
+        'task': 'notifications.prune_reminder_logs',
+        'schedule': crontab(hour=3, minute=30),
     },
 }
 
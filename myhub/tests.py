@@ -0,0 +1,331 @@
+import json
+import tempfile
+from pathlib import Path
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import Event
+from finance.models import Account, Transaction
+from learning.models import Course
+from projects.models import Project
+from tasks.models import Task
+from worklogs.models import WorkLog
+from .dashboard import compute_dashboard_stats, get_dashboard_stats
+from .middleware import RequestProfilingMiddleware, fingerprint
+from .profiler import make_token
+
+User = get_user_model()
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        # User ids are reused once a test's rows are rolled back
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def test_warm_dashboard_skips_aggregates(self):
+        """A second dashboard hit only runs the recent-list queries."""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(reverse('home'))
+        # Session, user and the four recent lists the template renders
+        self.assertEqual(len(warm), 6)
+        self.assertLess(len(warm), len(cold))
+        self.assertEqual(response.context['pending_tasks'], 0)
+
+    def test_writes_invalidate_owner_stats(self):
+        """Saving or deleting any feeding model refreshes its owner's figures."""
+        other = User.objects.create_user(username='other', password='testpass')
+        get_dashboard_stats(self.user)
+        get_dashboard_stats(other)
+
+        project = Project.objects.create(title='Site', owner=self.user)
+        Task.objects.create(title='Write', user=self.user)
+        Course.objects.create(title='Django', owner=self.user)
+        Event.objects.create(title='Standup', user=self.user)
+        WorkLog.objects.create(title='Log', description='Work', user=self.user)
+        account = Account.objects.create(name='Wallet', user=self.user, initial_balance=Decimal('5.00'))
+        Transaction.objects.create(user=self.user, account=account, amount=Decimal('7.00'), t_type='income')
+
+        stats = get_dashboard_stats(self.user)
+        self.assertEqual(
+            (stats['total_projects'], stats['pending_tasks'], stats['total_courses'], stats['total_events'],
+             stats['total_worklogs'], stats['total_accounts']),
+            (1, 1, 1, 1, 1, 1),
+        )
+        self.assertEqual(stats['total_balance'], Decimal('12.00'))
+        self.assertEqual(stats['monthly_income'], Decimal('7.00'))
+        self.assertEqual(get_dashboard_stats(other)['total_projects'], 0)
+
+        project.delete()
+        self.assertEqual(get_dashboard_stats(self.user)['total_projects'], 0)
+
+    def test_timeout_ends_at_next_deadline(self):
+        """Stats expire when the next open task becomes overdue."""
+        Task.objects.create(title='Soon', user=self.user, deadline=timezone.now() + timedelta(minutes=2))
+        stats, timeout = compute_dashboard_stats(self.user)
+        self.assertEqual(stats['overdue_tasks'], 0)
+        self.assertLessEqual(timeout, 120)
+
+    def create_activity(self):
+        now = timezone.now()
+        Project.objects.create(title='Site', owner=self.user)
+        Project.objects.create(title='Old', owner=self.user, status='completed')
+        Task.objects.create(title='Late', user=self.user, deadline=now - timedelta(days=1))
+        Task.objects.create(title='Next', user=self.user, status='in_progress', deadline=now + timedelta(hours=3))
+        Task.objects.create(title='Done', user=self.user, status='completed', deadline=now - timedelta(days=2))
+        Course.objects.create(title='Django', owner=self.user, progress=40)
+        Course.objects.create(title='SQL', owner=self.user, progress=100)
+        Event.objects.create(title='Standup', user=self.user)
+        WorkLog.objects.create(title='Log', description='Work', user=self.user, status='completed')
+        WorkLog.objects.create(title='Log 2', description='Work', user=self.user)
+        Account.objects.create(name='Wallet', user=self.user, initial_balance=Decimal('5.00'))
+
+    def test_counters_use_one_query_per_model(self):
+        """A cold stats read costs one aggregate per model plus the finance reads."""
+        self.create_activity()
+        # Tasks, projects, courses, events, worklogs, profile, account balances, monthly rollups
+        with self.assertNumQueries(8):
+            stats, timeout = compute_dashboard_stats(self.user)
+        self.assertEqual(
+            (stats['total_projects'], stats['ongoing_projects'], stats['pending_tasks'], stats['overdue_tasks'],
+             stats['total_courses'], stats['courses_in_progress'], stats['total_events'],
+             stats['total_worklogs'], stats['completed_worklogs'], stats['in_progress_worklogs'],
+             stats['total_accounts']),
+            (2, 1, 1, 1, 2, 1, 1, 2, 1, 1, 1),
+        )
+        self.assertLessEqual(timeout, 3 * 60 * 60)
+
+    @override_settings(DASHBOARD_UNION_COUNTERS=True)
+    def test_union_counters_match(self):
+        """The UNION ALL path reads every counter in one round trip with the same results."""
+        self.create_activity()
+        with override_settings(DASHBOARD_UNION_COUNTERS=False):
+            expected = compute_dashboard_stats(self.user)[0]
+        user = User.objects.get(pk=self.user.pk)
+        # Counters, profile, account balances, monthly rollups
+        with self.assertNumQueries(4):
+            stats, timeout = compute_dashboard_stats(user)
+        self.assertEqual(stats, expected)
+        self.assertLessEqual(timeout, 3 * 60 * 60)
+
+
+@override_settings(REQUEST_PROFILING_ENABLED=True)
+class RequestProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def test_fingerprint_ignores_parameters(self):
+        """Statements differing only in parameters or list lengths share a fingerprint."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "n" = 5'),
+            fingerprint('SELECT * FROM  "t" WHERE "id" IN (%s) AND "n" = 12'),
+        )
+        self.assertNotIn("'x'", fingerprint("SELECT 'x' FROM \"t\""))
+
+    def test_staff_get_server_timing_header(self):
+        """Staff responses carry query, template and cache timings."""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        with override_settings(REQUEST_PROFILING_PUBLIC_HEADER=False):
+            response = self.client.get(reverse('tasks:task_list'))
+        header = response['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('cache;desc=', header)
+
+    @override_settings(REQUEST_PROFILING_PUBLIC_HEADER=False)
+    def test_header_hidden_from_other_users(self):
+        """Non-staff users do not see internal timings."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tasks:task_list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_PROFILING_PUBLIC_HEADER=True)
+    def test_cache_lookups_are_counted_by_the_profiled_backend(self):
+        """The CACHES backend reports hits and misses of the profiled request only."""
+        def view(request):
+            cache.set('profiled', 1)
+            cache.get('profiled')
+            cache.get('missing')
+            cache.get_many(['profiled', 'missing'])
+            return HttpResponse('ok')
+
+        cache.get('outside a request')
+        response = RequestProfilingMiddleware(view)(RequestFactory().get('/cached/'))
+        self.assertIn('cache;desc="2 hits, 2 misses"', response['Server-Timing'])
+
+    @override_settings(
+        REQUEST_PROFILING_N_PLUS_ONE_THRESHOLD=3, REQUEST_PROFILING_SLOW_MS=0, REQUEST_PROFILING_PUBLIC_HEADER=True,
+    )
+    def test_repeated_queries_and_slow_requests_are_logged(self):
+        """A loop of identical queries is flagged and the slow sample names it."""
+        tasks = [Task.objects.create(title=f'Task {i}', user=self.user) for i in range(5)]
+
+        def view(request):
+            for task in tasks:
+                Task.objects.get(pk=task.pk)
+            return HttpResponse('ok')
+
+        middleware = RequestProfilingMiddleware(view)
+        with self.assertLogs('myhub.profiling', 'INFO') as logs:
+            response = middleware(RequestFactory().get('/loop/'))
+        self.assertIn('nplusone;desc="1 repeated queries"', response['Server-Timing'])
+        warning, sample = logs.records
+        self.assertIn('5x SELECT', warning.getMessage())
+        slow = json.loads(sample.getMessage())
+        self.assertEqual((slow['path'], slow['queries']), ('/loop/', 5))
+        self.assertEqual(slow['top_queries'][0]['count'], 5)
+
+
+class ProfileCaptureTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(PROFILER_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user(username='staff', password='testpass', is_staff=True)
+
+    def test_sampled_capture_with_query_token(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('tasks:task_list'), {'status': 'pending', '_profile': make_token(self.staff)})
+        profile_id = response['X-Profile-Id']
+
+        meta = json.loads((self.directory / f'{profile_id}.json').read_text())
+        self.assertEqual(meta['mode'], 'sample')
+        self.assertEqual(meta['path'], '/tasks/?status=pending')
+        self.assertTrue(meta['queries'])
+        self.assertTrue((self.directory / f'{profile_id}.folded').exists())
+
+        page = self.client.get(reverse('profiler_profiles'))
+        self.assertContains(page, '/tasks/?status=pending')
+        download = self.client.get(reverse('profiler_download', args=[profile_id, 'sql']))
+        self.assertEqual(download.status_code, 200)
+
+    def test_cprofile_capture_with_header(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('home'), HTTP_X_PROFILE_TOKEN=make_token(self.staff, 'cprofile'))
+        self.assertTrue((self.directory / f"{response['X-Profile-Id']}.prof").exists())
+
+    def test_token_ignored_for_other_users(self):
+        user = User.objects.create_user(username='plain', password='testpass')
+        self.client.force_login(user)
+        response = self.client.get(reverse('home'), {'_profile': make_token(user)})
+        self.assertNotIn('X-Profile-Id', response)
+        # A staff token presented by someone else is ignored too
+        response = self.client.get(reverse('home'), {'_profile': make_token(self.staff)})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_seed_and_run_small_dataset(self):
+        """The benchmark runs end to end and leaves no reminder logs behind."""
+        from benchmarks.runner import compare, run
+        from benchmarks.seed import seed
+        from notifications.models import ReminderLog
+
+        counts = seed(users=1, volumes={
+            'accounts': 2, 'projects': 2, 'transactions': 50, 'tasks': 40, 'worklogs': 5,
+            'events': 5, 'courses': 1, 'subscriptions': 10,
+        })
+        self.assertEqual(counts['transactions'], 50)
+        self.assertEqual(Transaction.objects.count(), 50)
+
+        report = run(repeat=2, warmup=0, only=['dashboard', 'transaction_csv', 'task_detail', 'send_all_reminders'])
+        self.assertEqual(set(report['results']), {'dashboard', 'transaction_csv', 'task_detail', 'send_all_reminders'})
+        self.assertEqual(report['results']['dashboard']['status'], [200])
+        self.assertEqual(report['results']['transaction_csv']['status'], [200])
+        self.assertGreater(report['results']['send_all_reminders']['queries'], 0)
+        self.assertEqual(report['meta']['dataset']['transactions'], 50)
+        self.assertFalse(ReminderLog.objects.exists())
+        json.dumps(report)
+
+        slower = json.loads(json.dumps(report))
+        slower['results']['dashboard']['p50_ms'] = report['results']['dashboard']['p50_ms'] * 2 + 1
+        slower['results']['dashboard']['queries'] += 1
+        self.assertEqual(len(compare(report, slower)), 2)
+
+class FakeGatewayTests(TestCase):
+    def test_gateway_speaks_the_mnotify_protocol(self):
+        from benchmarks.fake_mnotify import FakeMNotify
+        from notifications.services.mnotify import is_retryable, send_sms
+
+        def send(gateway, key='key'):
+            return send_sms(api_key=key, sender_id='me', to_number='+233200000000', message='Hi', sms_url=gateway.url)
+
+        with FakeMNotify(api_key='key') as gateway:
+            self.assertTrue(send(gateway)[0])
+            with self.assertLogs('notifications.services.mnotify', 'WARNING'):
+                ok, detail = send(gateway, key='wrong')
+            self.assertFalse(ok)
+            self.assertEqual(detail['text'], '1004')
+            self.assertFalse(is_retryable(detail))
+        self.assertEqual(gateway.stats.summary()['responses'], {'1000': 1, '1004': 1})
+
+        with FakeMNotify(error_rate=1) as gateway, self.assertLogs('notifications.services.mnotify', 'WARNING'):
+            ok, detail = send(gateway)
+            self.assertEqual(detail['status_code'], 500)
+            self.assertTrue(is_retryable(detail))
+
+        with FakeMNotify(rate_limit=1, burst=1) as gateway:
+            self.assertTrue(send(gateway)[0])
+            with self.assertLogs('notifications.services.mnotify', 'WARNING'):
+                self.assertEqual(send(gateway)[1]['status_code'], 429)
+
+    def test_reminder_benchmark_runs_end_to_end(self):
+        from benchmarks.reminders import run_reminder_benchmark
+        from benchmarks.seed import seed
+        from notifications.models import ReminderLog
+
+        seed(users=2, volumes={
+            'accounts': 1, 'projects': 1, 'transactions': 1, 'tasks': 1, 'worklogs': 1,
+            'events': 1, 'courses': 1, 'subscriptions': 1,
+        })
+        tasks = Task.objects.count()
+
+        report = run_reminder_benchmark(reminders=12, latency=0, max_workers=4)
+        self.assertEqual(report['results']['sent'], 12)
+        self.assertEqual(report['results']['gateway']['requests'], 12)
+        self.assertLessEqual(report['results']['gateway']['connections'], 4)
+
+        report = run_reminder_benchmark(reminders=12, latency=0, identical=True)
+        # One text, sent to every recipient in a single request
+        self.assertEqual(report['results']['gateway']['requests'], 1)
+        self.assertEqual(report['results']['gateway']['recipients'], 12)
+
+        self.assertEqual(Task.objects.count(), tasks)
+        self.assertFalse(ReminderLog.objects.exists())
+
+
+class LoadTestHarnessTests(TransactionTestCase):
+    def test_journeys_run_against_wsgi_application(self):
+        """Each journey step is recorded per endpoint, and the created transaction is saved."""
+        from benchmarks.loadtest import run_load_test
+        from benchmarks.seed import seed
+
+        seed(users=1, volumes={
+            'accounts': 1, 'projects': 1, 'transactions': 5, 'tasks': 5, 'worklogs': 2,
+            'events': 2, 'courses': 1, 'subscriptions': 1,
+        })
+        report = run_load_test(concurrency=1, iterations=1)
+
+        self.assertEqual(report['overall']['errors'], 0, report['endpoints'])
+        self.assertEqual(report['overall']['requests'], 9)
+        self.assertEqual(report['endpoints']['login']['requests'], 1)
+        self.assertEqual(report['endpoints']['transaction_create']['requests'], 1)
+        self.assertEqual(Transaction.objects.filter(description__startswith='load test').count(), 1)
@@ -20,9 +20,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum, Q, Count
-from django.utils import timezone
-from datetime import timedelta
+
+from . import profiler
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -36,71 +35,35 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # Import models here to avoid circular imports
         from projects.models import Project
         from tasks.models import Task
-        from finance.models import Account, Transaction
+        from finance.models import Transaction
         from learning.models import Course
         from analytics.models import Event
         from worklogs.models import WorkLog
+        from .dashboard import get_dashboard_stats
 
-        # Projects data
-        context['total_projects'] = Project.objects.filter(owner=user).count()
-        context['ongoing_projects'] = Project.objects.filter(owner=user, status='ongoing').count()
-        context['recent_projects'] = Project.objects.filter(owner=user).select_related('owner').order_by('-created_at')[:5]
+        # Counters, balances and monthly totals are cached per user
+        context.update(get_dashboard_stats(user))
 
-        # Tasks data
-        context['pending_tasks'] = Task.objects.filter(user=user, status='pending').count()
-        context['overdue_tasks'] = Task.objects.filter(
-            user=user,
-            status__in=['pending', 'in_progress'],
-            deadline__lt=timezone.now()
-        ).count()
+        # Recent lists are always read live
+        context['recent_projects'] = Project.objects.filter(owner=user).select_related('owner').order_by('-created_at')[:5]
         context['upcoming_tasks'] = Task.objects.filter(
             user=user,
             status__in=['pending', 'in_progress'],
             deadline__isnull=False
         ).select_related('project').order_by('deadline')[:5]
-
-        # Finance data - optimize with prefetch
-        accounts = Account.objects.filter(user=user, is_active=True).prefetch_related('transactions')
-        context['total_accounts'] = accounts.count()
-        total_balance = sum(acc.current_balance() for acc in accounts)
-        context['total_balance'] = total_balance
-
-        # Recent transactions
         context['recent_transactions'] = Transaction.objects.filter(
             user=user
         ).select_related('account', 'project').order_by('-date')[:10]
-
-        # Monthly income/expense
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
-        monthly_income = Transaction.objects.filter(
-            user=user, t_type='income', date__gte=thirty_days_ago
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        monthly_expense = Transaction.objects.filter(
-            user=user, t_type='expense', date__gte=thirty_days_ago
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        context['monthly_income'] = monthly_income
-        context['monthly_expense'] = monthly_expense
-        context['monthly_net'] = monthly_income - monthly_expense
-
-        # Learning data
-        context['total_courses'] = Course.objects.filter(owner=user).count()
-        context['courses_in_progress'] = Course.objects.filter(owner=user, progress__lt=100).count()
         context['recent_courses'] = Course.objects.filter(owner=user).select_related('owner').order_by('-created_at')[:5]
-
-        # Analytics data
-        context['total_events'] = Event.objects.filter(user=user).count()
         context['recent_events'] = Event.objects.filter(user=user).select_related('project').order_by('-start_time')[:5]
-
-        # Work logs data
-        context['total_worklogs'] = WorkLog.objects.filter(user=user).count()
-        context['completed_worklogs'] = WorkLog.objects.filter(user=user, status='completed').count()
-        context['in_progress_worklogs'] = WorkLog.objects.filter(user=user, status='in_progress').count()
         context['recent_worklogs'] = WorkLog.objects.filter(user=user).select_related('project', 'task').order_by('-created_at')[:5]
 
         return context
 
 urlpatterns = [
     path('', DashboardView.as_view(), name='home'),
+    path('admin/profiles/', admin.site.admin_view(profiler.profiles_view), name='profiler_profiles'),
+    path('admin/profiles/<str:profile_id>/<str:kind>/', admin.site.admin_view(profiler.profile_download_view), name='profiler_download'),
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
     path('accounts/', include('accounts.urls')),
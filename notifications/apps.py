@@ -3,4 +3,14 @@ from django.apps import AppConfig
 
 class NotificationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "notifications"
\ No newline at end of file
+    name = "notifications"
+
+    def ready(self):
+        from django.conf import settings
+
+        from .scheduling import connect_signals
+        from .services.ratelimit import warn_if_process_local
+
+        connect_signals()
+        if getattr(settings, "MNOTIFY_RATE_LIMIT", 0):
+            warn_if_process_local(getattr(settings, "MNOTIFY_RATE_LIMIT_CACHE", "default"))
@@ -0,0 +1,78 @@
+"""
+Per-user reminder digests.
+
+With REMINDER_DIGEST on, the reminders a delivery batch holds for the same
+user and phone number go out as one SMS listing them all, instead of one SMS
+each. A digest longer than REMINDER_DIGEST_MAX_SEGMENTS SMS segments is split
+into several messages at item boundaries. Every outbox row still gets its own
+ReminderLog, holding the text of the message that carried it.
+"""
+from typing import Iterator, List, Sequence, Tuple
+
+from notifications.services.mnotify import SMSMessage
+
+DIGEST_HEADER = "Reminders:"
+
+# GSM 03.38 basic character set; anything outside it (and the extension table)
+# makes the whole message UCS-2
+GSM_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Characters sent as an escape plus a code, so two septets each
+GSM_EXTENDED = set("^{}\\[~]|€\f")
+
+
+def sms_segments(text: str) -> int:
+    """How many SMS segments `text` is billed as"""
+    if all(char in GSM_BASIC or char in GSM_EXTENDED for char in text):
+        length = sum(2 if char in GSM_EXTENDED else 1 for char in text)
+        single, multipart = 160, 153
+    else:
+        # UTF-16 code units
+        length = len(text.encode("utf-16-le")) // 2
+        single, multipart = 70, 67
+    if length <= single:
+        return 1
+    return -(-length // multipart)
+
+
+def digest_line(item) -> str:
+    return f"- {item.summary or item.message}"
+
+
+def pack_digest(items: Sequence, max_segments: int) -> Iterator[Tuple[str, List]]:
+    """
+    Split one user's reminders into as few digest texts as fit in
+    `max_segments` segments each. Yields (text, items covered).
+    """
+    text, covered = DIGEST_HEADER, []
+    for item in items:
+        candidate = f"{text}\n{digest_line(item)}"
+        if covered and sms_segments(candidate) > max_segments:
+            yield text, covered
+            candidate = f"{DIGEST_HEADER}\n{digest_line(item)}"
+            covered = []
+        text = candidate
+        covered.append(item)
+    if covered:
+        yield text, covered
+
+
+def build_digests(batch: Sequence, max_segments: int) -> List[Tuple[SMSMessage, List]]:
+    """
+    Group outbox rows by user and phone number into the messages to send.
+    Returns (message, rows it covers) pairs; lone reminders keep their own text.
+    """
+    groups = {}
+    for item in batch:
+        groups.setdefault((item.user_id, item.phone_number), []).append(item)
+
+    messages = []
+    for (_, phone), items in groups.items():
+        if len(items) == 1:
+            messages.append((SMSMessage(phone, items[0].message), items))
+            continue
+        for text, covered in pack_digest(items, max_segments):
+            messages.append((SMSMessage(phone, text), covered))
+    return messages
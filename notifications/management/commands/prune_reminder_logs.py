@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.retention import compact_reminder_logs, prune_reminder_logs, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Delete (optionally archiving) reminder logs past the retention period, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Keep logs sent within this many days (default: REMINDER_LOG_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches, to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            help="Write deleted logs to a gzipped JSON Lines file in this directory first.",
+        )
+        parser.add_argument(
+            "--compact",
+            action="store_true",
+            help="Also strip request payloads and raw responses from the logs that are kept.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days cannot be negative.")
+        cutoff = retention_cutoff(options["days"])
+
+        def progress(count):
+            self.stdout.write(f"{count} logs deleted...")
+
+        result = prune_reminder_logs(
+            cutoff=cutoff,
+            batch_size=options["batch_size"],
+            archive_dir=options["archive_dir"],
+            pause=options["pause"],
+            dry_run=options["dry_run"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['logs']} reminder logs and {result['outbox']} outbox rows sent before {cutoff:%Y-%m-%d %H:%M}."
+        ))
+        if result["archive"]:
+            self.stdout.write(f"Archived to {result['archive']}")
+
+        if options["compact"] and not options["dry_run"]:
+            compacted = compact_reminder_logs(batch_size=options["batch_size"], pause=options["pause"])
+            self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} reminder logs."))
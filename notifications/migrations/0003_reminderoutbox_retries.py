@@ -0,0 +1,23 @@
+# Generated by Django 6.0.9 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_reminderoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminderoutbox',
+            name='last_error',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='reminderoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.9 on 2026-10-18 12:00
+
+from django.db import migrations
+
+
+def remove_polling_schedule(apps, schema_editor):
+    # The database scheduler keeps entries dropped from CELERY_BEAT_SCHEDULE
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(
+        name='send-all-reminders-every-15-minutes', task='notifications.send_all_reminders',
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+        ('notifications', '0003_reminderoutbox_retries'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_polling_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.9 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_remove_reminder_polling_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminderoutbox',
+            name='summary',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+    ]
@@ -46,3 +46,64 @@ class ReminderLog(models.Model):
 
     def __str__(self):
         return f"{self.reminder_type} reminder for {self.user.username} on {self.reminder_for_date}"
+
+
+class ReminderOutbox(models.Model):
+    """
+    Reminders waiting to be sent. Runs enqueue each due reminder once; any
+    number of workers then claim pending rows in batches, send them and
+    record the outcome in ReminderLog.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    OPEN_STATUSES = ('pending', 'sending')
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='reminder_outbox'
+    )
+    reminder_type = models.CharField(max_length=20, choices=ReminderLog.REMINDER_TYPES)
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    reminder_for_date = models.DateTimeField()
+
+    phone_number = models.CharField(max_length=20)
+    message = models.TextField()
+    # One-line description used when the reminder is sent as part of a digest
+    summary = models.CharField(max_length=200, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Pending retries are not claimed before this time
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=200, blank=True)
+    # Set by the worker holding the row while it is being sent
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Only rows still to be sent are indexed, so claiming stays cheap as sent rows pile up
+            models.Index(
+                fields=['status', 'id'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='reminder_outbox_open_idx',
+            ),
+            models.Index(fields=['claim_token'], name='reminder_outbox_claim_idx'),
+        ]
+        # A reminder is enqueued once, however many runs see it due
+        unique_together = [['content_type', 'object_id', 'reminder_for_date']]
+
+    def __str__(self):
+        return f"{self.reminder_type} reminder for {self.phone_number} ({self.status})"
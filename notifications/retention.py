@@ -0,0 +1,145 @@
+"""
+ReminderLog retention.
+
+Logs only need to outlive the reminder they dedupe: once its date has passed
+an object can't be reminded for it again. prune_reminder_logs deletes logs
+sent more than REMINDER_LOG_RETENTION_DAYS ago, and finished outbox rows
+processed before then, in short id-ordered batches that each commit on their
+own, so no lock is held for long. Deleted logs can first be written to a
+gzipped JSON Lines archive, one row per line.
+
+New logs store a compacted response_detail (see compact_response_detail);
+compact_reminder_logs rewrites older rows that still hold the request payload,
+with its API key, and the raw provider response.
+"""
+import gzip
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from notifications.models import ReminderLog, ReminderOutbox
+from notifications.services.mnotify import parse_response
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'reminder_type', 'content_type__app_label', 'content_type__model', 'object_id',
+    'reminder_for_date', 'sent_at', 'phone_number', 'message', 'success', 'response_detail',
+)
+
+# Kept from a send's details as they are
+COMPACT_KEYS = ('status_code', 'error', 'dry_run', 'recipients')
+
+
+def compact_response_detail(detail):
+    """A send's details cut down to its status, provider code and message id"""
+    if not isinstance(detail, dict):
+        return detail
+    compact = {key: detail[key] for key in COMPACT_KEYS if key in detail}
+    if 'text' in detail:
+        code, message_id = parse_response(detail['text'])
+        if code:
+            compact['code'] = code
+        if message_id:
+            compact['message_id'] = message_id
+    return compact
+
+
+def retention_cutoff(days: Optional[int] = None):
+    if days is None:
+        days = getattr(settings, 'REMINDER_LOG_RETENTION_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def expired_logs(cutoff):
+    # Logs whose reminder date is still ahead keep deduping it
+    return ReminderLog.objects.filter(sent_at__lt=cutoff, reminder_for_date__lt=timezone.now())
+
+
+def archive_path(directory) -> Path:
+    return Path(directory) / f"reminder_logs-{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz"
+
+
+def _delete_in_batches(queryset, batch_size, pause, on_batch=None) -> int:
+    deleted = 0
+    while True:
+        rows = list(queryset.order_by('id').values(*ARCHIVE_FIELDS if on_batch else ('id',))[:batch_size])
+        if not rows:
+            return deleted
+        if on_batch is not None:
+            on_batch(rows)
+        queryset.model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def prune_reminder_logs(
+    cutoff=None,
+    batch_size: int = 1000,
+    archive_dir=None,
+    pause: float = 0,
+    dry_run: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+) -> dict:
+    """
+    Delete logs and finished outbox rows older than `cutoff`, archiving the
+    logs under `archive_dir` first if given. Returns the counts (and the
+    archive path).
+    """
+    cutoff = cutoff or retention_cutoff()
+    logs = expired_logs(cutoff)
+    outbox = ReminderOutbox.objects.filter(status__in=['sent', 'failed'], processed_at__lt=cutoff)
+    if dry_run:
+        return {'logs': logs.count(), 'outbox': outbox.count(), 'archive': None}
+
+    result = {'logs': 0, 'outbox': 0, 'archive': None}
+    stream = None
+    if archive_dir:
+        path = archive_path(archive_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stream = gzip.open(path, 'wt', encoding='utf-8')
+        result['archive'] = str(path)
+
+    def archive(rows):
+        if stream is not None:
+            for row in rows:
+                row['content_type'] = f"{row.pop('content_type__app_label')}.{row.pop('content_type__model')}"
+                row['response_detail'] = compact_response_detail(row['response_detail'])
+                stream.write(json.dumps(row, default=str) + '\n')
+            # Rows are only deleted once they are on disk
+            stream.flush()
+        result['logs'] += len(rows)
+        if progress:
+            progress(result['logs'])
+
+    try:
+        _delete_in_batches(logs, batch_size, pause, on_batch=archive)
+    finally:
+        if stream is not None:
+            stream.close()
+    result['outbox'] = _delete_in_batches(outbox, batch_size, pause)
+    return result
+
+
+def compact_reminder_logs(batch_size: int = 1000, pause: float = 0) -> int:
+    """Compact the response_detail of logs written before compaction. Returns how many were rewritten."""
+    compacted = 0
+    last_id = 0
+    while True:
+        batch = list(
+            ReminderLog.objects.filter(id__gt=last_id, response_detail__has_key='payload')
+            .order_by('id').only('id', 'response_detail')[:batch_size]
+        )
+        if not batch:
+            return compacted
+        for log in batch:
+            log.response_detail = compact_response_detail(log.response_detail)
+        ReminderLog.objects.bulk_update(batch, ['response_detail'])
+        compacted += len(batch)
+        last_id = batch[-1].id
+        if pause:
+            time.sleep(pause)
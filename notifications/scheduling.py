@@ -0,0 +1,124 @@
+"""
+Event-driven reminder scheduling.
+
+Saving a Task or Subscription whose reminder falls within
+REMINDER_ETA_HORIZON queues a Celery job with its reminder time as ETA, once
+the transaction commits. Jobs check the row again when they run, so one made
+stale by a later save (a moved deadline, a completed task) simply finds
+nothing due; no revocation is needed. Saves that leave the reminder time
+where it was when the row was loaded queue nothing, so re-saving a task whose
+reminder was already sent doesn't queue an immediate job for it. Reminders
+further out are picked up by the sweep_reminders beat task, which also sends
+anything a lost job missed. Every REMINDER_SWEEP_INTERVAL seconds it queues
+only the slice of time that has just entered the horizon, so consecutive
+sweeps don't queue the same reminder twice.
+
+Jobs are only queued for the horizon because brokers hold ETA messages
+unacknowledged until they are due, and Redis redelivers those older than its
+visibility timeout (an hour by default).
+"""
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_UNLOADED = object()
+
+# Model label -> (reminder due field, Celery task name)
+SCHEDULED_MODELS = {
+    'tasks.Task': ('reminder_due_at', 'notifications.send_due_task_reminder'),
+    'finance.Subscription': ('reminder_due_on', 'notifications.send_due_subscription_reminder'),
+}
+
+
+def reminder_eta(due):
+    """The moment a reminder due at `due` is sent; subscription reminders are due at the start of their day"""
+    if due is None or hasattr(due, 'hour'):
+        return due
+    return timezone.make_aware(timezone.datetime.combine(due, timezone.datetime.min.time()))
+
+
+def horizon():
+    return timedelta(seconds=getattr(settings, 'REMINDER_ETA_HORIZON', 3600))
+
+
+def sweep_interval():
+    return timedelta(seconds=getattr(settings, 'REMINDER_SWEEP_INTERVAL', 1800))
+
+
+def schedule_reminder(label, object_id, eta) -> bool:
+    """Queue the reminder job of one object for `eta`. Returns False if the broker refused it."""
+    from celery import current_app
+
+    _, task_name = SCHEDULED_MODELS[label]
+    try:
+        # Fail fast without a broker: the sweeper catches up later
+        current_app.send_task(task_name, args=[object_id], eta=eta, retry=False)
+    except Exception:
+        logger.warning(f"Could not schedule {label} {object_id} reminder for {eta}", exc_info=True)
+        return False
+    return True
+
+
+def _snapshot_on_init(sender, instance, **kwargs):
+    """Remember the reminder time a loaded row's source fields give, to tell whether a save moved it"""
+    # Deferred source fields would each cost a query to read
+    if instance.pk is None or sender.REMINDER_SOURCE_FIELDS.intersection(instance.get_deferred_fields()):
+        return
+    field, _ = SCHEDULED_MODELS[sender._meta.label]
+    # Derived rather than read: the stored value is cleared once the reminder is sent
+    instance._reminder_due_snapshot = getattr(instance, f'get_{field}')()
+
+
+def _schedule_on_save(sender, instance, update_fields=None, **kwargs):
+    if not getattr(settings, 'REMINDER_ETA_SCHEDULING', True):
+        return
+    if update_fields is not None and not sender.REMINDER_SOURCE_FIELDS.intersection(update_fields):
+        return
+    label = sender._meta.label
+    field, _ = SCHEDULED_MODELS[label]
+    due = getattr(instance, field)
+    unchanged = getattr(instance, '_reminder_due_snapshot', _UNLOADED) == due
+    instance._reminder_due_snapshot = due
+    eta = reminder_eta(due)
+    if unchanged or eta is None or eta > timezone.now() + horizon():
+        return
+    object_id = instance.pk
+    transaction.on_commit(lambda: schedule_reminder(label, object_id, eta))
+
+
+def schedule_upcoming_reminders() -> int:
+    """
+    Queue jobs for the reminders that entered the horizon since the previous
+    sweep, those due in (now + horizon - sweep interval, now + horizon].
+    Earlier ones were queued by that sweep or when they were saved. Returns
+    how many were queued.
+    """
+    end = timezone.now() + horizon()
+    start = end - min(sweep_interval(), horizon())
+    scheduled = 0
+    for label, (field, _) in SCHEDULED_MODELS.items():
+        model = apps.get_model(label)
+        if field == 'reminder_due_on':
+            # Candidate days; the exact window is checked against their ETA below
+            window = {f'{field}__gte': timezone.localdate(start), f'{field}__lte': timezone.localdate(end)}
+        else:
+            window = {f'{field}__gt': start, f'{field}__lte': end}
+        for object_id, due in model.objects.filter(**window).values_list('pk', field).iterator():
+            eta = reminder_eta(due)
+            if start < eta <= end:
+                scheduled += schedule_reminder(label, object_id, eta)
+    return scheduled
+
+
+def connect_signals() -> None:
+    for label in SCHEDULED_MODELS:
+        model = apps.get_model(label)
+        post_init.connect(_snapshot_on_init, sender=model, dispatch_uid=f'reminder-snapshot-{label}')
+        post_save.connect(_schedule_on_save, sender=model, dispatch_uid=f'reminder-eta-{label}')
@@ -1,9 +1,88 @@
+import json
 import requests
 import logging
-from typing import Tuple, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Tuple, Dict, Any, List, NamedTuple, Optional, Sequence
+
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SMS_URL = "https://apps.mnotify.net/smsapi"
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_BATCH_TIMEOUT = 120
+# Recipients per multi-recipient request
+DEFAULT_MAX_RECIPIENTS = 100
+
+# Failures that may succeed when sent again later. 1002 is mNotify's generic
+# "sending failed" and 1003 "insufficient balance"; other codes (invalid key,
+# number or sender id, empty message) fail the same way every time.
+RETRYABLE_PROVIDER_CODES = {"1002", "1003"}
+# A request that timed out waiting for its response may still have been
+# delivered, so retrying "Request timeout" is at-least-once: an SMS can arrive
+# twice. "Batch timeout" is only reported for requests that were never sent;
+# those abandoned mid-flight get "Batch timeout in flight" and are not retried.
+RETRYABLE_ERRORS = {"Request timeout", "Connection error", "Batch timeout", "Rate limited"}
+
+_session: Optional[requests.Session] = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+class SMSMessage(NamedTuple):
+    to_number: str
+    message: str
+
+
+def get_session(pool_size: int = DEFAULT_MAX_WORKERS) -> requests.Session:
+    """
+    The process-wide HTTP session, so keep-alive connections (and their TLS
+    handshakes) are reused across messages and runs. Its pool holds at
+    least `pool_size` connections per host.
+    """
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None or _session_pool_size < pool_size:
+            # A session with a smaller pool is left to finish its in-flight requests
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pool_size = session, pool_size
+        return _session
+
+
+def is_retryable(detail: Dict[str, Any]) -> bool:
+    """Whether a failed send may succeed if tried again, judging by its details_dict"""
+    if detail.get("error") in RETRYABLE_ERRORS:
+        return True
+    status_code = detail.get("status_code")
+    if status_code is None:
+        return False
+    if status_code == 429 or status_code >= 500:
+        return True
+    return status_code == 200 and detail.get("text", "").strip()[:4] in RETRYABLE_PROVIDER_CODES
+
+
+def parse_response(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The provider status code and message id in a response body. The legacy
+    endpoint answers with a bare code ("1000"); JSON answers may carry both.
+    """
+    text = (text or "").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        summary = data.get("summary") if isinstance(data.get("summary"), dict) else {}
+        message_id = data.get("message_id") or data.get("_id") or summary.get("_id")
+        code = data.get("code")
+        return (str(code) if code is not None else None), (str(message_id) if message_id else None)
+    code = text[:4]
+    return (code if code.isdigit() else None), None
+
 
 def send_sms(
     *,
@@ -11,14 +90,16 @@ def send_sms(
     sender_id: str,
     to_number: str,
     message: str,
-    sms_url: str = "https://apps.mnotify.net/smsapi",
+    sms_url: str = DEFAULT_SMS_URL,
     timeout: int = 10,
     dry_run: bool = False,
+    session: Optional[requests.Session] = None,
 ) -> Tuple[bool, Dict[str, Any]]:
     """
     Send an SMS via mNotify.
 
     Returns (success, details_dict). In dry_run mode, no request is made.
+    The request goes through the pooled session unless one is given.
     """
     payload = {
         "key": api_key,
@@ -32,7 +113,7 @@ def send_sms(
         return True, {"dry_run": True, "payload": payload}
 
     try:
-        resp = requests.post(sms_url, data=payload, timeout=timeout)
+        resp = (session or get_session()).post(sms_url, data=payload, timeout=timeout)
         ok = resp.status_code == 200 and "1000" in resp.text
 
         if ok:
@@ -54,4 +135,188 @@ def send_sms(
 
     except requests.RequestException as exc:
         logger.error(f"SMS request error for {to_number}: {exc}")
-        return False, {"error": str(exc), "payload": payload}
\ No newline at end of file
+        return False, {"error": str(exc), "payload": payload}
+
+
+def send_bulk_sms(
+    *,
+    api_key: str,
+    sender_id: str,
+    to_numbers: Sequence[str],
+    message: str,
+    sms_url: str = DEFAULT_SMS_URL,
+    timeout: int = 10,
+    dry_run: bool = False,
+    session: Optional[requests.Session] = None,
+) -> List[Tuple[bool, Dict[str, Any]]]:
+    """
+    Send one SMS to many recipients in a single mNotify request, which takes
+    a comma-separated "to" list.
+
+    Returns one (success, details_dict) per recipient, in order. The provider
+    answers with one status for the whole request, so every recipient shares
+    it; each details_dict carries that recipient's own payload.
+    """
+    payload = {
+        "key": api_key,
+        "to": ",".join(to_numbers),
+        "msg": message,
+        "sender_id": sender_id,
+    }
+
+    def per_recipient(ok, detail):
+        return [
+            (ok, {**detail, "recipients": len(to_numbers), "payload": {**payload, "to": number}})
+            for number in to_numbers
+        ]
+
+    if dry_run:
+        logger.info(f"Bulk SMS dry run: {len(to_numbers)} recipients - {message[:50]}...")
+        return per_recipient(True, {"dry_run": True})
+
+    try:
+        resp = (session or get_session()).post(sms_url, data=payload, timeout=timeout)
+        ok = resp.status_code == 200 and "1000" in resp.text
+
+        if ok:
+            logger.info(f"Bulk SMS sent successfully to {len(to_numbers)} recipients")
+        else:
+            logger.warning(
+                f"Bulk SMS failed for {len(to_numbers)} recipients: status={resp.status_code}, response={resp.text[:100]}"
+            )
+
+        return per_recipient(ok, {"status_code": resp.status_code, "text": resp.text})
+
+    except requests.Timeout as exc:
+        logger.error(f"Bulk SMS timeout for {len(to_numbers)} recipients: {exc}")
+        return per_recipient(False, {"error": "Request timeout"})
+
+    except requests.ConnectionError as exc:
+        logger.error(f"Bulk SMS connection error for {len(to_numbers)} recipients: {exc}")
+        return per_recipient(False, {"error": "Connection error"})
+
+    except requests.RequestException as exc:
+        logger.error(f"Bulk SMS request error for {len(to_numbers)} recipients: {exc}")
+        return per_recipient(False, {"error": str(exc)})
+
+
+def send_sms_batch(
+    messages: Sequence[SMSMessage],
+    *,
+    api_key: str,
+    sender_id: str,
+    sms_url: str = DEFAULT_SMS_URL,
+    timeout: int = 10,
+    batch_timeout: float = DEFAULT_BATCH_TIMEOUT,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_recipients: int = DEFAULT_MAX_RECIPIENTS,
+    rate_limiter=None,
+    dry_run: bool = False,
+) -> List[Tuple[bool, Dict[str, Any]]]:
+    """
+    Send many SMS with up to `max_workers` requests in flight over the
+    pooled session. Returns one (success, details_dict) per message, in
+    input order.
+
+    Messages with the same text are sent as one multi-recipient request per
+    `max_recipients` numbers, so provider calls grow with the number of
+    distinct texts rather than messages.
+
+    `timeout` bounds each request; `batch_timeout` bounds the whole batch.
+    Messages not sent when it runs out fail with a "Batch timeout" error, and
+    are never sent afterwards. Those whose request had already started may
+    still be delivered, so they fail with "Batch timeout in flight" instead,
+    which is not retried.
+
+    With a `rate_limiter` (see services.ratelimit.TokenBucket), every request
+    first takes a token from it; messages that get none within `timeout` fail
+    with a "Rate limited" error.
+    """
+    if not messages:
+        return []
+    session = None if dry_run else get_session(max_workers)
+
+    # Input positions of each distinct text, chunked to the recipient limit
+    groups: Dict[str, List[int]] = {}
+    for index, item in enumerate(messages):
+        groups.setdefault(item.message, []).append(index)
+    requests_to_send = [
+        indexes[start:start + max(1, max_recipients)]
+        for indexes in groups.values()
+        for start in range(0, len(indexes), max(1, max_recipients))
+    ]
+
+    def failed(index: int, error: str):
+        item = messages[index]
+        return False, {"error": error, "payload": {"to": item.to_number, "msg": item.message}}
+
+    # Positions in requests_to_send of the requests started before the batch timed out
+    started = set()
+    closed = False
+    start_lock = threading.Lock()
+
+    def send(position: int, indexes: List[int]):
+        if rate_limiter is not None and not rate_limiter.acquire(timeout=timeout):
+            logger.warning(f"SMS rate limit reached; {len(indexes)} messages not sent")
+            return [failed(index, "Rate limited") for index in indexes]
+        with start_lock:
+            if closed:
+                return [failed(index, "Batch timeout") for index in indexes]
+            started.add(position)
+        first = messages[indexes[0]]
+        if len(indexes) == 1:
+            return [send_sms(
+                api_key=api_key,
+                sender_id=sender_id,
+                to_number=first.to_number,
+                message=first.message,
+                sms_url=sms_url,
+                timeout=timeout,
+                dry_run=dry_run,
+                session=session,
+            )]
+        return send_bulk_sms(
+            api_key=api_key,
+            sender_id=sender_id,
+            to_numbers=[messages[index].to_number for index in indexes],
+            message=first.message,
+            sms_url=sms_url,
+            timeout=timeout,
+            dry_run=dry_run,
+            session=session,
+        )
+
+    if len(requests_to_send) == 1:
+        return send(0, requests_to_send[0])
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(requests_to_send))), thread_name_prefix="sms"
+    )
+    try:
+        futures = [executor.submit(send, position, indexes) for position, indexes in enumerate(requests_to_send)]
+        wait(futures, timeout=batch_timeout)
+    finally:
+        # Don't wait for stragglers; queued messages are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+        with start_lock:
+            closed = True
+
+    results: List[Optional[Tuple[bool, Dict[str, Any]]]] = [None] * len(messages)
+    timed_out = 0
+    for position, (indexes, future) in enumerate(zip(requests_to_send, futures)):
+        if future.done() and not future.cancelled():
+            try:
+                for index, result in zip(indexes, future.result()):
+                    results[index] = result
+                continue
+            except Exception as exc:
+                logger.exception(f"SMS dispatch error for {len(indexes)} recipients")
+                error = str(exc)
+        else:
+            timed_out += len(indexes)
+            error = "Batch timeout in flight" if position in started else "Batch timeout"
+        for index in indexes:
+            results[index] = failed(index, error)
+    if timed_out:
+        logger.error(f"SMS batch timed out after {batch_timeout}s with {timed_out} of {len(messages)} messages unfinished")
+    return results
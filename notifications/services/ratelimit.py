@@ -0,0 +1,87 @@
+import logging
+import math
+import random
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by every process using the same cache: on average
+    `rate` tokens per second, in bursts of up to `capacity`.
+
+    The bucket is refilled with `capacity` tokens every capacity / rate
+    seconds. Each refill period is a counter in the cache, taken with the
+    atomic add()/incr() operations, so workers need no locks between them.
+    Limits are only shared across processes when the cache is too (Redis or
+    Memcached); see warn_if_process_local().
+    """
+
+    def __init__(self, name: str, rate: float, capacity: Optional[int] = None, cache_alias: str = "default"):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity or math.ceil(rate)))
+        self.period = self.capacity / self.rate
+        self.cache = caches[cache_alias]
+
+    def try_acquire(self) -> float:
+        """Take a token if one is left. Returns 0, or the seconds until the next refill."""
+        now = time.time()
+        period = int(now // self.period)
+        key = f"ratelimit:{self.name}:{period}"
+        # Old periods expire on their own
+        self.cache.add(key, 0, timeout=math.ceil(self.period) + 1)
+        try:
+            taken = self.cache.incr(key)
+        except ValueError:
+            # The period expired between add() and incr(); the next one is starting
+            return 0.001
+        if taken <= self.capacity:
+            return 0.0
+        return (period + 1) * self.period - now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a token. Returns False instead if none is free within `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            # Spread waiting workers over the start of the next period
+            time.sleep(wait + random.uniform(0, self.period / 10))
+
+
+def warn_if_process_local(cache_alias: str) -> bool:
+    """
+    Log a warning if rate limiting through `cache_alias` is per process, which
+    lets N worker processes send N times the limit. Quiet under DEBUG, where a
+    single process is the norm. Returns whether the cache is process-local.
+    """
+    if not isinstance(caches[cache_alias], LocMemCache):
+        return False
+    if not settings.DEBUG:
+        logger.warning(
+            f"Cache '{cache_alias}' used for rate limiting is local to each process, so every worker "
+            f"process gets its own limit; set CACHE_URL to share it"
+        )
+    return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Seconds to wait before retry number `attempt` (1 for the first retry):
+    exponential in the attempt, capped at `cap`, with the upper half jittered
+    so failed batches don't all come back at the same moment.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
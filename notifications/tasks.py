@@ -1,15 +1,29 @@
+import uuid
+from contextlib import nullcontext
 from datetime import timedelta
+
 from celery import shared_task
 from django.utils import timezone
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 
 from finance.models import Subscription
 from tasks.models import Task
 from accounts.models import UserProfile
-from notifications.services.mnotify import send_sms
-from notifications.models import ReminderLog
+from notifications.services.mnotify import SMSMessage, is_retryable, send_sms_batch
+from notifications.services.ratelimit import TokenBucket, backoff_delay
+from notifications.digest import build_digests
+from notifications.models import ReminderLog, ReminderOutbox
+from notifications import retention
+from notifications.retention import compact_response_detail
+from notifications.scheduling import reminder_eta, schedule_reminder, schedule_upcoming_reminders
+
+OPEN_TASK_STATUSES = ["pending", "in_progress"]
+
+# ReminderLog rows written per INSERT at the end of a run
+LOG_BATCH_SIZE = 500
 
 
 def get_user_phone(user) -> str:
@@ -21,34 +35,189 @@ def get_user_phone(user) -> str:
         return ""
 
 
-def has_reminder_been_sent(content_type, object_id, reminder_date) -> bool:
-    """Check if a reminder has already been sent for this object and date"""
-    return ReminderLog.objects.filter(
+def sent_reminder_keys(content_type, object_ids) -> set:
+    """(object_id, reminder_for_date) pairs already logged for the given objects, in one query"""
+    if not object_ids:
+        return set()
+    return set(ReminderLog.objects.filter(
         content_type=content_type,
-        object_id=object_id,
-        reminder_for_date=reminder_date
-    ).exists()
-
-
-def log_reminder(user, reminder_type, content_object, reminder_date, phone_number, message, success, response_detail):
-    """Log a sent reminder"""
-    content_type = ContentType.objects.get_for_model(content_object)
-    ReminderLog.objects.create(
-        user=user,
-        reminder_type=reminder_type,
-        content_type=content_type,
-        object_id=content_object.id,
-        reminder_for_date=reminder_date,
-        phone_number=phone_number,
+        object_id__in=object_ids,
+    ).values_list("object_id", "reminder_for_date"))
+
+
+def build_reminder_log(item, message, success, response_detail) -> ReminderLog:
+    """An unsaved ReminderLog for an outbox row sent as `message`, for writing in bulk"""
+    return ReminderLog(
+        user_id=item.user_id,
+        reminder_type=item.reminder_type,
+        content_type_id=item.content_type_id,
+        object_id=item.object_id,
+        reminder_for_date=item.reminder_for_date,
+        phone_number=item.phone_number,
         message=message,
         success=success,
-        response_detail=response_detail
+        response_detail=compact_response_detail(response_detail)
+    )
+
+
+def subscription_reminder_date(subscription):
+    """The reminder_for_date logged for a subscription's next payment"""
+    return timezone.make_aware(
+        timezone.datetime.combine(subscription.next_payment_date, timezone.datetime.min.time())
+    )
+
+
+def enqueue_reminders(reminder_type, outgoing):
+    """
+    Add (content_object, reminder_date, phone, message, summary) reminders to the outbox.
+    Reminders already enqueued by an earlier or concurrent run are left alone.
+    """
+    ReminderOutbox.objects.bulk_create([
+        ReminderOutbox(
+            user_id=content_object.user_id,
+            reminder_type=reminder_type,
+            content_type=ContentType.objects.get_for_model(content_object),
+            object_id=content_object.id,
+            reminder_for_date=reminder_date,
+            phone_number=phone,
+            message=msg,
+            summary=summary[:200],
+        )
+        for content_object, reminder_date, phone, msg, summary in outgoing
+    ], batch_size=LOG_BATCH_SIZE, ignore_conflicts=True)
+
+
+def claim_outbox_batch(batch_size, reminder_type=None):
+    """
+    Claim up to `batch_size` outbox rows for this worker. Returns the claim
+    token and the claimed rows.
+
+    Where the database supports it, candidate rows are locked with SKIP LOCKED,
+    so concurrent workers each take different rows without waiting for one
+    another. SQLite has no row locks; there the claim is a conditional UPDATE
+    that only takes rows still pending, which is equally safe because SQLite
+    serializes writes. Rows left in "sending" longer than
+    REMINDER_OUTBOX_CLAIM_TIMEOUT (a worker died mid-batch) are claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "REMINDER_OUTBOX_CLAIM_TIMEOUT", 300))
+    claimable = ReminderOutbox.objects.filter(
+        Q(status="pending", next_attempt_at__isnull=True)
+        | Q(status="pending", next_attempt_at__lte=now)
+        | Q(status="sending", claimed_at__lt=stale)
+    )
+    if reminder_type:
+        claimable = claimable.filter(reminder_type=reminder_type)
+    token = uuid.uuid4().hex
+
+    candidates = claimable.order_by("id")
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    if skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+
+    # The row locks only need to last until the claim is written
+    with transaction.atomic() if skip_locked else nullcontext():
+        ids = list(candidates.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return token, []
+        claimable.filter(id__in=ids).update(
+            status="sending", claim_token=token, claimed_at=now, attempts=F("attempts") + 1,
+        )
+    return token, list(ReminderOutbox.objects.filter(claim_token=token).order_by("id"))
+
+
+def get_rate_limiter():
+    """The token bucket shared by every worker sending through mNotify, or None if unlimited"""
+    rate = getattr(settings, "MNOTIFY_RATE_LIMIT", 0)
+    if not rate:
+        return None
+    return TokenBucket(
+        "mnotify",
+        rate,
+        capacity=getattr(settings, "MNOTIFY_RATE_BURST", None),
+        cache_alias=getattr(settings, "MNOTIFY_RATE_LIMIT_CACHE", "default"),
     )
 
 
+def deliver_outbox(api_key, sender_id, sms_url, reminder_type=None):
+    """
+    Claim, send and log outbox batches until none are left. Safe to run on
+    any number of workers at once: each row is sent by whichever claims it.
+
+    Transient failures (timeouts, rate limiting, provider 5xx) go back to
+    pending with a jittered exponential backoff, up to REMINDER_MAX_ATTEMPTS
+    sends. A reminder is logged once it is sent or has failed for good.
+
+    With REMINDER_DIGEST on, each user's reminders in a batch are sent as one
+    digest message (see notifications.digest).
+    """
+    results = {"sent": 0, "failed": 0, "retrying": 0}
+    batch_size = getattr(settings, "REMINDER_OUTBOX_BATCH_SIZE", 200)
+    max_attempts = getattr(settings, "REMINDER_MAX_ATTEMPTS", 5)
+    base_delay = getattr(settings, "REMINDER_RETRY_BASE_DELAY", 30)
+    max_delay = getattr(settings, "REMINDER_RETRY_MAX_DELAY", 3600)
+    rate_limiter = get_rate_limiter()
+    digest = getattr(settings, "REMINDER_DIGEST", False)
+    max_segments = getattr(settings, "REMINDER_DIGEST_MAX_SEGMENTS", 3)
+
+    while True:
+        token, batch = claim_outbox_batch(batch_size, reminder_type)
+        if not batch:
+            return results
+
+        if digest:
+            messages = build_digests(batch, max_segments)
+        else:
+            messages = [(SMSMessage(item.phone_number, item.message), [item]) for item in batch]
+        responses = send_sms_batch(
+            [message for message, _ in messages],
+            api_key=api_key,
+            sender_id=sender_id,
+            sms_url=sms_url,
+            timeout=getattr(settings, "MNOTIFY_TIMEOUT", 10),
+            batch_timeout=getattr(settings, "MNOTIFY_BATCH_TIMEOUT", 120),
+            max_workers=getattr(settings, "MNOTIFY_MAX_WORKERS", 8),
+            max_recipients=getattr(settings, "MNOTIFY_MAX_RECIPIENTS", 100),
+            rate_limiter=rate_limiter,
+        )
+        logs = []
+        outcome = {"sent": [], "failed": []}
+        retries = []
+        for (message, items), (ok, detail) in zip(messages, responses):
+            for item in items:
+                if not ok and item.attempts < max_attempts and is_retryable(detail):
+                    item.status = "pending"
+                    item.claim_token = ""
+                    item.next_attempt_at = timezone.now() + timedelta(
+                        seconds=backoff_delay(item.attempts, base_delay, max_delay)
+                    )
+                    item.last_error = str(detail.get("error") or detail.get("text") or detail.get("status_code"))[:200]
+                    retries.append(item)
+                    continue
+                logs.append(build_reminder_log(item, message.message, ok, detail))
+                outcome["sent" if ok else "failed"].append(item.id)
+
+        ReminderLog.objects.bulk_create(logs, batch_size=LOG_BATCH_SIZE, ignore_conflicts=True)
+        # The token guard keeps a worker whose claim went stale from overwriting the new claimant
+        for status, ids in outcome.items():
+            if ids:
+                ReminderOutbox.objects.filter(id__in=ids, claim_token=token).update(
+                    status=status, processed_at=timezone.now(),
+                )
+            results[status] += len(ids)
+        if retries:
+            ReminderOutbox.objects.filter(claim_token=token).bulk_update(
+                retries, ["status", "claim_token", "next_attempt_at", "last_error"],
+            )
+            results["retrying"] += len(retries)
+
+
 @shared_task(name='notifications.send_subscription_reminders')
-def send_subscription_reminders():
-    """Send SMS reminders for upcoming subscription payments"""
+def send_subscription_reminders(subscription_ids=None, deliver=True):
+    """
+    Send SMS reminders for upcoming subscription payments, optionally only for
+    the given ids. With deliver=False they are only enqueued.
+    """
     api_key = settings.MNOTIFY_API_KEY
     sender_id = settings.MNOTIFY_SENDER_ID
     sms_url = getattr(settings, "MNOTIFY_SMS_URL", "https://apps.mnotify.net/smsapi")
@@ -57,28 +226,33 @@ def send_subscription_reminders():
         return {"error": "Missing MNOTIFY_API_KEY or MNOTIFY_SENDER_ID in settings"}
 
     now = timezone.now().date()
-    results = {"sent": 0, "skipped": 0, "failed": 0}
+    results = {"sent": 0, "skipped": 0, "failed": 0, "retrying": 0}
 
-    # Get active subscriptions that need reminders
+    # Only subscriptions whose reminder is due today or earlier; reminder_due_on is
+    # cleared below once a reminder has been handled, so the index range stays small
     subscriptions = Subscription.objects.filter(
-        status="active",
+        reminder_due_on__lte=now,
         next_payment_date__gte=now,
-    ).select_related("user").all()
+        status="active",
+        enable_reminders=True,
+    ).select_related("user__userprofile").order_by("reminder_due_on")
+    if subscription_ids is not None:
+        subscriptions = subscriptions.filter(id__in=subscription_ids)
+    subscriptions = list(subscriptions)
+
+    # Reminders already sent for any of them, read in one query
+    content_type = ContentType.objects.get_for_model(Subscription)
+    already_sent = sent_reminder_keys(content_type, [sub.id for sub in subscriptions])
+    handled = []
+    outgoing = []
 
     for sub in subscriptions:
-        # Calculate when to send reminder based on per-subscription setting
-        reminder_date = sub.next_payment_date - timedelta(days=sub.reminder_days_before)
-
-        # Only send if we're on or past the reminder date
-        if now < reminder_date:
-            continue
+        reminder_date = subscription_reminder_date(sub)
 
         # Check if we've already sent this reminder
-        content_type = ContentType.objects.get_for_model(sub)
-        if has_reminder_been_sent(content_type, sub.id, timezone.make_aware(
-            timezone.datetime.combine(sub.next_payment_date, timezone.datetime.min.time())
-        )):
+        if (sub.id, reminder_date) in already_sent:
             results["skipped"] += 1
+            handled.append(sub.id)
             continue
 
         # Get user's phone number
@@ -87,42 +261,35 @@ def send_subscription_reminders():
             results["skipped"] += 1
             continue
 
-        # Send SMS
         msg = f"Reminder: {sub.name} of {sub.amount} {sub.currency} is due on {sub.next_payment_date}."
-        ok, detail = send_sms(
-            api_key=api_key,
-            sender_id=sender_id,
-            to_number=phone,
-            message=msg,
-            sms_url=sms_url,
-            dry_run=False,
-        )
-
-        # Log the reminder
-        log_reminder(
-            user=sub.user,
-            reminder_type='subscription',
-            content_object=sub,
-            reminder_date=timezone.make_aware(
-                timezone.datetime.combine(sub.next_payment_date, timezone.datetime.min.time())
-            ),
-            phone_number=phone,
-            message=msg,
-            success=ok,
-            response_detail=detail
-        )
-
-        if ok:
-            results["sent"] += 1
-        else:
-            results["failed"] += 1
-
+        summary = f"{sub.name}: {sub.amount} {sub.currency} due {sub.next_payment_date}"
+        outgoing.append((sub, reminder_date, phone, msg, summary))
+        handled.append(sub.id)
+
+    enqueue_reminders('subscription', outgoing)
+
+    # Disarm handled reminders, and those that can no longer be sent. Subscriptions
+    # without a phone number stay due in case one is added before the payment date.
+    Subscription.objects.filter(
+        Q(id__in=handled) | Q(next_payment_date__lt=now) | ~Q(status="active") | Q(enable_reminders=False),
+        reminder_due_on__lte=now,
+    ).update(reminder_due_on=None)
+
+    if not deliver:
+        return results
+
+    # Send whatever is pending, including reminders enqueued by other runs. Digests
+    # cover every reminder type, so they take all of them.
+    digest = getattr(settings, "REMINDER_DIGEST", False)
+    delivered = deliver_outbox(api_key, sender_id, sms_url, reminder_type=None if digest else "subscription")
+    for key, count in delivered.items():
+        results[key] += count
     return results
 
 
 @shared_task(name='notifications.send_task_reminders')
-def send_task_reminders():
-    """Send SMS reminders for upcoming task deadlines"""
+def send_task_reminders(task_ids=None):
+    """Send SMS reminders for upcoming task deadlines, optionally only for the given ids"""
     api_key = settings.MNOTIFY_API_KEY
     sender_id = settings.MNOTIFY_SENDER_ID
     sms_url = getattr(settings, "MNOTIFY_SMS_URL", "https://apps.mnotify.net/smsapi")
@@ -131,27 +298,31 @@ def send_task_reminders():
         return {"error": "Missing MNOTIFY_API_KEY or MNOTIFY_SENDER_ID in settings"}
 
     now = timezone.now()
-    results = {"sent": 0, "skipped": 0, "failed": 0}
+    results = {"sent": 0, "skipped": 0, "failed": 0, "retrying": 0}
 
-    # Get pending/in-progress tasks with deadlines
+    # Only tasks whose reminder time has passed; reminder_due_at is cleared below
+    # once a reminder has been handled, so the index range stays small
     tasks = Task.objects.filter(
-        Q(status="pending") | Q(status="in_progress"),
-        deadline__isnull=False,
+        reminder_due_at__lte=now,
         deadline__gte=now,
-    ).select_related("user").all()
+        status__in=OPEN_TASK_STATUSES,
+        enable_reminders=True,
+    ).select_related("user__userprofile").order_by("reminder_due_at")
+    if task_ids is not None:
+        tasks = tasks.filter(id__in=task_ids)
+    tasks = list(tasks)
+
+    # Reminders already sent for any of them, read in one query
+    content_type = ContentType.objects.get_for_model(Task)
+    already_sent = sent_reminder_keys(content_type, [task.id for task in tasks])
+    handled = []
+    outgoing = []
 
     for task in tasks:
-        # Calculate when to send reminder based on per-task setting
-        reminder_time = task.deadline - timedelta(minutes=task.reminder_minutes_before)
-
-        # Only send if we're on or past the reminder time
-        if now < reminder_time:
-            continue
-
         # Check if we've already sent this reminder
-        content_type = ContentType.objects.get_for_model(task)
-        if has_reminder_been_sent(content_type, task.id, task.deadline):
+        if (task.id, task.deadline) in already_sent:
             results["skipped"] += 1
+            handled.append(task.id)
             continue
 
         # Get user's phone number
@@ -160,44 +331,100 @@ def send_task_reminders():
             results["skipped"] += 1
             continue
 
-        # Send SMS
         msg = f"Task reminder: {task.title} due at {task.deadline.strftime('%Y-%m-%d %H:%M')}."
-        ok, detail = send_sms(
-            api_key=api_key,
-            sender_id=sender_id,
-            to_number=phone,
-            message=msg,
-            sms_url=sms_url,
-            dry_run=False,
-        )
-
-        # Log the reminder
-        log_reminder(
-            user=task.user,
-            reminder_type='task',
-            content_object=task,
-            reminder_date=task.deadline,
-            phone_number=phone,
-            message=msg,
-            success=ok,
-            response_detail=detail
-        )
-
-        if ok:
-            results["sent"] += 1
-        else:
-            results["failed"] += 1
-
+        summary = f"{task.title} due {task.deadline.strftime('%Y-%m-%d %H:%M')}"
+        outgoing.append((task, task.deadline, phone, msg, summary))
+        handled.append(task.id)
+
+    enqueue_reminders('task', outgoing)
+
+    # Disarm handled reminders, and those that can no longer be sent. Tasks
+    # without a phone number stay due in case one is added before the deadline.
+    Task.objects.filter(
+        Q(id__in=handled) | Q(deadline__lt=now) | ~Q(status__in=OPEN_TASK_STATUSES) | Q(enable_reminders=False),
+        reminder_due_at__lte=now,
+    ).update(reminder_due_at=None)
+
+    # Send whatever is pending, including reminders enqueued by other runs. Digests
+    # cover every reminder type, so they take all of them.
+    digest = getattr(settings, "REMINDER_DIGEST", False)
+    delivered = deliver_outbox(api_key, sender_id, sms_url, reminder_type=None if digest else "task")
+    for key, count in delivered.items():
+        results[key] += count
     return results
 
 
 @shared_task(name='notifications.send_all_reminders')
 def send_all_reminders():
-    """Send both subscription and task reminders"""
-    subscription_results = send_subscription_reminders()
+    """
+    Send both subscription and task reminders. In digest mode subscription
+    reminders are only enqueued first, so the task run sends each user a single
+    digest covering both (its results then count both).
+    """
+    subscription_results = send_subscription_reminders(deliver=not getattr(settings, "REMINDER_DIGEST", False))
     task_results = send_task_reminders()
 
     return {
         "subscriptions": subscription_results,
         "tasks": task_results
     }
+
+
+def send_if_due(model, object_id, due_field, send):
+    """
+    Run `send` for one object if its reminder is due. A job that fired early
+    (clock skew between workers) is queued again for the remaining time.
+    """
+    eta = reminder_eta(model.objects.filter(pk=object_id).values_list(due_field, flat=True).first())
+    if eta is None:
+        return {"sent": 0, "skipped": 0, "failed": 0, "retrying": 0}
+    if eta > timezone.now():
+        schedule_reminder(model._meta.label, object_id, eta)
+        return {"rescheduled": eta.isoformat()}
+    return send([object_id])
+
+
+@shared_task(name='notifications.send_due_task_reminder')
+def send_due_task_reminder(task_id):
+    """ETA job queued when a task is saved; a no-op if the task changed since"""
+    return send_if_due(Task, task_id, "reminder_due_at", send_task_reminders)
+
+
+@shared_task(name='notifications.send_due_subscription_reminder')
+def send_due_subscription_reminder(subscription_id):
+    """ETA job queued when a subscription is saved; a no-op if it changed since"""
+    return send_if_due(Subscription, subscription_id, "reminder_due_on", send_subscription_reminders)
+
+
+@shared_task(name='notifications.sweep_reminders')
+def sweep_reminders():
+    """
+    Low-frequency safety net for the ETA jobs: send every reminder that is
+    already due (a lost job, a save made without signals) and queue jobs for
+    those falling due before the next sweep
+    """
+    results = send_all_reminders()
+    results["scheduled"] = schedule_upcoming_reminders()
+    return results
+
+
+@shared_task(name='notifications.deliver_reminder_outbox')
+def deliver_reminder_outbox():
+    """Send pending outbox reminders; start as many of these as there are workers to spare"""
+    api_key = settings.MNOTIFY_API_KEY
+    sender_id = settings.MNOTIFY_SENDER_ID
+    sms_url = getattr(settings, "MNOTIFY_SMS_URL", "https://apps.mnotify.net/smsapi")
+
+    if not api_key or not sender_id:
+        return {"error": "Missing MNOTIFY_API_KEY or MNOTIFY_SENDER_ID in settings"}
+
+    return deliver_outbox(api_key, sender_id, sms_url)
+
+
+@shared_task(name='notifications.prune_reminder_logs')
+def prune_reminder_logs():
+    """Apply the ReminderLog retention policy (REMINDER_LOG_RETENTION_DAYS)"""
+    return retention.prune_reminder_logs(
+        batch_size=getattr(settings, "REMINDER_LOG_PRUNE_BATCH_SIZE", 1000),
+        archive_dir=getattr(settings, "REMINDER_LOG_ARCHIVE_DIR", None),
+    )
@@ -0,0 +1,633 @@
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from finance.models import Subscription
+from tasks.models import Task
+from .digest import pack_digest, sms_segments
+from .models import ReminderLog, ReminderOutbox
+from .retention import compact_response_detail, prune_reminder_logs
+from .scheduling import schedule_upcoming_reminders
+from .services import mnotify
+from .services.mnotify import SMSMessage, is_retryable, send_sms_batch
+from .services.ratelimit import TokenBucket, backoff_delay, warn_if_process_local
+from .tasks import (
+    claim_outbox_batch, deliver_outbox, get_rate_limiter, send_due_task_reminder, send_subscription_reminders,
+    send_all_reminders, send_task_reminders, sweep_reminders,
+)
+
+User = get_user_model()
+
+
+@override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender')
+class ReminderDueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000')
+        patcher = mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {'status': 'ok'}))
+        self.send_sms = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_task_reminder_due_at_follows_save(self):
+        deadline = timezone.now() + timedelta(days=1)
+        task = Task.objects.create(user=self.user, title='Report', deadline=deadline, reminder_minutes_before=30)
+        self.assertEqual(task.reminder_due_at, deadline - timedelta(minutes=30))
+
+        task.status = 'completed'
+        task.save(update_fields=['status'])
+        task.refresh_from_db()
+        self.assertIsNone(task.reminder_due_at)
+
+    def test_only_due_tasks_are_read_and_reminded_once(self):
+        now = timezone.now()
+        due = Task.objects.create(user=self.user, title='Due', deadline=now + timedelta(minutes=60))
+        Task.objects.create(user=self.user, title='Later', deadline=now + timedelta(days=3))
+        Task.objects.create(user=self.user, title='Muted', deadline=now + timedelta(minutes=60), enable_reminders=False)
+
+        self.assertEqual(send_task_reminders(), {'sent': 1, 'skipped': 0, 'failed': 0, 'retrying': 0})
+        self.assertEqual(self.send_sms.call_count, 1)
+        due.refresh_from_db()
+        self.assertIsNone(due.reminder_due_at)
+        self.assertTrue(ReminderLog.objects.filter(object_id=due.pk).exists())
+
+        # Nothing is due any more, so the second run reads no task rows at all,
+        # and finds nothing to claim in the outbox
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_task_reminders(), {'sent': 0, 'skipped': 0, 'failed': 0, 'retrying': 0})
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(self.send_sms.call_count, 1)
+
+    def test_past_deadlines_are_disarmed_without_sending(self):
+        task = Task.objects.create(user=self.user, title='Missed', deadline=timezone.now() - timedelta(hours=1))
+        self.assertIsNotNone(task.reminder_due_at)
+        send_task_reminders()
+        task.refresh_from_db()
+        self.assertIsNone(task.reminder_due_at)
+        self.send_sms.assert_not_called()
+
+    def test_subscription_reminders_respect_enable_reminders(self):
+        today = date.today()
+        due = Subscription.objects.create(
+            user=self.user, name='Music', amount=10, next_payment_date=today + timedelta(days=1), reminder_days_before=2,
+        )
+        Subscription.objects.create(
+            user=self.user, name='Muted', amount=10, next_payment_date=today + timedelta(days=1), enable_reminders=False,
+        )
+        later = Subscription.objects.create(
+            user=self.user, name='Later', amount=10, next_payment_date=today + timedelta(days=30),
+        )
+
+        self.assertEqual(send_subscription_reminders(), {'sent': 1, 'skipped': 0, 'failed': 0, 'retrying': 0})
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertIsNone(due.reminder_due_on)
+        self.assertEqual(later.reminder_due_on, today + timedelta(days=28))
+
+        # Moving to the next payment re-arms the reminder
+        due.update_next_payment_date()
+        due.refresh_from_db()
+        self.assertEqual(due.reminder_due_on, due.next_payment_date - timedelta(days=2))
+
+    def test_missing_phone_keeps_reminder_due(self):
+        UserProfile.objects.filter(user=self.user).update(phone_number='')
+        task = Task.objects.create(user=self.user, title='Due', deadline=timezone.now() + timedelta(minutes=60))
+        self.assertEqual(send_task_reminders(), {'sent': 0, 'skipped': 1, 'failed': 0, 'retrying': 0})
+        task.refresh_from_db()
+        self.assertIsNotNone(task.reminder_due_at)
+
+    def test_run_cost_does_not_grow_with_due_reminders(self):
+        """Dedupe keys, phone numbers and logs are read and written in bulk."""
+        now = timezone.now()
+
+        def run_with(count):
+            ReminderLog.objects.all().delete()
+            Task.objects.all().delete()
+            for index in range(count):
+                Task.objects.create(user=self.user, title=f'Due {index}', deadline=now + timedelta(minutes=60))
+            # One of them was reminded before
+            first = Task.objects.order_by('pk').first()
+            ReminderLog.objects.create(
+                user=self.user, reminder_type='task', content_object=first, reminder_for_date=first.deadline,
+                phone_number='+233200000000', message='sent', success=True,
+            )
+            with CaptureQueriesContext(connection) as queries:
+                results = send_task_reminders()
+            self.assertEqual(results, {'sent': count - 1, 'skipped': 1, 'failed': 0, 'retrying': 0})
+            return len(queries)
+
+        self.assertEqual(run_with(2), run_with(8))
+        self.assertEqual(ReminderLog.objects.count(), 8)
+
+
+class SendSMSBatchTests(TestCase):
+    def batch(self, count, **kwargs):
+        messages = [SMSMessage(f'+2332000000{index:02d}', f'message {index}') for index in range(count)]
+        return send_sms_batch(messages, api_key='key', sender_id='sender', sms_url='http://sms.invalid/', **kwargs)
+
+    def test_results_are_in_input_order_and_sent_concurrently(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_send(**kwargs):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            # Later messages finish first
+            time.sleep(0.05 - int(kwargs['to_number'][-2:]) * 0.002)
+            with lock:
+                in_flight.pop()
+            return True, {'to': kwargs['to_number']}
+
+        with mock.patch('notifications.services.mnotify.send_sms', side_effect=slow_send):
+            start = time.perf_counter()
+            results = self.batch(16, max_workers=4)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual([detail['to'] for _, detail in results], [f'+2332000000{index:02d}' for index in range(16)])
+        self.assertLessEqual(max(peak), 4)
+        self.assertGreater(max(peak), 1)
+        # Four rounds of at most 50ms rather than sixteen
+        self.assertLess(elapsed, 0.5)
+
+    def test_batch_timeout_fails_unfinished_messages(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def send(**kwargs):
+            if kwargs['to_number'].endswith('00'):
+                return True, {}
+            release.wait(5)
+            return True, {}
+
+        with mock.patch('notifications.services.mnotify.send_sms', side_effect=send):
+            with self.assertLogs('notifications.services.mnotify', 'ERROR'):
+                results = self.batch(4, max_workers=2, batch_timeout=0.1)
+
+        self.assertEqual(results[0], (True, {}))
+        self.assertFalse(any(ok for ok, _ in results[1:]))
+        # Two requests were on the wire and may yet be delivered; the last one was never sent
+        errors = [detail['error'] for _, detail in results[1:]]
+        self.assertEqual(sorted(errors), ['Batch timeout', 'Batch timeout in flight', 'Batch timeout in flight'])
+        self.assertFalse(is_retryable(results[1][1]))
+
+    def test_exceptions_are_reported_as_failures(self):
+        with mock.patch('notifications.services.mnotify.send_sms', side_effect=[(True, {}), ValueError('boom')]):
+            with self.assertLogs('notifications.services.mnotify', 'ERROR'):
+                results = self.batch(2, max_workers=1)
+        self.assertEqual(results[0], (True, {}))
+        self.assertEqual(results[1][0], False)
+        self.assertEqual(results[1][1]['error'], 'boom')
+
+    def test_requests_share_one_pooled_session(self):
+        response = mock.Mock(status_code=200, text='1000')
+        with mock.patch('requests.Session.post', autospec=True, return_value=response) as post:
+            results = self.batch(3, max_workers=2)
+            self.batch(2, max_workers=2)
+        self.assertTrue(all(ok for ok, _ in results))
+        sessions = {call.args[0] for call in post.call_args_list}
+        self.assertEqual(len(sessions), 1)
+        session = sessions.pop()
+        self.assertIs(session, mnotify.get_session(2))
+        self.assertGreaterEqual(session.get_adapter('https://apps.mnotify.net').poolmanager.connection_pool_kw['maxsize'], 2)
+
+    def test_identical_texts_share_multi_recipient_requests(self):
+        messages = [SMSMessage(f'+2332{index:08d}', 'Office closed' if index % 2 else 'Office open') for index in range(250)]
+        response = mock.Mock(status_code=200, text='1000')
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            results = send_sms_batch(
+                messages, api_key='key', sender_id='sender', sms_url='http://sms.invalid/', max_recipients=100,
+            )
+
+        # 125 recipients per text, in chunks of 100 and 25
+        self.assertEqual(post.call_count, 4)
+        recipients = sorted(len(call.kwargs['data']['to'].split(',')) for call in post.call_args_list)
+        self.assertEqual(recipients, [25, 25, 100, 100])
+        self.assertTrue(all(ok for ok, _ in results))
+        self.assertEqual([detail['payload']['to'] for _, detail in results], [item.to_number for item in messages])
+
+    def test_bulk_failure_is_reported_for_every_recipient(self):
+        messages = [SMSMessage('+233200000001', 'Hello'), SMSMessage('+233200000002', 'Hello')]
+        response = mock.Mock(status_code=200, text='1003')
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            results = send_sms_batch(messages, api_key='key', sender_id='sender', sms_url='http://sms.invalid/')
+        post.assert_called_once()
+        self.assertEqual([ok for ok, _ in results], [False, False])
+        self.assertEqual([detail['recipients'] for _, detail in results], [2, 2])
+
+
+@override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender')
+class BulkReminderTests(TestCase):
+    def test_same_reminder_for_many_users_is_one_provider_call(self):
+        deadline = timezone.now() + timedelta(minutes=60)
+        for index in range(3):
+            user = User.objects.create(username=f'member{index}')
+            UserProfile.objects.create(user=user, phone_number=f'+23320000000{index}')
+            Task.objects.create(user=user, title='Team standup', deadline=deadline)
+
+        response = mock.Mock(status_code=200, text='1000')
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            self.assertEqual(send_task_reminders(), {'sent': 3, 'skipped': 0, 'failed': 0, 'retrying': 0})
+        post.assert_called_once()
+        logs = ReminderLog.objects.order_by('phone_number')
+        self.assertEqual(
+            [(log.phone_number, log.success, log.response_detail) for log in logs],
+            [(f'+23320000000{index}', True, {'status_code': 200, 'recipients': 3, 'code': '1000'}) for index in range(3)],
+        )
+
+
+@override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender')
+class ReminderOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000')
+
+    def test_rearmed_reminder_is_enqueued_once(self):
+        task = Task.objects.create(user=self.user, title='Due', deadline=timezone.now() + timedelta(minutes=60))
+        with mock.patch('notifications.tasks.deliver_outbox', return_value={'sent': 0, 'failed': 0, 'retrying': 0}):
+            send_task_reminders()
+            # A second run that sees it due again before it was sent
+            Task.objects.filter(pk=task.pk).update(reminder_due_at=timezone.now())
+            send_task_reminders()
+        self.assertEqual(ReminderOutbox.objects.filter(object_id=task.pk, status='pending').count(), 1)
+
+    def test_claims_are_disjoint_and_stale_claims_are_taken_over(self):
+        for index in range(5):
+            Task.objects.create(user=self.user, title=f'Due {index}', deadline=timezone.now() + timedelta(minutes=60))
+        with mock.patch('notifications.tasks.deliver_outbox', return_value={'sent': 0, 'failed': 0, 'retrying': 0}):
+            send_task_reminders()
+
+        first_token, first = claim_outbox_batch(3)
+        second_token, second = claim_outbox_batch(3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({item.id for item in first} & {item.id for item in second})
+        self.assertEqual(claim_outbox_batch(3)[1], [])
+
+        # The first worker went away mid-batch
+        ReminderOutbox.objects.filter(claim_token=first_token).update(
+            claimed_at=timezone.now() - timedelta(hours=1),
+        )
+        _, retaken = claim_outbox_batch(10)
+        self.assertEqual({item.id for item in retaken}, {item.id for item in first})
+        self.assertTrue(all(item.attempts == 2 for item in retaken))
+
+    def test_outcomes_are_logged_and_marked(self):
+        Task.objects.create(user=self.user, title='Fails', deadline=timezone.now() + timedelta(minutes=60))
+        # 1005: invalid phone number, which no retry will fix
+        rejected = (False, {'status_code': 200, 'text': '1005'})
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=rejected):
+            self.assertEqual(send_task_reminders(), {'sent': 0, 'skipped': 0, 'failed': 1, 'retrying': 0})
+        item = ReminderOutbox.objects.get()
+        self.assertEqual(item.status, 'failed')
+        self.assertIsNotNone(item.processed_at)
+        self.assertFalse(ReminderLog.objects.get(object_id=item.object_id).success)
+
+
+class RateLimitAndRetryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000')
+
+    def test_token_bucket_is_shared_through_the_cache(self):
+        with mock.patch('notifications.services.ratelimit.time.time', return_value=1000.0):
+            first = TokenBucket('test', rate=20, capacity=5)
+            second = TokenBucket('test', rate=20, capacity=5)
+            self.assertEqual([first.try_acquire() for _ in range(3)], [0.0] * 3)
+            self.assertEqual([second.try_acquire() for _ in range(2)], [0.0] * 2)
+            # Empty until the next refill, a quarter of a second later
+            self.assertAlmostEqual(first.try_acquire(), 0.25)
+            self.assertFalse(second.acquire(timeout=0.1))
+        with mock.patch('notifications.services.ratelimit.time.time', return_value=1000.25):
+            self.assertEqual(first.try_acquire(), 0.0)
+
+    def test_process_local_rate_limit_cache_is_warned_about(self):
+        with override_settings(DEBUG=False), self.assertLogs('notifications.services.ratelimit', 'WARNING'):
+            self.assertTrue(warn_if_process_local('ratelimit'))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(CACHES={
+            'ratelimit': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        }):
+            self.assertFalse(warn_if_process_local('ratelimit'))
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        for attempt, ceiling in ((1, 30), (2, 60), (3, 120), (8, 3600)):
+            delays = [backoff_delay(attempt, 30, 3600) for _ in range(20)]
+            self.assertTrue(all(ceiling / 2 <= delay <= ceiling for delay in delays), (attempt, delays))
+        self.assertGreater(len({backoff_delay(1, 30, 3600) for _ in range(5)}), 1)
+
+    def test_failures_are_classified(self):
+        self.assertTrue(is_retryable({'error': 'Request timeout'}))
+        self.assertTrue(is_retryable({'error': 'Rate limited'}))
+        self.assertTrue(is_retryable({'error': 'Batch timeout'}))
+        self.assertFalse(is_retryable({'error': 'Batch timeout in flight'}))
+        self.assertTrue(is_retryable({'status_code': 503, 'text': ''}))
+        self.assertTrue(is_retryable({'status_code': 429, 'text': ''}))
+        self.assertTrue(is_retryable({'status_code': 200, 'text': '1002'}))
+        self.assertFalse(is_retryable({'status_code': 200, 'text': '1004'}))
+        self.assertFalse(is_retryable({'status_code': 400, 'text': ''}))
+        self.assertFalse(is_retryable({'error': 'Invalid URL'}))
+
+    @override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender', REMINDER_MAX_ATTEMPTS=2)
+    def test_transient_failures_are_retried_after_a_backoff(self):
+        task = Task.objects.create(user=self.user, title='Due', deadline=timezone.now() + timedelta(minutes=60))
+        timeout = (False, {'error': 'Request timeout'})
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=timeout) as send:
+            self.assertEqual(send_task_reminders(), {'sent': 0, 'skipped': 0, 'failed': 0, 'retrying': 1})
+            item = ReminderOutbox.objects.get()
+            self.assertEqual(item.status, 'pending')
+            self.assertEqual(item.last_error, 'Request timeout')
+            self.assertGreater(item.next_attempt_at, timezone.now())
+            self.assertFalse(ReminderLog.objects.exists())
+
+            # Not claimed again before its retry time
+            self.assertEqual(claim_outbox_batch(10)[1], [])
+            ReminderOutbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_outbox('key', 'sender', 'http://sms.invalid/'), {'sent': 0, 'failed': 1, 'retrying': 0})
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(ReminderOutbox.objects.get().status, 'failed')
+        self.assertFalse(ReminderLog.objects.get(object_id=task.pk).success)
+
+    @override_settings(MNOTIFY_RATE_LIMIT=1, MNOTIFY_RATE_BURST=1)
+    def test_requests_beyond_the_rate_limit_are_deferred(self):
+        messages = [SMSMessage(f'+23320000000{index}', f'message {index}') for index in range(3)]
+        frozen = mock.patch('notifications.services.ratelimit.time.time', return_value=1000.0)
+        with frozen, mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {})) as send:
+            results = send_sms_batch(
+                messages, api_key='key', sender_id='sender', sms_url='http://sms.invalid/',
+                timeout=0, max_workers=1, rate_limiter=get_rate_limiter(),
+            )
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual([detail.get('error') for _, detail in results].count('Rate limited'), 2)
+
+
+@override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender')
+class ReminderSchedulingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000')
+        patcher = mock.patch('celery.current_app.send_task')
+        self.send_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_saves_queue_a_job_for_the_reminder_time(self):
+        deadline = timezone.now() + timedelta(minutes=90)
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(user=self.user, title='Soon', deadline=deadline, reminder_minutes_before=60)
+            Task.objects.create(user=self.user, title='Next week', deadline=deadline + timedelta(days=7))
+        self.send_task.assert_called_once_with(
+            'notifications.send_due_task_reminder', args=[task.pk], eta=deadline - timedelta(minutes=60), retry=False,
+        )
+
+        # Saves that cannot move the reminder queue nothing
+        with self.captureOnCommitCallbacks(execute=True):
+            task.description = 'Agenda'
+            task.save(update_fields=['description'])
+        self.assertEqual(self.send_task.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.reminder_minutes_before = 30
+            task.save(update_fields=['reminder_minutes_before'])
+        self.assertEqual(self.send_task.call_args.kwargs['eta'], deadline - timedelta(minutes=30))
+
+    def test_saves_that_leave_the_reminder_time_queue_nothing(self):
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {})):
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(user=self.user, title='Due', deadline=timezone.now() + timedelta(minutes=60))
+            send_due_task_reminder(task.pk)
+        self.assertEqual(self.send_task.call_count, 1)
+
+        # A full save of the reminded task, as the edit form does
+        task = Task.objects.get(pk=task.pk)
+        self.assertIsNone(task.reminder_due_at)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Due today'
+            task.save()
+            task.description = 'Agenda'
+            task.save()
+        self.assertEqual(self.send_task.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.reminder_minutes_before = 30
+            task.save()
+        self.assertEqual(self.send_task.call_count, 2)
+
+    def test_job_sends_only_what_is_still_due(self):
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {})) as send_sms:
+            task = Task.objects.create(user=self.user, title='Due', deadline=timezone.now() + timedelta(minutes=60))
+            other = Task.objects.create(user=self.user, title='Also due', deadline=timezone.now() + timedelta(minutes=60))
+            self.assertEqual(send_due_task_reminder(task.pk)['sent'], 1)
+            self.assertEqual(send_sms.call_count, 1)
+            other.refresh_from_db()
+            self.assertIsNotNone(other.reminder_due_at)
+
+            # A job made stale by a later save
+            other.deadline = timezone.now() + timedelta(days=2)
+            other.save()
+            self.assertIn('rescheduled', send_due_task_reminder(other.pk))
+            other.status = 'completed'
+            other.save()
+            self.assertEqual(send_due_task_reminder(other.pk)['sent'], 0)
+        self.assertEqual(send_sms.call_count, 1)
+
+    def test_sweep_sends_missed_reminders_and_queues_upcoming_ones(self):
+        now = timezone.now()
+        Task.objects.create(user=self.user, title='Missed', deadline=now + timedelta(minutes=30))
+        # Reminder inside the first sweep interval, already queued by the previous sweep or its save
+        Task.objects.create(user=self.user, title='Queued', deadline=now + timedelta(minutes=140))
+        upcoming = Task.objects.create(user=self.user, title='Upcoming', deadline=now + timedelta(minutes=165))
+        Task.objects.create(user=self.user, title='Later', deadline=now + timedelta(days=2))
+        Subscription.objects.create(
+            user=self.user, name='Music', amount=10, next_payment_date=date.today() + timedelta(days=30),
+        )
+
+        self.send_task.reset_mock()
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {})):
+            results = sweep_reminders()
+        self.assertEqual(results['tasks']['sent'], 1)
+        self.assertEqual(results['scheduled'], 1)
+        self.send_task.assert_called_once()
+        self.assertEqual(self.send_task.call_args.kwargs['args'], [upcoming.pk])
+
+    def test_consecutive_sweeps_queue_each_reminder_once(self):
+        start = timezone.now()
+        for minutes in (20, 50, 80, 110):
+            Task.objects.create(
+                user=self.user, title=f'In {minutes}', deadline=start + timedelta(minutes=minutes), reminder_minutes_before=0,
+            )
+
+        self.send_task.reset_mock()
+        for sweep in range(4):
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(minutes=30 * sweep)):
+                schedule_upcoming_reminders()
+        queued = [call.kwargs['args'][0] for call in self.send_task.call_args_list]
+        self.assertEqual(len(queued), len(set(queued)))
+        # The first sweep leaves its first interval to the save-time jobs
+        self.assertEqual(len(queued), 3)
+
+
+class ReminderDigestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000')
+
+    def test_segments_follow_the_sms_encoding(self):
+        self.assertEqual(sms_segments('a' * 160), 1)
+        self.assertEqual(sms_segments('a' * 161), 2)
+        self.assertEqual(sms_segments('a' * 306), 2)
+        self.assertEqual(sms_segments('a' * 307), 3)
+        # Extension characters take two septets
+        self.assertEqual(sms_segments('€' * 80), 1)
+        self.assertEqual(sms_segments('€' * 81), 2)
+        # Anything outside GSM-7 makes the whole message UCS-2
+        self.assertEqual(sms_segments('ɛ' + 'a' * 69), 1)
+        self.assertEqual(sms_segments('ɛ' + 'a' * 70), 2)
+
+    def test_long_digests_are_split_at_item_boundaries(self):
+        items = [mock.Mock(summary=f'Task {index} ' + 'x' * 60, message='') for index in range(10)]
+        parts = list(pack_digest(items, max_segments=2))
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(sms_segments(text) <= 2 for text, _ in parts))
+        self.assertEqual([item for _, covered in parts for item in covered], items)
+
+    @override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender', REMINDER_DIGEST=True)
+    def test_each_user_gets_one_digest_per_run(self):
+        deadline = timezone.now() + timedelta(minutes=60)
+        tasks = [Task.objects.create(user=self.user, title=f'Task {index}', deadline=deadline) for index in range(3)]
+        Subscription.objects.create(
+            user=self.user, name='Music', amount=10, next_payment_date=date.today() + timedelta(days=1),
+        )
+        other = User.objects.create(username='other')
+        UserProfile.objects.create(user=other, phone_number='+233200000001')
+        Task.objects.create(user=other, title='Solo', deadline=deadline)
+
+        with mock.patch('notifications.services.mnotify.send_sms', return_value=(True, {})) as send_sms:
+            results = send_all_reminders()
+        self.assertEqual(results['tasks']['sent'], 5)
+        self.assertEqual(send_sms.call_count, 2)
+        texts = {call.kwargs['to_number']: call.kwargs['message'] for call in send_sms.call_args_list}
+        digest = texts['+233200000000']
+        self.assertTrue(digest.startswith('Reminders:'))
+        for name in ('Task 0', 'Task 1', 'Task 2', 'Music'):
+            self.assertIn(name, digest)
+        # A lone reminder keeps its usual text
+        self.assertTrue(texts['+233200000001'].startswith('Task reminder: Solo'))
+
+        logs = ReminderLog.objects.filter(user=self.user)
+        self.assertEqual(logs.count(), 4)
+        self.assertEqual(set(logs.values_list('message', flat=True)), {digest})
+        self.assertEqual(
+            set(logs.filter(reminder_type='task').values_list('object_id', flat=True)), {task.pk for task in tasks},
+        )
+
+
+class ReminderLogRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+
+    def make_log(self, sent_days_ago, reminder_days_from_now, detail=None):
+        task = Task.objects.create(user=self.user, title='Task')
+        log = ReminderLog.objects.create(
+            user=self.user, reminder_type='task', content_object=task,
+            reminder_for_date=timezone.now() + timedelta(days=reminder_days_from_now),
+            phone_number='+233200000000', message='Task reminder', success=True, response_detail=detail,
+        )
+        ReminderLog.objects.filter(pk=log.pk).update(sent_at=timezone.now() - timedelta(days=sent_days_ago))
+        return log
+
+    def test_details_are_compacted(self):
+        detail = {
+            'status_code': 200, 'text': '{"code": "2000", "summary": {"_id": "abc123"}}',
+            'payload': {'key': 'secret', 'to': '+233200000000', 'msg': 'Hello', 'sender_id': 'me'},
+        }
+        self.assertEqual(compact_response_detail(detail), {'status_code': 200, 'code': '2000', 'message_id': 'abc123'})
+        self.assertEqual(
+            compact_response_detail({'error': 'Request timeout', 'payload': {'key': 'secret'}}),
+            {'error': 'Request timeout'},
+        )
+
+    def test_old_logs_are_archived_and_deleted_in_batches(self):
+        old = [self.make_log(400, -399) for _ in range(5)]
+        recent = self.make_log(10, -9)
+        # An old log for a reminder date that is still ahead keeps deduping it
+        still_due = self.make_log(400, 30)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with CaptureQueriesContext(connection) as queries:
+                result = prune_reminder_logs(cutoff=timezone.now() - timedelta(days=180), batch_size=2, archive_dir=directory)
+            with gzip.open(result['archive'], 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(result['logs'], 5)
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(log.pk for log in old))
+        self.assertEqual(rows[0]['content_type'], 'tasks.task')
+        self.assertEqual(set(ReminderLog.objects.values_list('pk', flat=True)), {recent.pk, still_due.pk})
+        # Three batches of at most two rows, each a read and a delete, plus the empty read
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('DELETE')]), 3)
+
+    def test_command_compacts_kept_logs(self):
+        log = self.make_log(1, -1, detail={'status_code': 200, 'text': '1000', 'payload': {'key': 'secret'}})
+        call_command('prune_reminder_logs', '--compact', stdout=io.StringIO())
+        log.refresh_from_db()
+        self.assertEqual(log.response_detail, {'status_code': 200, 'code': '1000'})
+
+
+# SQLite's in-memory test database fails concurrent writers at once rather than
+# waiting for them, so this runs against databases with row locks
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+@override_settings(REMINDER_OUTBOX_BATCH_SIZE=4, REMINDER_ETA_SCHEDULING=False)
+class ParallelOutboxWorkerTests(TransactionTestCase):
+    def test_parallel_workers_send_each_reminder_once(self):
+        user = User.objects.create(username='testuser')
+        UserProfile.objects.create(user=user, phone_number='+233200000000')
+        deadline = timezone.now() + timedelta(minutes=60)
+        for index in range(24):
+            Task.objects.create(user=user, title=f'Due {index}', deadline=deadline)
+        with mock.patch('notifications.tasks.deliver_outbox', return_value={'sent': 0, 'failed': 0, 'retrying': 0}):
+            with override_settings(MNOTIFY_API_KEY='key', MNOTIFY_SENDER_ID='sender'):
+                send_task_reminders()
+
+        sent = []
+        lock = threading.Lock()
+
+        def send(**kwargs):
+            with lock:
+                sent.append(kwargs['message'])
+            return True, {}
+
+        totals = []
+
+        def worker():
+            try:
+                totals.append(deliver_outbox('key', 'sender', 'http://sms.invalid/'))
+            finally:
+                connections.close_all()
+
+        with mock.patch('notifications.services.mnotify.send_sms', side_effect=send):
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(sent), 24)
+        self.assertEqual(len(set(sent)), 24)
+        self.assertEqual(sum(total['sent'] for total in totals), 24)
+        self.assertEqual(ReminderOutbox.objects.filter(status='sent').count(), 24)
+        self.assertEqual(ReminderLog.objects.count(), 24)
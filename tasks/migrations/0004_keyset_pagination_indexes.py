@@ -0,0 +1,24 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_alter_project_options_and_more'),
+        ('tasks', '0003_task_enable_reminders_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_task_user_id_d01da7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='tasks_task_user_id_066580_idx'),
+        ),
+    ]
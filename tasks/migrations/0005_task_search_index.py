@@ -0,0 +1,19 @@
+# Generated by Django 6.0.9 on 2026-10-18 09:12
+
+from django.db import migrations
+
+from myhub.search import CreateSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        CreateSearchIndex(
+            model_name='task',
+            fields=['title', 'description'],
+        ),
+    ]
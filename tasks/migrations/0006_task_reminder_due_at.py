@@ -0,0 +1,46 @@
+# Generated by Django 6.0.9 on 2026-10-18 07:02
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_reminder_due_at(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+
+    # Only reminders that can still be sent; past deadlines stay NULL
+    tasks = Task.objects.filter(
+        status__in=['pending', 'in_progress'], enable_reminders=True, deadline__gte=timezone.now(),
+    ).only('pk', 'deadline', 'reminder_minutes_before')
+    batch = []
+    for task in tasks.iterator(chunk_size=1000):
+        task.reminder_due_at = task.deadline - timedelta(minutes=task.reminder_minutes_before)
+        batch.append(task)
+        if len(batch) >= 1000:
+            Task.objects.bulk_update(batch, ['reminder_due_at'])
+            batch = []
+    Task.objects.bulk_update(batch, ['reminder_due_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_alter_project_options_and_more'),
+        ('tasks', '0005_task_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='reminder_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('reminder_due_at__isnull', False)), fields=['reminder_due_at'], name='task_reminder_due_idx'),
+        ),
+        migrations.RunPython(backfill_reminder_due_at, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
@@ -36,13 +38,28 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # When the deadline reminder becomes due. Set by save(), cleared once the reminder
+    # has been handled, so the reminder beat only reads rows that are actually due.
+    reminder_due_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Columns covered by the full-text index (see myhub.search), most important first
+    search_fields = ('title', 'description')
+
+    # Fields reminder_due_at is derived from
+    REMINDER_SOURCE_FIELDS = {'deadline', 'reminder_minutes_before', 'enable_reminders', 'status'}
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'priority']),
             models.Index(fields=['user', 'deadline']),
-            models.Index(fields=['user', '-created_at']),
+            # Keyset pagination order of TaskListView
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(
+                fields=['reminder_due_at'], name='task_reminder_due_idx',
+                condition=models.Q(reminder_due_at__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -63,4 +80,14 @@ class Task(models.Model):
             self.completed_at = timezone.now()
         elif self.status != 'completed':
             self.completed_at = None
+        self.reminder_due_at = self.get_reminder_due_at()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.REMINDER_SOURCE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'reminder_due_at'}
         super().save(*args, **kwargs)
+
+    def get_reminder_due_at(self):
+        """When the SMS reminder for this task is due, or None if it gets none"""
+        if not self.enable_reminders or not self.deadline or self.status not in ('pending', 'in_progress'):
+            return None
+        return self.deadline - timedelta(minutes=self.reminder_minutes_before)
@@ -1,7 +1,14 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from myhub.pagination import KeysetIndex, KeysetPaginator
+from myhub.search import search
 from .models import Task
 
 User = get_user_model()
@@ -95,3 +102,119 @@ class TaskModelTests(TestCase):
         """Test default enable_reminders is True."""
         task = Task.objects.create(title='Test Task', user=self.user)
         self.assertTrue(task.enable_reminders)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        now = timezone.now()
+        for i in range(23):
+            Task.objects.create(
+                title=f'Task {i}',
+                user=self.user,
+                # Leave some deadlines empty and make others collide to exercise ties
+                deadline=None if i % 5 == 0 else now + timedelta(days=i // 3),
+            )
+        self.queryset = Task.objects.filter(user=self.user)
+
+    def walk(self, ordering, per_page=5):
+        paginator = KeysetPaginator(self.queryset, ordering, per_page)
+        page = paginator.page()
+        seen = [task.pk for task in page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(task.pk for task in page)
+        return paginator, page, seen
+
+    def test_forward_walk_matches_offset_order(self):
+        """Walking all pages yields every row once, in the ordering."""
+        _, _, seen = self.walk(('-created_at', '-id'))
+        expected = list(self.queryset.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_nullable_ordering_puts_nulls_last(self):
+        """Nullable sort keys are paginated with NULLs last and no gaps."""
+        _, _, seen = self.walk(('deadline', 'id'), per_page=4)
+        with_deadline = list(self.queryset.filter(deadline__isnull=False).order_by('deadline', 'id').values_list('pk', flat=True))
+        without = list(self.queryset.filter(deadline__isnull=True).order_by('id').values_list('pk', flat=True))
+        self.assertEqual(seen, with_deadline + without)
+
+    def test_previous_cursor_returns_preceding_page(self):
+        """Stepping back from a page returns the page before it."""
+        paginator = KeysetPaginator(self.queryset, ('deadline', 'id'), 4)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(list(paginator.page(third.previous_cursor)), list(second))
+        self.assertEqual(list(paginator.page(second.previous_cursor)), list(first))
+        self.assertFalse(paginator.page(second.previous_cursor).has_previous())
+
+    def test_last_page(self):
+        """The last cursor serves the tail of the ordering."""
+        paginator, last_walked, _ = self.walk(('-created_at', '-id'))
+        last = paginator.page(last_walked.last_cursor)
+        self.assertFalse(last.has_next())
+        self.assertEqual(list(last)[-1], list(last_walked)[-1])
+
+    def test_tampered_cursor_restarts(self):
+        """Invalid cursors fall back to the first page."""
+        paginator = KeysetPaginator(self.queryset, ('-created_at', '-id'), 5)
+        self.assertEqual(list(paginator.page('garbage')), list(paginator.page()))
+
+    def test_keyset_index_emits_nulls_modifier_only_where_needed(self):
+        """A KeysetIndex keeps NULLS LAST only where DESC alone would put NULLs first."""
+        index = KeysetIndex(F('user'), F('deadline').desc(nulls_last=True), F('id').desc(), name='keyset_test_idx')
+        # Only renders the statement, so the editor need not be entered
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        for nulls_largest in (False, True):
+            with self.subTest(nulls_largest=nulls_largest), \
+                    mock.patch.object(connection.features, 'nulls_order_largest', nulls_largest):
+                sql = str(index.create_sql(Task, editor))
+                self.assertIn('"deadline" DESC', sql)
+                self.assertEqual('NULLS LAST' in sql, nulls_largest)
+
+    def test_list_view_uses_cursor_and_keeps_filters(self):
+        """The task list paginates by cursor, without COUNT, keeping filters."""
+        self.client.force_login(self.user)
+        url = reverse('tasks:task_list')
+        response = self.client.get(url, {'status': 'pending'})
+        page = response.context['page_obj']
+        self.assertTrue(page.has_next())
+        self.assertIn('status=pending', page.next_url)
+        self.assertIn('cursor=', page.next_url)
+
+        response = self.client.get(url + page.next_url)
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.in_title = Task.objects.create(title='Write report', description='Quarterly numbers', user=self.user)
+        self.in_description = Task.objects.create(title='Email Ama', description='Ask about the report', user=self.user)
+        Task.objects.create(title='Unrelated', user=self.user)
+
+    def test_ranked_search_prefers_title_matches(self):
+        """Ranked results put title matches ahead of description matches."""
+        results = list(search(Task.objects.filter(user=self.user), 'report', ranked=True))
+        self.assertEqual(results, [self.in_title, self.in_description])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_bulk_writes_are_indexed(self):
+        """Rows written with bulk_create() and update() are searchable."""
+        Task.objects.bulk_create([Task(title='Renew passport', user=self.user)])
+        Task.objects.filter(pk=self.in_description.pk).update(title='Call bank')
+        queryset = Task.objects.filter(user=self.user)
+        self.assertEqual([task.title for task in search(queryset, 'passport')], ['Renew passport'])
+        self.assertEqual(list(search(queryset, 'call')), [Task.objects.get(pk=self.in_description.pk)])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        """Queries without any searchable terms return no rows."""
+        self.assertFalse(search(Task.objects.all(), '"*()').exists())
+
+    def test_list_view_search(self):
+        """The task list search parameter uses the full-text index."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tasks:task_list'), {'search': 'quarter'})
+        self.assertEqual(list(response.context['page_obj']), [self.in_title])
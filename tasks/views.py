@@ -1,18 +1,30 @@
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import generic
-from django.db.models import Q
 from django.contrib import messages
 
-from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin
+from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin, CSVExportMixin, KeysetPaginationMixin
+from myhub.search import search_condition
 from .models import Task
 from .forms import TaskForm
 
 
-class TaskListView(LoginRequiredMixin, generic.ListView):
+class TaskListView(LoginRequiredMixin, CSVExportMixin, KeysetPaginationMixin, generic.ListView):
     model = Task
     template_name = 'tasks/task_list.html'
     paginate_by = 20
+    keyset_ordering = ('-created_at', '-id')
+    csv_filename = 'tasks.csv'
+    csv_fields = [
+        ('title', 'Title'),
+        ('status', 'Status'),
+        ('priority', 'Priority'),
+        ('deadline', 'Deadline'),
+        ('project.title', 'Project'),
+        ('created_at', 'Created'),
+        ('completed_at', 'Completed'),
+        ('description', 'Description'),
+    ]
 
     def get_queryset(self):
         queryset = Task.objects.filter(user=self.request.user).select_related('project', 'user')
@@ -22,10 +34,7 @@ class TaskListView(LoginRequiredMixin, generic.ListView):
         project_filter = self.request.GET.get('project', '')
 
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+            queryset = queryset.filter(search_condition(Task, search_query))
 
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -36,7 +45,7 @@ class TaskListView(LoginRequiredMixin, generic.ListView):
         if project_filter:
             queryset = queryset.filter(project_id=project_filter)
 
-        return queryset.order_by('-created_at')
+        return queryset.order_by(*self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
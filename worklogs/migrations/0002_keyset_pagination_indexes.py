@@ -0,0 +1,25 @@
+# Generated by Django 6.0.9 on 2026-10-18 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_alter_project_options_and_more'),
+        ('tasks', '0004_keyset_pagination_indexes'),
+        ('worklogs', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='worklog',
+            name='worklogs_wo_user_id_511b2d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='worklog',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='worklogs_wo_user_id_1ee2ee_idx'),
+        ),
+    ]
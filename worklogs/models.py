@@ -35,11 +35,15 @@ class WorkLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Columns covered by the full-text index (see myhub.search), most important first
+    search_fields = ('title', 'description', 'notes')
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['user', '-created_at']),
+            # Keyset pagination order of WorkLogListView
+            models.Index(fields=['user', '-created_at', '-id']),
             models.Index(fields=['project']),
         ]
         verbose_name = 'Work Log'
@@ -1,18 +1,30 @@
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import generic
-from django.db.models import Q
 from django.contrib import messages
 
-from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin
+from myhub.mixins import UserIsOwnerMixin, SuccessMessageMixin, CSVExportMixin, KeysetPaginationMixin
+from myhub.search import search_condition
 from .models import WorkLog
 from .forms import WorkLogForm
 
 
-class WorkLogListView(LoginRequiredMixin, generic.ListView):
+class WorkLogListView(LoginRequiredMixin, CSVExportMixin, KeysetPaginationMixin, generic.ListView):
     model = WorkLog
     template_name = 'worklogs/worklog_list.html'
     paginate_by = 10
+    keyset_ordering = ('-created_at', '-id')
+    csv_filename = 'worklogs.csv'
+    csv_fields = [
+        ('title', 'Title'),
+        ('status', 'Status'),
+        ('project.title', 'Project'),
+        ('task.title', 'Task'),
+        ('created_at', 'Created'),
+        ('completed_at', 'Completed'),
+        ('description', 'Description'),
+        ('notes', 'Notes'),
+    ]
 
     def get_queryset(self):
         queryset = WorkLog.objects.filter(user=self.request.user).select_related('project', 'task')
@@ -20,16 +32,12 @@ class WorkLogListView(LoginRequiredMixin, generic.ListView):
         status_filter = self.request.GET.get('status', '')
 
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(notes__icontains=search_query)
-            )
+            queryset = queryset.filter(search_condition(WorkLog, search_query))
 
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        return queryset.order_by('-created_at')
+        return queryset.order_by(*self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)